@@ -0,0 +1,195 @@
+"""Compare query plans and timings before and after the model indexes.
+
+Seeds a throwaway SQLite database (1M attendance rows by default), runs the
+query shapes used by the routes without the model indexes, then creates the
+indexes and runs them again.
+
+    python benchmarks/index_benchmark.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+
+from src.database.migrations import create_missing_indexes
+from src.models.academic import Attendance
+# Imported so every table is registered on the shared metadata
+from src.models.school import School  # noqa: F401
+from src.models.student import Student  # noqa: F401
+
+STATUSES = ['present', 'present', 'present', 'present', 'absent', 'late', 'excused']
+ASSESSMENTS = ['assignment', 'quiz', 'exam', 'project']
+INVOICE_STATUSES = ['pending', 'paid', 'paid', 'overdue', 'cancelled']
+CHUNK = 50000
+
+# (label, SQL, parameters) for the hot query shapes in src/routes
+QUERIES = [
+    ('attendance page by school and date range',
+     'SELECT * FROM attendance WHERE school_id = :school_id AND date BETWEEN :start AND :end '
+     'ORDER BY created_at, id LIMIT 50', {}),
+    ('attendance by class and date range',
+     'SELECT * FROM attendance WHERE class_id = :class_id AND date BETWEEN :start AND :end', {}),
+    ('attendance by student and date range',
+     'SELECT * FROM attendance WHERE student_id = :student_id AND date BETWEEN :start AND :end', {}),
+    ('grades by subject and academic year',
+     'SELECT * FROM grades WHERE subject_id = :subject_id AND academic_year_id = :academic_year_id', {}),
+    ('invoices by school and status',
+     'SELECT * FROM invoices WHERE school_id = :school_id AND status = :status', {'status': 'overdue'}),
+    ('students page by school',
+     'SELECT * FROM students WHERE school_id = :school_id ORDER BY created_at, id LIMIT 50', {}),
+    ('inbox page by recipient',
+     'SELECT * FROM messages WHERE recipient_id = :recipient_id ORDER BY created_at DESC LIMIT 50', {}),
+]
+
+
+def _ids(count):
+    return [str(uuid.uuid4()) for _ in range(count)]
+
+
+def seed(connection, rows, students_count, classes_count):
+    """Insert a synthetic single-school dataset and return ids used by QUERIES"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    school_id = str(uuid.uuid4())
+    year_id = str(uuid.uuid4())
+    class_ids = _ids(classes_count)
+    subject_ids = _ids(12)
+    user_ids = _ids(students_count)
+    student_ids = _ids(students_count)
+    student_class = {student_id: class_ids[i % classes_count] for i, student_id in enumerate(student_ids)}
+
+    connection.execute('INSERT INTO schools (id, name, created_at, updated_at) VALUES (?, ?, ?, ?)',
+                       (school_id, 'Benchmark School', now, now))
+    connection.execute('INSERT INTO academic_years (id, school_id, name, start_date, end_date, created_at) '
+                       'VALUES (?, ?, ?, ?, ?, ?)', (year_id, school_id, '2024', '2024-01-01', '2024-12-31', now))
+    connection.executemany('INSERT INTO school_classes (id, school_id, academic_year_id, name, created_at) '
+                           'VALUES (?, ?, ?, ?, ?)',
+                           [(class_id, school_id, year_id, f'Class {i}', now) for i, class_id in enumerate(class_ids)])
+    connection.executemany('INSERT INTO subjects (id, school_id, name, created_at) VALUES (?, ?, ?, ?)',
+                           [(subject_id, school_id, f'Subject {i}', now) for i, subject_id in enumerate(subject_ids)])
+    connection.executemany('INSERT INTO school_users (id, school_id, role, first_name, last_name, email, created_at) '
+                           'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                           [(user_id, school_id, 'student', 'First', f'Last {i}', f'student{i}@example.com',
+                             now - timedelta(seconds=i)) for i, user_id in enumerate(user_ids)])
+    connection.executemany('INSERT INTO students (id, user_id, school_id, class_id, student_id, status, created_at) '
+                           'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                           [(student_id, user_ids[i], school_id, student_class[student_id], f'S{i:06d}', 'active',
+                             now - timedelta(seconds=i)) for i, student_id in enumerate(student_ids)])
+
+    # One attendance row per student per school day until rows are reached
+    start = date(2024, 1, 1)
+    batch = []
+    for n in range(rows):
+        student_id = student_ids[n % students_count]
+        day = start + timedelta(days=n // students_count)
+        batch.append((str(uuid.uuid4()), school_id, student_id, student_class[student_id], None, day.isoformat(),
+                      rng.choice(STATUSES), now))
+        if len(batch) == CHUNK:
+            connection.executemany('INSERT INTO attendance (id, school_id, student_id, class_id, subject_id, date, '
+                                   'status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', batch)
+            batch = []
+    if batch:
+        connection.executemany('INSERT INTO attendance (id, school_id, student_id, class_id, subject_id, date, '
+                               'status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', batch)
+
+    connection.executemany(
+        'INSERT INTO grades (id, school_id, student_id, subject_id, class_id, academic_year_id, assessment_type, '
+        'assessment_name, score, max_score, percentage, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        ((str(uuid.uuid4()), school_id, student_ids[n % students_count], subject_ids[n % len(subject_ids)],
+          student_class[student_ids[n % students_count]], year_id, rng.choice(ASSESSMENTS), f'Assessment {n}',
+          rng.randint(0, 100), 100, rng.randint(0, 100), now) for n in range(rows // 5)))
+    connection.executemany(
+        'INSERT INTO invoices (id, school_id, student_id, invoice_number, description, amount, currency, due_date, '
+        'status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        ((str(uuid.uuid4()), school_id, student_ids[n % students_count], f'BENCH-{n:08d}', 'Tuition', 100,
+          'USD', '2024-09-01', rng.choice(INVOICE_STATUSES), now) for n in range(rows // 10)))
+    connection.executemany(
+        'INSERT INTO messages (id, school_id, sender_id, recipient_id, content, created_at) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        ((str(uuid.uuid4()), school_id, user_ids[n % students_count], user_ids[(n * 7) % students_count],
+          'Hello', now - timedelta(seconds=n)) for n in range(rows // 5)))
+    connection.commit()
+
+    return {
+        'school_id': school_id,
+        'class_id': class_ids[0],
+        'student_id': student_ids[0],
+        'recipient_id': user_ids[0],
+        'subject_id': subject_ids[0],
+        'academic_year_id': year_id,
+        'start': '2024-02-01',
+        'end': '2024-02-29',
+    }
+
+
+def run_queries(connection, ids, repeat):
+    results = []
+    for label, sql, extra in QUERIES:
+        params = {**ids, **extra}
+        plan = '; '.join(row[3] for row in connection.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            count = len(connection.execute(sql, params).fetchall())
+            timings.append(time.perf_counter() - started)
+        results.append((label, plan, min(timings) * 1000, count))
+    return results
+
+
+def print_results(title, results):
+    print(f'\n== {title} ==')
+    for label, plan, best_ms, count in results:
+        print(f'{label:<40} {best_ms:>10.2f} ms  {count:>7} rows  {plan}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000, help='attendance rows to seed')
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--classes', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=5, help='runs per query; the best is reported')
+    args = parser.parse_args()
+
+    metadata = Attendance.metadata
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        engine = create_engine(f'sqlite:///{path}')
+
+        # Tables only; the model indexes are created after the first run
+        for table in metadata.sorted_tables:
+            indexes = set(table.indexes)
+            table.indexes.clear()
+            try:
+                table.create(engine)
+            finally:
+                table.indexes.update(indexes)
+
+        sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+        connection = sqlite3.connect(path)
+        started = time.perf_counter()
+        ids = seed(connection, args.rows, args.students, args.classes)
+        print(f'Seeded {args.rows} attendance rows in {time.perf_counter() - started:.1f}s')
+        connection.execute('ANALYZE')
+        print_results('without model indexes', run_queries(connection, ids, args.repeat))
+
+        started = time.perf_counter()
+        created = create_missing_indexes(engine, metadata)
+        connection.execute('ANALYZE')
+        print(f'\nCreated {len(created)} indexes in {time.perf_counter() - started:.1f}s')
+        print_results('with model indexes', run_queries(connection, ids, args.repeat))
+
+        connection.close()
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
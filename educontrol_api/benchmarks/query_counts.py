@@ -0,0 +1,114 @@
+"""Check that list endpoints run a constant number of queries.
+
+Seeds a throwaway SQLite database, counts the statements each list
+endpoint executes, then adds ten times as many rows and counts again.
+Any endpoint whose count grows with the data has an N+1
+lookup; the script then exits with status 1, so it can run in CI.
+
+    python benchmarks/query_counts.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.app import create_app
+from src.config import Config
+from src.extensions import db
+from src.models.academic import Timetable
+from src.models.school import AcademicYear, School, SchoolClass, SchoolUser, Subject
+from src.models.student import ClassSubject, ParentStudentRelationship, Student, Teacher
+from src.utils.query_count import count_queries
+
+# Paths under /api/schools/<school_id>
+ENDPOINTS = [
+    '/users',
+    '/students?expand=user,class',
+    '/teachers?expand=user',
+    '/classes?expand=academic_year',
+    '/class-subjects?expand=class,subject,teacher',
+    '/parent-student-relationships?expand=parent,student',
+    '/timetables?expand=class,subject,teacher',
+]
+
+
+def seed(school_id, count, offset):
+    """Add count students with a parent each and count teachers, classes and lessons"""
+    year = AcademicYear(school_id=school_id, name=f'Year {offset}', start_date=date(2025, 9, 1),
+                        end_date=date(2026, 6, 30))
+    db.session.add(year)
+    db.session.flush()
+    for i in range(offset, offset + count):
+        school_class = SchoolClass(school_id=school_id, academic_year_id=year.id, name=f'Class {i}')
+        subject = Subject(school_id=school_id, name=f'Subject {i}')
+        users = {role: SchoolUser(school_id=school_id, role=role, first_name=role, last_name=str(i),
+                                  email=f'{role}{i}@example.com')
+                 for role in ['student', 'parent', 'teacher']}
+        db.session.add_all([school_class, subject, *users.values()])
+        db.session.flush()
+        student = Student(school_id=school_id, user_id=users['student'].id, class_id=school_class.id,
+                          student_id=f'S{i}')
+        teacher = Teacher(school_id=school_id, user_id=users['teacher'].id, employee_id=f'T{i}')
+        db.session.add_all([student, teacher])
+        db.session.flush()
+        db.session.add_all([
+            ParentStudentRelationship(school_id=school_id, parent_id=users['parent'].id, student_id=student.id,
+                                      relationship='guardian'),
+            ClassSubject(class_id=school_class.id, subject_id=subject.id, teacher_id=teacher.id),
+            Timetable(school_id=school_id, class_id=school_class.id, subject_id=subject.id, teacher_id=teacher.id,
+                      day_of_week=i % 5 + 1, start_time=time(8), end_time=time(9)),
+        ])
+    db.session.commit()
+
+
+def measure(app, school_id):
+    client = app.test_client()
+    counts = {}
+    for path in ENDPOINTS:
+        with count_queries(db.engine) as counter:
+            response = client.get(f'/api/schools/{school_id}{path}')
+        if response.status_code != 200:
+            raise RuntimeError(f'{path}: HTTP {response.status_code} {response.get_data(as_text=True)}')
+        counts[path] = counter.count
+    return counts
+
+
+def main():
+    directory = tempfile.mkdtemp()
+
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'query_counts.db')}"
+        CACHE_BACKEND = 'none'
+        EVENTS_BACKEND = 'none'
+
+    app = create_app(CheckConfig)
+    try:
+        with app.app_context():
+            db.create_all()
+            school = School(name='Query Count School')
+            db.session.add(school)
+            db.session.commit()
+            school_id = school.id
+
+            seed(school_id, 3, 0)
+            small = measure(app, school_id)
+            seed(school_id, 30, 3)
+            large = measure(app, school_id)
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    failed = False
+    print(f'{"endpoint":<55} {"3 rows":>7} {"33 rows":>8}')
+    for path in ENDPOINTS:
+        grows = large[path] != small[path]
+        failed = failed or grows
+        print(f'{path:<55} {small[path]:>7} {large[path]:>8}{"  N+1" if grows else ""}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
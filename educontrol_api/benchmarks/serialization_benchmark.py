@@ -0,0 +1,123 @@
+"""Compare the to_dict + jsonify path with the compiled serializer path.
+
+Seeds a throwaway SQLite database with grades and timetable rows, which
+cover the date, datetime, time and numeric conversions. Each table is
+then encoded both ways: ORM instances through to_dict() and Flask's
+default JSON provider, and plain column rows through the compiled
+serializer and FastJSONProvider. The two bodies must be identical.
+
+    python benchmarks/serialization_benchmark.py --rows 10000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from datetime import time as clock
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import insert
+
+from src.app import create_app
+from src.config import Config
+from src.extensions import db
+from src.models.academic import Grade, Timetable
+from src.serialization import FastJSONProvider, model_columns, serialize_rows, serializer_for
+
+
+def _ids(count):
+    return [str(uuid.uuid4()) for _ in range(count)]
+
+
+def seed(rows):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    school_id = str(uuid.uuid4())
+    students, subjects, classes = _ids(500), _ids(12), _ids(20)
+    year_id = str(uuid.uuid4())
+
+    grades = []
+    for i in range(rows):
+        score = Decimal(rng.randint(0, 1000)) / 10
+        grades.append({
+            'id': str(uuid.uuid4()), 'school_id': school_id, 'student_id': rng.choice(students),
+            'subject_id': rng.choice(subjects), 'class_id': rng.choice(classes), 'academic_year_id': year_id,
+            'assessment_type': rng.choice(['assignment', 'quiz', 'exam', 'project']),
+            'assessment_name': f'Assessment {i % 40}', 'score': score, 'max_score': Decimal(100),
+            'percentage': score, 'grade': rng.choice('ABCDF'),
+            'date_assessed': date(2024, 1, 1) + timedelta(days=i % 200),
+            'comments': None if i % 3 else 'Needs practice', 'created_at': now, 'updated_at': now,
+        })
+    timetables = [{
+        'id': str(uuid.uuid4()), 'school_id': school_id, 'class_id': rng.choice(classes),
+        'subject_id': rng.choice(subjects), 'day_of_week': i % 5 + 1,
+        'start_time': clock(8 + i % 8, 0), 'end_time': clock(8 + i % 8, 45),
+        'room': f'R{i % 30}', 'created_at': now, 'updated_at': now,
+    } for i in range(rows)]
+
+    db.session.execute(insert(Grade), grades)
+    db.session.execute(insert(Timetable), timetables)
+    db.session.commit()
+
+
+def _best(fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        CACHE_BACKEND = 'none'
+
+    app = create_app(BenchmarkConfig)
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = FastJSONProvider(app)
+
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+
+        print(f'{args.rows} rows per table, best and median of {args.repeat} runs\n')
+        print(f'{"table":<12} {"to_dict + jsonify":>20} {"compiled + fast":>20} {"speedup":>8}')
+        for model in (Grade, Timetable):
+            serializer_for(model)  # compile outside the timed region
+
+            def baseline():
+                return default_provider.response([row.to_dict() for row in model.query.all()]).get_data()
+
+            def compiled():
+                rows = db.session.query(*model_columns(model)).all()
+                return fast_provider.response(serialize_rows(model, rows)).get_data()
+
+            base_best, base_median, base_body = _best(baseline, args.repeat)
+            fast_best, fast_median, fast_body = _best(compiled, args.repeat)
+            if base_body != fast_body:
+                raise SystemExit(f'{model.__tablename__}: compiled output differs from to_dict output')
+
+            print(f'{model.__tablename__:<12} {base_best * 1000:>9.1f} / {base_median * 1000:>6.1f} ms '
+                  f'{fast_best * 1000:>9.1f} / {fast_median * 1000:>6.1f} ms {base_best / fast_best:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
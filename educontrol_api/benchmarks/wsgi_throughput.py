@@ -0,0 +1,171 @@
+"""Measure requests/sec and latency percentiles of the gunicorn deployment.
+
+For each worker count, starts gunicorn with gunicorn.conf.py against a
+seeded throwaway SQLite database. It then drives a list endpoint from
+concurrent keep-alive clients and reports startup time, throughput and
+p50/p99 latency.
+
+    python benchmarks/wsgi_throughput.py --workers 1 2 4 --duration 10
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _request(connection, method, path, body=None):
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    return response.status, data
+
+
+def seed(port, users):
+    """Create one school with users and return the benchmarked path"""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    _, data = _request(connection, 'POST', '/api/schools', {'name': 'Benchmark School'})
+    school_id = json.loads(data)['id']
+    for i in range(users):
+        _request(connection, 'POST', f'/api/schools/{school_id}/users', {
+            'role': 'student', 'first_name': 'First', 'last_name': f'Last {i}', 'email': f'user{i}@example.com'
+        })
+    connection.close()
+    return f'/api/schools/{school_id}/users?limit=50'
+
+
+def wait_ready(port, process, timeout=30):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            _request(connection, 'GET', '/api/schools')
+            connection.close()
+            return time.perf_counter() - started
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('gunicorn did not become ready')
+
+
+def load(port, path, clients, duration):
+    """Hit path from clients threads for duration seconds; return latencies and errors"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        local = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status, _ = _request(connection, 'GET', path)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port)
+                failed += 1
+                continue
+            local.append(time.perf_counter() - started)
+            if status != 200:
+                failed += 1
+        connection.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(workers, args, database):
+    port = _free_port()
+    env = {
+        **os.environ,
+        'DATABASE_URL': f'sqlite:///{database}',
+        'BIND': f'127.0.0.1:{port}',
+        'WEB_CONCURRENCY': str(workers),
+        'GUNICORN_WORKER_CLASS': args.worker_class,
+        'GUNICORN_THREADS': str(args.threads),
+        'GUNICORN_PRELOAD': 'true' if args.preload else 'false',
+    }
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        startup = wait_ready(port, process)
+        path = args.path or seed(port, args.users)
+        load(port, path, args.clients, 1)  # warm up every worker
+        latencies, errors = load(port, path, args.clients, args.duration)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    count = len(latencies)
+    return {
+        'workers': workers,
+        'startup_s': startup,
+        'requests': count,
+        'errors': errors,
+        'rps': count / args.duration,
+        'p50_ms': percentile(latencies, 0.50) * 1000 if count else 0,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if count else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--worker-class', default='gthread', choices=['gthread', 'sync'])
+    parser.add_argument('--threads', type=int, default=4, help='threads per gthread worker')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load per worker count')
+    parser.add_argument('--users', type=int, default=500, help='users seeded into the benchmark school')
+    parser.add_argument('--path', help='endpoint to load instead of the seeded users list')
+    parser.add_argument('--no-preload', dest='preload', action='store_false')
+    args = parser.parse_args()
+
+    if shutil.which('gunicorn') is None:
+        parser.error('gunicorn is not installed (pip install -r requirements.txt)')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'bench.db')
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'src.wsgi', 'init-db'], cwd=ROOT, check=True,
+                       env={**os.environ, 'DATABASE_URL': f'sqlite:///{database}'}, stdout=subprocess.DEVNULL)
+
+        print(f"{'workers':>7} {'startup':>9} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for workers in args.workers:
+            result = run(workers, args, database)
+            print(f"{result['workers']:>7} {result['startup_s']:>8.2f}s {result['requests']:>9} {result['errors']:>7} "
+                  f"{result['rps']:>9.1f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+import tempfile
+
+# gunicorn -c gunicorn.conf.py
+wsgi_app = 'src.wsgi:app'
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# gthread: the API runs blocking SQLite calls and CPU-bound work (timetable
+# generation, fee runs) that would stall a gevent hub. Event streams
+# (/api/schools/<id>/events) stay open and would each pin a thread here, so
+# they are served by a separate gevent pool, see gunicorn.events.conf.py.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))  # gthread only
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes', 'on')
+
+# Set before the app is imported: lets /metrics add up every worker's totals
+os.environ.setdefault('METRICS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='educontrol-metrics-'))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+
+def on_starting(server):
+    from src.metrics import clear_multiproc_dir
+    clear_multiproc_dir(os.environ['METRICS_MULTIPROC_DIR'])
+
+    # Per-process backends only see the worker they live in
+    from src.config import Config
+    if server.cfg.workers > 1 and Config.EVENTS_BACKEND == 'local':
+        server.log.warning('EVENTS_BACKEND=local with %d workers: events reach only the listeners of the '
+                           'worker that committed them. Set EVENTS_BACKEND=redis.', server.cfg.workers)
+    if server.cfg.workers > 1 and Config.CACHE_BACKEND == 'local':
+        server.log.warning('CACHE_BACKEND=local with %d workers: a write clears the cache of its own worker '
+                           'only, so the others serve stale responses for up to CACHE_DEFAULT_TTL (%ds). '
+                           'Set CACHE_BACKEND=redis.', server.cfg.workers, Config.CACHE_DEFAULT_TTL)
+
+
+def post_fork(server, worker):
+    # Pooled connections opened in the master must not be shared across processes
+    if preload_app:
+        from src.extensions import db
+        from src.wsgi import app
+        with app.app_context():
+            db.engine.dispose(close=False)
@@ -0,0 +1,43 @@
+# gunicorn -c gunicorn.events.conf.py
+#
+# Serves only the Server-Sent Events streams (/api/schools/<id>/events), from
+# gevent workers where an open stream costs a greenlet instead of a thread.
+# Route that path to this pool and everything else to gunicorn.conf.py's.
+# Apart from one user lookup when a stream opens they never touch the
+# database, so nothing here holds the hub for long.
+# Events are committed by the other pool's workers, so EVENTS_BACKEND must be
+# redis for them to reach these listeners.
+from gevent import monkey
+
+# Before the app is imported, so it sees the patched socket, threading and queue modules
+monkey.patch_all()
+
+import os  # noqa: E402
+
+wsgi_app = 'src.wsgi:events_app'
+bind = os.environ.get('EVENTS_BIND', '0.0.0.0:5001')
+
+workers = int(os.environ.get('EVENTS_WORKERS', 1))
+worker_class = 'gevent'
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+preload_app = True
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+
+def on_starting(server):
+    from src.config import Config
+    if Config.EVENTS_BACKEND != 'redis':
+        raise RuntimeError('The event stream pool needs EVENTS_BACKEND=redis to receive events '
+                           'committed by the API workers')
+
+
+def post_fork(server, worker):
+    # Pooled connections opened in the master must not be shared across processes
+    from src.extensions import db
+    from src.wsgi import app
+    with app.app_context():
+        db.engine.dispose(close=False)
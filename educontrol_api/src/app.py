@@ -0,0 +1,91 @@
+import os
+
+from flask import Flask, current_app, send_from_directory
+from flask_cors import CORS
+from src.config import Config
+from src.database.engine import init_db
+from src.commands import (
+    attendance_rollups_command, fee_run_command, import_roster_command, init_db_command, report_cards_command,
+    sweep_overdue_invoices_command,
+)
+from src.extensions import cache, db, events, metrics, profiler
+from src.serialization import FastJSONProvider
+# Imported so every model is registered on db.metadata before the app is used
+from src.models.user import User
+from src.models.school import School, SchoolUser, AcademicYear, SchoolClass, Subject
+from src.models.student import Student, Teacher, ParentStudentRelationship, ClassSubject
+from src.models.academic import Timetable, Attendance, AttendanceStudentDaily, AttendanceStudentMonthly, AttendanceClassDaily, Grade, Invoice, InvoiceSequence, FeeRun, TimetableGeneration, Document, Announcement, Message, MessageUnreadCount
+from src.routes.user import user_bp
+from src.routes.school import school_bp
+from src.routes.student import student_bp
+from src.routes.academic import academic_bp
+from src.routes.system import system_bp
+from src.routes.reports import reports_bp
+from src.routes.fees import fees_bp
+from src.routes.messages import messages_bp
+from src.routes.events import events_bp
+from src.routes.search import search_bp
+from src.services.notifications import watch_notifications
+from src.services.search import watch_search_index
+
+
+def serve(path):
+    static_folder_path = current_app.static_folder
+    if static_folder_path is None:
+            return "Static folder not configured", 404
+
+    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+        return send_from_directory(static_folder_path, path)
+    else:
+        index_path = os.path.join(static_folder_path, 'index.html')
+        if os.path.exists(index_path):
+            return send_from_directory(static_folder_path, 'index.html')
+        else:
+            return "index.html not found", 404
+
+
+def create_app(config=Config):
+    """Build and configure a new application instance.
+
+    The schema is not touched here; run ``flask --app src.wsgi init-db``
+    once per deploy to create tables and apply migrations.
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config.from_object(config)
+    app.json = FastJSONProvider(app)
+
+    # Enable CORS for all routes
+    CORS(app, origins="*")
+
+    # Register blueprints
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(school_bp, url_prefix='/api')
+    app.register_blueprint(student_bp, url_prefix='/api')
+    app.register_blueprint(academic_bp, url_prefix='/api')
+    app.register_blueprint(system_bp, url_prefix='/api')
+    app.register_blueprint(reports_bp, url_prefix='/api')
+    app.register_blueprint(fees_bp, url_prefix='/api')
+    app.register_blueprint(messages_bp, url_prefix='/api')
+    app.register_blueprint(events_bp, url_prefix='/api')
+    app.register_blueprint(search_bp, url_prefix='/api')
+
+    # Database configuration
+    init_db(app)
+    cache.init_app(app)
+    events.init_app(app)
+    profiler.init_app(app)
+    metrics.init_app(app)
+    watch_notifications()
+    watch_search_index(db.metadata)
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(attendance_rollups_command)
+    app.cli.add_command(report_cards_command)
+    app.cli.add_command(fee_run_command)
+    app.cli.add_command(sweep_overdue_invoices_command)
+    app.cli.add_command(import_roster_command)
+
+    app.add_url_rule('/', defaults={'path': ''}, view_func=serve)
+    app.add_url_rule('/<path:path>', view_func=serve)
+
+    return app
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+try:
+    import redis
+except ImportError:  # optional, only needed for CACHE_BACKEND = 'redis'
+    redis = None
+
+# Response headers kept alongside a cached body
+CACHED_HEADERS = ['X-Next-Cursor', 'Link', 'ETag', 'Last-Modified']
+
+
+class LocalBackend:
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, key):
+        # Generations live outside the LRU so an eviction can never resurrect stale entries
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def bump(self, key):
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+
+class RedisBackend:
+    """Cache shared by every worker and pod through Redis"""
+
+    def __init__(self, url, prefix='educontrol:'):
+        if redis is None:
+            raise RuntimeError('CACHE_BACKEND = "redis" requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def generation(self, key):
+        return int(self.client.get(self.prefix + 'gen:' + key) or 0)
+
+    def bump(self, key):
+        self.client.incr(self.prefix + 'gen:' + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """Caches JSON GET responses per school and namespace.
+
+    Each (namespace, school_id) pair has a generation number that is part
+    of every cache key. Invalidating bumps the generation, so all cached
+    pages for that school and namespace are skipped without enumerating
+    them, on the local and the shared backend alike.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 300
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'local')
+        self.ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        if backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        elif backend == 'local':
+            self.backend = LocalBackend(app.config.get('CACHE_MAX_ENTRIES', 10000))
+        else:
+            self.backend = None
+        app.extensions['response_cache'] = self
+
+    def _count(self, namespace, outcome):
+        with self._lock:
+            self._counts[(namespace, outcome)] += 1
+
+    def _key(self, namespace, school_id):
+        generation = self.backend.generation(f'{namespace}:{school_id}')
+        return f'{namespace}:{school_id}:{generation}:{request.full_path}'
+
+    def cached(self, namespace):
+        """Cache a view's 200 responses, keyed by school_id and query string"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(school_id, **kwargs):
+                if self.backend is None:
+                    return view(school_id, **kwargs)
+
+                key = self._key(namespace, school_id)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self._count(namespace, 'hit')
+                    return _load_response(entry).make_conditional(request)
+
+                self._count(namespace, 'miss')
+                response = make_response(view(school_id, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(key, _dump_response(response), self.ttl)
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, school_id, *namespaces):
+        """Drop every cached response for school_id in the given namespaces"""
+        if self.backend is None:
+            return
+        for namespace in namespaces:
+            self.backend.bump(f'{namespace}:{school_id}')
+
+    def stats(self):
+        """Hit and miss counts per namespace since the process started"""
+        with self._lock:
+            counts = dict(self._counts)
+        namespaces = sorted({namespace for namespace, _ in counts})
+        stats = {}
+        for namespace in namespaces:
+            hits = counts.get((namespace, 'hit'), 0)
+            misses = counts.get((namespace, 'miss'), 0)
+            stats[namespace] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            }
+        return stats
+
+
+def _dump_response(response):
+    """Serialize a response as an HTTP-like status line, header lines and body"""
+    lines = [str(response.status_code)]
+    lines += [f'{name}: {response.headers[name]}' for name in CACHED_HEADERS if name in response.headers]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + response.get_data()
+
+
+def _load_response(entry):
+    head, _, body = entry.partition(b'\r\n\r\n')
+    status, *headers = head.decode('utf-8').split('\r\n')
+    response = Response(body, status=int(status), mimetype='application/json')
+    for line in headers:
+        name, _, value = line.partition(': ')
+        response.headers[name] = value
+    return response
@@ -0,0 +1,178 @@
+import json
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from src.extensions import db
+from src.database.migrations import upgrade
+from src.models.academic import FeeRun
+from src.services.attendance_rollups import rebuild_attendance_rollups, verify_attendance_rollups
+from src.services.fee_runs import FEE_RUN_CHUNK_SIZE, FeeRunError, claim_fee_run, execute_fee_run, parse_fee_run
+from src.services.invoices import OVERDUE_SWEEP_BATCH_SIZE, sweep_overdue_invoices
+from src.services.reports import ReportError, graded_classes, parse_weights, school_report_cards
+from src.services.roster import ROSTER_CHUNK_SIZE, ROSTER_FORMATS, RosterError, RosterImport, read_roster, write_error_report
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create missing tables and indexes and apply pending migrations"""
+    created = upgrade(db.engine, db.metadata)
+    click.echo(f'Database is up to date ({len(created)} indexes created)')
+
+
+@click.command('attendance-rollups')
+@click.option('--school-id', help='Only check this school')
+@click.option('--check', is_flag=True, help='Report drift without repairing it')
+@click.option('--rebuild', is_flag=True, help='Recompute the rollups whether or not they drifted')
+@with_appcontext
+def attendance_rollups_command(school_id, check, rebuild):
+    """Verify the daily attendance rollups against attendance and repair drift"""
+    if rebuild:
+        rebuild_attendance_rollups(db.session, school_id)
+        db.session.commit()
+        click.echo('Attendance rollups rebuilt')
+        return
+
+    drift = verify_attendance_rollups(db.session, school_id)
+    if not drift:
+        click.echo('Attendance rollups match attendance')
+        return
+
+    schools = set()
+    for table, counts in drift.items():
+        for drifted_school_id, keys in sorted(counts.items()):
+            click.echo(f'{table}: {keys} drifted keys in school {drifted_school_id}')
+            schools.add(drifted_school_id)
+    if check:
+        raise SystemExit(1)
+
+    for drifted_school_id in sorted(schools):
+        rebuild_attendance_rollups(db.session, drifted_school_id)
+    db.session.commit()
+    click.echo(f'Rebuilt attendance rollups for {len(schools)} schools')
+
+
+@click.command('report-cards')
+@click.option('--school-id', required=True)
+@click.option('--academic-year-id', required=True)
+@click.option('--class-id', 'class_ids', multiple=True, help='Only these classes (repeatable)')
+@click.option('--weights', help='Assessment type weights, e.g. exam:50,quiz:25,assignment:25')
+@click.option('--workers', type=int, help='Worker processes (default: one per CPU)')
+@click.option('--output', type=click.File('w'), default='-', help='NDJSON destination (default: stdout)')
+@with_appcontext
+def report_cards_command(school_id, academic_year_id, class_ids, weights, workers, output):
+    """Write a report card for every graded student of a school as NDJSON"""
+    try:
+        weights = parse_weights(weights)
+    except ReportError as e:
+        raise click.BadParameter(str(e), param_hint='--weights')
+
+    class_ids = list(class_ids) or graded_classes(db.session, school_id, academic_year_id)
+    database_uri = current_app.config['SQLALCHEMY_DATABASE_URI']
+
+    started = time.perf_counter()
+    cards = 0
+    for card in school_report_cards(database_uri, school_id, academic_year_id, class_ids, weights, workers):
+        output.write(json.dumps(card) + '\n')
+        cards += 1
+    elapsed = time.perf_counter() - started
+    click.echo(f'{cards} report cards for {len(class_ids)} classes in {elapsed:.2f}s', err=True)
+
+
+@click.command('fee-run')
+@click.option('--school-id', help='School to invoice (new runs)')
+@click.option('--description', help='Invoice description (new runs)')
+@click.option('--amount', help='Amount per student (new runs)')
+@click.option('--currency', help='Invoice currency (new runs)')
+@click.option('--due-date', help='Due date, YYYY-MM-DD (new runs)')
+@click.option('--class-id', 'class_ids', multiple=True, help='Only students of these classes (repeatable)')
+@click.option('--status', 'statuses', multiple=True, help='Student statuses to invoice (default: active)')
+@click.option('--resume', 'resume_id', help='Resume this fee run instead of starting a new one')
+@click.option('--force', is_flag=True, help='With --resume, take over a run still marked running')
+@click.option('--chunk-size', type=int, default=FEE_RUN_CHUNK_SIZE, show_default=True, help='Invoices per transaction')
+@with_appcontext
+def fee_run_command(school_id, description, amount, currency, due_date, class_ids, statuses,
+                    resume_id, force, chunk_size):
+    """Invoice every matching student of a school, or resume an interrupted fee run"""
+    if resume_id:
+        run = db.session.get(FeeRun, resume_id)
+        if run is None:
+            raise click.BadParameter('Fee run not found', param_hint='--resume')
+    else:
+        data = {'description': description, 'amount': amount, 'currency': currency, 'due_date': due_date}
+        data = {field: value for field, value in data.items() if value is not None}
+        if class_ids:
+            data['class_ids'] = list(class_ids)
+        if statuses:
+            data['statuses'] = list(statuses)
+        if not school_id:
+            raise click.UsageError('--school-id is required for a new fee run')
+        try:
+            run = FeeRun(school_id=school_id, **parse_fee_run(data))
+        except FeeRunError as e:
+            raise click.UsageError(str(e))
+        db.session.add(run)
+        db.session.commit()
+        click.echo(f'Fee run {run.id}', err=True)
+
+    try:
+        claim_fee_run(db.session, run, force=force)
+    except FeeRunError as e:
+        raise click.ClickException(str(e))
+
+    def progress(run):
+        rate = run.invoices_created / run.elapsed_seconds if run.elapsed_seconds else 0
+        click.echo(f'{run.invoices_created} invoices, {rate:.0f}/s', err=True)
+
+    run = execute_fee_run(db.session, run, chunk_size, progress)
+    summary = run.to_dict()
+    click.echo(f"Fee run {run.status}: {summary['invoices_created']} invoices in "
+               f"{summary['elapsed_seconds']}s ({summary['invoices_per_second'] or 0}/s)", err=True)
+    if run.status == 'failed':
+        raise click.ClickException(f'{run.error}; resume with --resume {run.id}')
+
+
+@click.command('sweep-overdue-invoices')
+@click.option('--school-id', help='Only sweep this school')
+@click.option('--batch-size', type=int, default=OVERDUE_SWEEP_BATCH_SIZE, show_default=True,
+              help='Invoices per UPDATE and commit')
+@with_appcontext
+def sweep_overdue_invoices_command(school_id, batch_size):
+    """Mark pending invoices past their due date as overdue.
+
+    Meant to run on a schedule, e.g. daily from cron shortly after midnight.
+    """
+    started = time.perf_counter()
+    swept = sweep_overdue_invoices(db.session, school_id=school_id, batch_size=batch_size)
+    click.echo(f'{swept} invoices marked overdue in {time.perf_counter() - started:.2f}s')
+
+
+@click.command('import-roster')
+@click.option('--school-id', required=True)
+@click.option('--format', 'fmt', type=click.Choice(ROSTER_FORMATS), help='Roster format (default: from the file name)')
+@click.option('--errors', type=click.File('w'), help='Write rejected rows to this CSV file')
+@click.option('--dry-run', is_flag=True, help='Validate and resolve every row, then roll back')
+@click.option('--chunk-size', type=int, default=ROSTER_CHUNK_SIZE, show_default=True, help='Rows per transaction')
+@click.argument('roster', type=click.File('rb'))
+@with_appcontext
+def import_roster_command(school_id, fmt, errors, dry_run, chunk_size, roster):
+    """Import students and their parents from a CSV or XLSX roster; safe to re-run"""
+    fmt = fmt or roster.name.rsplit('.', 1)[-1].lower()
+
+    def progress(result):
+        click.echo(f'{result.rows} rows, {result.rows / result.elapsed:.0f}/s', err=True)
+
+    try:
+        result = RosterImport(db.session, school_id, dry_run=dry_run).run(
+            read_roster(roster, fmt), chunk_size, progress)
+    except RosterError as e:
+        raise click.UsageError(str(e))
+    summary = result.summary()
+    if errors:
+        write_error_report(result.errors, errors)
+    created = ', '.join(f'{count} {table}' for table, count in summary['created'].items())
+    click.echo(f"{summary['rows']} rows in {summary['elapsed_seconds']}s: created {created}; "
+               f"{len(result.errors)} rejected{' (dry run)' if dry_run else ''}", err=True)
@@ -0,0 +1,67 @@
+import os
+
+DATABASE_DIR = os.path.join(os.path.dirname(__file__), 'database')
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+class Config:
+    """Application settings, overridable through environment variables"""
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
+
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        'DATABASE_URL', f"sqlite:///{os.path.join(DATABASE_DIR, 'app.db')}"
+    )
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool
+    DB_POOL_SIZE = _env_int('DB_POOL_SIZE', 5)
+    DB_MAX_OVERFLOW = _env_int('DB_MAX_OVERFLOW', 10)
+    DB_POOL_TIMEOUT = _env_int('DB_POOL_TIMEOUT', 30)
+    DB_POOL_RECYCLE = _env_int('DB_POOL_RECYCLE', 1800)
+    DB_POOL_PRE_PING = _env_bool('DB_POOL_PRE_PING', True)
+
+    # SQLite only
+    SQLITE_WAL = _env_bool('SQLITE_WAL', True)
+    SQLITE_BUSY_TIMEOUT_MS = _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)
+
+    # Response cache for reference data: 'local', 'redis' or 'none'. 'local' is
+    # per process and invalidated only in the worker that handled the write, so
+    # it suits a single worker (gunicorn warns otherwise); use 'redis' with more
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'local')
+    CACHE_DEFAULT_TTL = _env_int('CACHE_DEFAULT_TTL', 300)
+    CACHE_MAX_ENTRIES = _env_int('CACHE_MAX_ENTRIES', 10000)
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Server-Sent Events fanout: 'local' reaches listeners in the same process only,
+    # so it suits a single worker (gunicorn warns otherwise); 'redis' reaches
+    # those of every worker and pod; 'none' disables /events
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'local')
+    EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL', CACHE_REDIS_URL)
+    SSE_HEARTBEAT_SECONDS = _env_int('SSE_HEARTBEAT_SECONDS', 15)
+    SSE_QUEUE_SIZE = _env_int('SSE_QUEUE_SIZE', 100)
+    SSE_RETRY_MS = _env_int('SSE_RETRY_MS', 3000)
+
+    # Per-request SQL profiling: Server-Timing headers, a JSON log line for
+    # requests slower than PROFILER_SLOW_REQUEST_MS and /api/profiler/stats
+    PROFILER_ENABLED = _env_bool('PROFILER_ENABLED', False)
+    PROFILER_SLOW_REQUEST_MS = _env_int('PROFILER_SLOW_REQUEST_MS', 500)
+    PROFILER_SLOW_STATEMENTS = _env_int('PROFILER_SLOW_STATEMENTS', 5)
+
+    # Prometheus metrics at /metrics: request counts, latency and size
+    # histograms per route, per-school load, pool checkout waits and cache hits
+    METRICS_ENABLED = _env_bool('METRICS_ENABLED', True)
+    # Directory where each worker writes its totals so that any worker's
+    # /metrics reports all of them; unset for a single process
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+    METRICS_FLUSH_SECONDS = _env_int('METRICS_FLUSH_SECONDS', 5)
@@ -0,0 +1,52 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from src.extensions import db
+from src.metrics import InstrumentedQueuePool
+
+
+def engine_options(config):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    # In-memory SQLite uses a single static connection, which has no pool to size
+    if not (url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')):
+        options.update({
+            # Reports checkout wait times to /metrics
+            'poolclass': InstrumentedQueuePool,
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+        })
+    if url.get_backend_name() == 'sqlite':
+        # Connections move between gunicorn threads through the pool
+        options['connect_args'] = {'check_same_thread': False}
+    return {**options, **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+
+
+def _sqlite_pragmas(wal, busy_timeout_ms):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout_ms)}')
+        if wal:
+            # WAL lets readers proceed while one writer commits
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.close()
+    return set_pragmas
+
+
+def init_db(app):
+    """Configure the engine from app.config and bind the shared db to app"""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', _sqlite_pragmas(
+                app.config['SQLITE_WAL'], app.config['SQLITE_BUSY_TIMEOUT_MS']
+            ))
@@ -0,0 +1,173 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+
+from src.services.attendance_rollups import rebuild_attendance_monthly, rebuild_attendance_rollups
+from src.services.messages import rebuild_unread_counts
+from src.services.search import create_search_index, drop_search_index, rebuild_search_index
+
+# Tracks applied migrations; kept off the models' metadata on purpose
+schema_migrations = Table(
+    'schema_migrations',
+    MetaData(),
+    Column('id', String(100), primary_key=True),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _add_column(connection, table, column, ddl):
+    """Add a column unless the table already has it; returns True when added"""
+    columns = {c['name'] for c in inspect(connection).get_columns(table)}
+    if column in columns:
+        return False
+    connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+    return True
+
+
+def denormalize_school_id(connection):
+    """Copy students.school_id onto attendance, grades and parent links"""
+    for table in ['attendance', 'grades', 'parent_student_relationships']:
+        _add_column(connection, table, 'school_id', 'VARCHAR(36) REFERENCES schools (id)')
+        connection.execute(text(
+            f'UPDATE {table} SET school_id = ('
+            f'SELECT students.school_id FROM students WHERE students.id = {table}.student_id'
+            f') WHERE school_id IS NULL'
+        ))
+
+
+def drop_attendance_school_date_index(connection):
+    """Drop the (school_id, date) index, which idx_attendance_school_id_date_status covers"""
+    connection.execute(text('DROP INDEX IF EXISTS idx_attendance_school_id_date'))
+
+
+def backfill_attendance_rollups(connection):
+    """Fill the daily attendance rollups from existing attendance"""
+    rebuild_attendance_rollups(connection)
+
+
+def add_class_subject_periods_per_week(connection):
+    """Add class_subjects.periods_per_week for the timetable generator"""
+    _add_column(connection, 'class_subjects', 'periods_per_week', 'INTEGER')
+
+
+def add_invoice_fee_run_id(connection):
+    """Add invoices.fee_run_id, linking invoices to the fee run that created them"""
+    _add_column(connection, 'invoices', 'fee_run_id', 'VARCHAR(36) REFERENCES fee_runs (id)')
+
+
+def drop_invoice_school_status_index(connection):
+    """Drop the (school_id, status) index, which idx_invoices_school_id_status_currency covers"""
+    connection.execute(text('DROP INDEX IF EXISTS idx_invoices_school_id_status'))
+
+
+def replace_message_indexes(connection):
+    """Drop the (user, created_at) message indexes in favour of (user, created_at, id)"""
+    connection.execute(text('DROP INDEX IF EXISTS idx_messages_recipient_id_created_at'))
+    connection.execute(text('DROP INDEX IF EXISTS idx_messages_sender_id_created_at'))
+
+
+def backfill_unread_counts(connection):
+    """Fill the per-user unread message counters from existing messages"""
+    rebuild_unread_counts(connection)
+
+
+
+def backfill_search_index(connection):
+    """Create the people search index and fill it from existing users"""
+    create_search_index(connection)
+    rebuild_search_index(connection)
+
+
+def replace_timetable_indexes(connection):
+    """Drop the (resource, day_of_week) timetable indexes in favour of ones covering the times"""
+    connection.execute(text('DROP INDEX IF EXISTS idx_timetables_class_id_day_of_week'))
+    connection.execute(text('DROP INDEX IF EXISTS idx_timetables_teacher_id_day_of_week'))
+
+
+def rebuild_search_index_per_school(connection):
+    """Recreate the people search index with a rowid range per school"""
+    drop_search_index(connection)
+    create_search_index(connection)
+    rebuild_search_index(connection)
+
+
+def drop_school_user_email_index(connection):
+    """Drop the (school_id, email) index in favour of idx_school_users_school_id_lower_email"""
+    connection.execute(text('DROP INDEX IF EXISTS idx_school_users_school_id_email'))
+
+
+def backfill_attendance_monthly(connection):
+    """Fill the monthly student attendance rollup from the daily one"""
+    rebuild_attendance_monthly(connection)
+
+
+# Applied in order, once per database. Each step must also be a no-op on a
+# database that db.create_all() has just created from the current models.
+MIGRATIONS = [
+    ('0001_denormalize_school_id', denormalize_school_id),
+    ('0002_drop_attendance_school_date_index', drop_attendance_school_date_index),
+    ('0003_backfill_attendance_rollups', backfill_attendance_rollups),
+    ('0004_add_class_subject_periods_per_week', add_class_subject_periods_per_week),
+    ('0005_add_invoice_fee_run_id', add_invoice_fee_run_id),
+    ('0006_drop_invoice_school_status_index', drop_invoice_school_status_index),
+    ('0007_replace_message_indexes', replace_message_indexes),
+    ('0008_backfill_unread_counts', backfill_unread_counts),
+    ('0009_backfill_search_index', backfill_search_index),
+    ('0010_replace_timetable_indexes', replace_timetable_indexes),
+    ('0011_rebuild_search_index_per_school', rebuild_search_index_per_school),
+    ('0012_drop_school_user_email_index', drop_school_user_email_index),
+    ('0013_backfill_attendance_monthly', backfill_attendance_monthly),
+]
+
+
+def run_migrations(engine):
+    """Apply pending MIGRATIONS, each in its own transaction"""
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        applied = set(connection.execute(select(schema_migrations.c.id)).scalars())
+
+    ran = []
+    for migration_id, migration in MIGRATIONS:
+        if migration_id in applied:
+            continue
+        with engine.begin() as connection:
+            migration(connection)
+            connection.execute(schema_migrations.insert().values(id=migration_id, applied_at=datetime.utcnow()))
+        ran.append(migration_id)
+    return ran
+
+
+def _index_names(connection, table):
+    # SQLite reflection skips expression indexes such as lower(email), so read the catalog
+    if connection.dialect.name == 'sqlite':
+        return set(connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"), {'table': table}
+        ).scalars())
+    return {index['name'] for index in inspect(connection).get_indexes(table)}
+
+
+def create_missing_indexes(engine, metadata):
+    """Create model indexes that are missing from tables that already exist.
+
+    db.create_all() only creates indexes together with a new table, so
+    databases created before an index was declared never receive it.
+    """
+    created = []
+    existing_tables = set(inspect(engine).get_table_names())
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = _index_names(connection, table.name)
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection)
+                    created.append(index.name)
+    return created
+
+
+def upgrade(engine, metadata):
+    """Bring an existing database up to date with the models"""
+    metadata.create_all(engine)
+    run_migrations(engine)
+    return create_missing_indexes(engine, metadata)
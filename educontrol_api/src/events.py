@@ -0,0 +1,198 @@
+import json
+import queue
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+try:
+    import redis
+except ImportError:  # optional, only needed for EVENTS_BACKEND = 'redis'
+    redis = None
+
+# session.info key of the events waiting for their transaction to commit
+PENDING_EVENTS = 'pending_events'
+
+
+class Subscription:
+    """One listener's queue of formatted events on a set of channels"""
+
+    def __init__(self, broker, channels, maxsize):
+        self.broker = broker
+        self.channels = channels
+        self.closed = False
+        self._queue = queue.Queue(maxsize)
+
+    def put(self, frame):
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            # A listener that cannot keep up is dropped; it reconnects and catches up
+            self.close()
+
+    def get(self, timeout):
+        """Next frame, or None after timeout seconds or once closed"""
+        if self.closed:
+            return None
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broker.unsubscribe(self)
+            try:
+                self._queue.put_nowait(None)  # wake a waiting get()
+            except queue.Full:
+                pass
+
+
+class LocalBroker:
+    """In-process fanout from channels to subscriptions"""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels, maxsize):
+        subscription = Subscription(self, channels, maxsize)
+        with self._lock:
+            for channel in channels:
+                self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+    def publish(self, channel, frame):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(frame)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({subscription for subscribers in self._subscriptions.values() for subscription in subscribers})
+
+
+class RedisBroker(LocalBroker):
+    """Fanout across every worker and pod through Redis pub/sub.
+
+    Each process keeps one pattern subscription and relays what it receives
+    to its local subscriptions, so a connection costs no Redis connection.
+    """
+
+    def __init__(self, url, prefix='educontrol:events:'):
+        if redis is None:
+            raise RuntimeError('EVENTS_BACKEND = "redis" requires the redis package')
+        super().__init__()
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._listener = None
+
+    def subscribe(self, channels, maxsize):
+        # Started on first use, so a preloading master never owns the thread
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='events-redis', daemon=True)
+                self._listener.start()
+        return super().subscribe(channels, maxsize)
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.prefix + '*')
+        for message in pubsub.listen():
+            channel = message['channel'].decode('utf-8')[len(self.prefix):]
+            super().publish(channel, message['data'].decode('utf-8'))
+
+    def publish(self, channel, frame):
+        self.client.publish(self.prefix + channel, frame)
+
+
+def format_event(event_type, data, event_id=None):
+    """A Server-Sent Events frame with a JSON data line"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':'), sort_keys=True, default=str))
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventBus:
+    """Publishes committed changes to Server-Sent Events listeners.
+
+    Writers queue events on their session with publish_after_commit(). The
+    queue is published when the transaction commits and dropped when it
+    ends any other way, so listeners never see rows that were rolled back.
+    """
+
+    def __init__(self):
+        self.broker = None
+        self.heartbeat = 15
+        self.queue_size = 100
+        self.retry_ms = 3000
+
+    def init_app(self, app):
+        backend = app.config.get('EVENTS_BACKEND', 'local')
+        self.heartbeat = app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+        self.queue_size = app.config.get('SSE_QUEUE_SIZE', 100)
+        self.retry_ms = app.config.get('SSE_RETRY_MS', 3000)
+        if backend == 'redis':
+            self.broker = RedisBroker(app.config['EVENTS_REDIS_URL'])
+        elif backend == 'local':
+            self.broker = LocalBroker()
+        else:
+            self.broker = None
+        app.extensions['events'] = self
+
+        if not event.contains(Session, 'after_commit', self._after_commit):
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_transaction_end', self._after_transaction_end)
+
+    @property
+    def enabled(self):
+        return self.broker is not None
+
+    def publish(self, channel, event_type, data, event_id=None):
+        if self.broker is not None:
+            self.broker.publish(channel, format_event(event_type, data, event_id))
+
+    def publish_after_commit(self, session, channel, event_type, data, event_id=None):
+        """Publish once session's current transaction commits"""
+        if self.broker is not None:
+            session.info.setdefault(PENDING_EVENTS, []).append((channel, event_type, data, event_id))
+
+    def _after_commit(self, session):
+        for pending in session.info.pop(PENDING_EVENTS, ()):
+            self.publish(*pending)
+
+    def _after_transaction_end(self, session, transaction):
+        if transaction.parent is None:
+            session.info.pop(PENDING_EVENTS, None)
+
+    def subscribe(self, channels):
+        return self.broker.subscribe(channels, self.queue_size)
+
+    def stream(self, subscription):
+        """Yield subscription's frames, with a comment line as heartbeat when idle"""
+        try:
+            yield f'retry: {self.retry_ms}\n\n'
+            while True:
+                frame = subscription.get(self.heartbeat)
+                if frame is not None:
+                    yield frame
+                elif subscription.closed:
+                    return
+                else:
+                    yield ': heartbeat\n\n'
+        finally:
+            subscription.close()
@@ -0,0 +1,17 @@
+from flask_sqlalchemy import SQLAlchemy
+
+from src.cache import ResponseCache
+from src.events import EventBus
+from src.metrics import Metrics
+from src.profiler import SQLProfiler
+
+# The one SQLAlchemy instance shared by every model module
+db = SQLAlchemy()
+
+cache = ResponseCache()
+
+events = EventBus()
+
+profiler = SQLProfiler()
+
+metrics = Metrics()
@@ -3,52 +3,15 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
-from flask_cors import CORS
-from src.models.user import db
-from src.models.school import School, SchoolUser, AcademicYear, SchoolClass, Subject
-from src.models.student import Student, Teacher, ParentStudentRelationship, ClassSubject
-from src.models.academic import Timetable, Attendance, Grade, Invoice, Document, Announcement, Message
-from src.routes.user import user_bp
-from src.routes.school import school_bp
-from src.routes.student import student_bp
-from src.routes.academic import academic_bp
+from src.app import create_app
+from src.extensions import db
+from src.database.migrations import upgrade
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# Enable CORS for all routes
-CORS(app, origins="*")
-
-# Register blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(school_bp, url_prefix='/api')
-app.register_blueprint(student_bp, url_prefix='/api')
-app.register_blueprint(academic_bp, url_prefix='/api')
-
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+app = create_app()
 
 
 if __name__ == '__main__':
+    # The development server creates the schema itself; production uses init-db
+    with app.app_context():
+        upgrade(db.engine, db.metadata)
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,311 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+
+from flask import Response, request
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+SIZE_BUCKETS = [100, 1000, 10000, 100000, 1000000, 10000000]
+POOL_WAIT_BUCKETS = [0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30]
+
+# WSGI environ key holding the request's start time
+STARTED_KEY = 'educontrol.metrics_started'
+
+# name: (type, help, label names, histogram buckets)
+METRICS = {
+    'educontrol_http_requests_total': (
+        'counter', 'Requests served', ['blueprint', 'route', 'method', 'status'], None),
+    'educontrol_http_request_duration_seconds': (
+        'histogram', 'Request latency', ['blueprint', 'route', 'method'], LATENCY_BUCKETS),
+    'educontrol_http_response_size_bytes': (
+        'histogram', 'Response body size', ['blueprint', 'route'], SIZE_BUCKETS),
+    'educontrol_http_requests_in_flight': (
+        'gauge', 'Requests being served', [], None),
+    'educontrol_school_requests_total': (
+        'counter', 'Requests per school', ['school_id'], None),
+    'educontrol_school_request_duration_seconds_total': (
+        'counter', 'Time spent serving each school', ['school_id'], None),
+    'educontrol_db_pool_checkout_wait_seconds': (
+        'histogram', 'Time waited for a pooled connection', [], POOL_WAIT_BUCKETS),
+    'educontrol_db_pool_checked_out': (
+        'gauge', 'Connections checked out of the pool', [], None),
+    'educontrol_cache_requests_total': (
+        'counter', 'Response cache lookups', ['namespace', 'outcome'], None),
+    'educontrol_cache_hit_ratio': (
+        'gauge', 'Response cache hit ratio since start', ['namespace'], None),
+}
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a connection"""
+
+    observers = []
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            for observer in self.observers:
+                observer(waited)
+
+
+class _Shard:
+    """One native thread's metrics; only that thread ever writes to it"""
+
+    __slots__ = ['values', 'histograms']
+
+    def __init__(self):
+        self.values = {}  # (name, labels) -> number
+        self.histograms = {}  # (name, labels) -> bucket counts followed by the sum
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _add_counts(series, labels, counts):
+    total = series.get(labels)
+    series[labels] = [a + b for a, b in zip(total, counts)] if total else list(counts)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def clear_multiproc_dir(directory):
+    """Remove the files of a previous server run, whose counters must not carry over"""
+    for filename in os.listdir(directory):
+        if filename.endswith(('.json', '.tmp')):
+            os.remove(os.path.join(directory, filename))
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metrics:
+    """Request, database pool and cache metrics in the Prometheus text format.
+
+    Every native thread writes to its own shard without locking, so
+    recording a request costs a few dictionary updates; /metrics adds the
+    shards up when scraped. Shards are per native thread rather than per
+    thread-local, so gevent's greenlets share their hub thread's shard
+    instead of creating one each.
+
+    Under several gunicorn workers, set METRICS_MULTIPROC_DIR (gunicorn.conf.py
+    does): every worker then writes its totals to a file there every
+    METRICS_FLUSH_SECONDS, and a scrape of any worker adds up all the files.
+    Counters of workers that have exited are kept, so totals never go back;
+    gauges count live workers only.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.flush_seconds = 5
+        self._shards = {}
+        self._lock = threading.Lock()
+        self._app = None
+        self._flusher_pid = None
+        self._path = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+        self._app = app
+        self.directory = app.config.get('METRICS_MULTIPROC_DIR')
+        self.flush_seconds = app.config.get('METRICS_FLUSH_SECONDS', 5)
+        if self._observe_pool_wait not in InstrumentedQueuePool.observers:
+            InstrumentedQueuePool.observers.append(self._observe_pool_wait)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    def _shard(self):
+        thread_id = threading.get_native_id()
+        shard = self._shards.get(thread_id)
+        if shard is None:
+            with self._lock:
+                # A reused native id belongs to a finished thread, whose counts carry on
+                shard = self._shards.setdefault(thread_id, _Shard())
+        return shard
+
+    def _add(self, shard, name, labels, amount):
+        key = (name, labels)
+        shard.values[key] = shard.values.get(key, 0) + amount
+
+    def _observe(self, shard, name, labels, value):
+        key = (name, labels)
+        buckets = METRICS[name][3]
+        counts = shard.histograms.get(key)
+        if counts is None:
+            counts = shard.histograms[key] = [0] * (len(buckets) + 2)
+        counts[bisect.bisect_left(buckets, value)] += 1
+        counts[-1] += value
+
+    def _observe_pool_wait(self, seconds):
+        self._observe(self._shard(), 'educontrol_db_pool_checkout_wait_seconds', (), seconds)
+
+    def _start_flusher(self):
+        # Threads do not survive fork, so each worker starts its own on its first request
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._path = os.path.join(self.directory, f'{os.getpid()}-{time.time_ns()}.json')
+        thread = threading.Thread(target=self._flush_forever, name='metrics-flush', daemon=True)
+        thread.start()
+        atexit.register(self._flush)
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self._flush()
+
+    def _flush(self):
+        """Write this process's totals to its file in METRICS_MULTIPROC_DIR"""
+        # Called from the flusher thread and at exit too, outside any request
+        with self._app.app_context():
+            values, histograms = self._totals()
+        data = {
+            'pid': os.getpid(),
+            'values': [[name, list(labels), value] for name, series in values.items()
+                       for labels, value in series.items()],
+            'histograms': [[name, list(labels), counts] for name, series in histograms.items()
+                           for labels, counts in series.items()],
+        }
+        temporary = f'{self._path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(data, f)
+        os.replace(temporary, self._path)
+
+    def _before_request(self):
+        if self.directory and self._flusher_pid != os.getpid():
+            self._start_flusher()
+        request.environ[STARTED_KEY] = time.perf_counter()
+        self._add(self._shard(), 'educontrol_http_requests_in_flight', (), 1)
+
+    def _after_request(self, response):
+        # One trip through the request proxy; attribute reads on the request itself are cheap
+        req = request._get_current_object()
+        started = req.environ.get(STARTED_KEY)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        shard = self._shard()
+        route = req.url_rule.rule if req.url_rule else 'unmatched'
+        blueprint = req.blueprint or ''
+        self._add(shard, 'educontrol_http_requests_total', (blueprint, route, req.method, response.status_code), 1)
+        self._observe(shard, 'educontrol_http_request_duration_seconds', (blueprint, route, req.method), elapsed)
+        size = response.content_length
+        if size is not None:
+            self._observe(shard, 'educontrol_http_response_size_bytes', (blueprint, route), size)
+        school_id = req.view_args.get('school_id') if req.view_args else None
+        if school_id:
+            self._add(shard, 'educontrol_school_requests_total', (school_id,), 1)
+            self._add(shard, 'educontrol_school_request_duration_seconds_total', (school_id,), elapsed)
+        return response
+
+    def _teardown_request(self, exception):
+        if request.environ.pop(STARTED_KEY, None) is not None:
+            self._add(self._shard(), 'educontrol_http_requests_in_flight', (), -1)
+
+    def _totals(self):
+        """This process's values: every shard, the pool and the response cache"""
+        values, histograms = {}, {}
+        for shard in list(self._shards.values()):
+            for (name, labels), value in list(shard.values.items()):
+                series = values.setdefault(name, {})
+                series[labels] = series.get(labels, 0) + value
+            for (name, labels), counts in list(shard.histograms.items()):
+                _add_counts(histograms.setdefault(name, {}), labels, counts)
+
+        pool = self._app.extensions['sqlalchemy'].engine.pool if self._app else None
+        if pool is not None and hasattr(pool, 'checkedout'):
+            values['educontrol_db_pool_checked_out'] = {(): pool.checkedout()}
+        cache = self._app.extensions.get('response_cache') if self._app else None
+        if cache is not None:
+            for namespace, stats in cache.stats().items():
+                values.setdefault('educontrol_cache_requests_total', {}).update({
+                    (namespace, 'hit'): stats['hits'], (namespace, 'miss'): stats['misses'],
+                })
+        return values, histograms
+
+    def _read_all(self):
+        """Sum of every worker's file; gauges only from workers still running"""
+        values, histograms = {}, {}
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # removed or replaced while being read
+            alive = _alive(data['pid'])
+            for name, labels, value in data['values']:
+                if METRICS[name][0] == 'gauge' and not alive:
+                    continue
+                series = values.setdefault(name, {})
+                series[tuple(labels)] = series.get(tuple(labels), 0) + value
+            for name, labels, counts in data['histograms']:
+                _add_counts(histograms.setdefault(name, {}), tuple(labels), counts)
+        return values, histograms
+
+    def collect(self):
+        """Sum every shard, or every worker's, into {name: {labels: value or bucket counts}}"""
+        if self.directory:
+            if self._flusher_pid != os.getpid():
+                self._start_flusher()
+            self._flush()
+            values, histograms = self._read_all()
+        else:
+            values, histograms = self._totals()
+        requests = values.get('educontrol_cache_requests_total', {})
+        for namespace in sorted({namespace for namespace, _ in requests}):
+            hits, misses = requests.get((namespace, 'hit'), 0), requests.get((namespace, 'miss'), 0)
+            values.setdefault('educontrol_cache_hit_ratio', {})[(namespace,)] = (
+                hits / (hits + misses) if hits + misses else 0.0)
+        return values, histograms
+
+    def render(self):
+        values, histograms = self.collect()
+        lines = []
+        for name, (kind, description, names, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'histogram':
+                for labels, counts in sorted(histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, count in zip(buckets + ['+Inf'], counts):
+                        cumulative += count
+                        le = f'le="{bound}"'
+                        lines.append(f'{name}_bucket{_labels(names, labels, le)} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(names, labels)} {counts[-1]}')
+                    lines.append(f'{name}_count{_labels(names, labels)} {cumulative}')
+            else:
+                for labels, value in sorted(values.get(name, {}).items()):
+                    lines.append(f'{name}{_labels(names, labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def view(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
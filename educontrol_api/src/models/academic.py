@@ -1,9 +1,7 @@
-from flask_sqlalchemy import SQLAlchemy
+from src.extensions import db
 from datetime import datetime, date, time
 import uuid
 
-db = SQLAlchemy()
-
 class Timetable(db.Model):
     __tablename__ = 'timetables'
     
@@ -23,6 +21,17 @@ class Timetable(db.Model):
     school_class = db.relationship('SchoolClass', backref='timetable_entries', lazy=True)
     subject = db.relationship('Subject', backref='timetable_entries', lazy=True)
     
+    __table_args__ = (
+        db.Index('idx_timetables_school_id_created_at_id', 'school_id', 'created_at', 'id'),
+        db.Index('idx_timetables_school_id_day_of_week', 'school_id', 'day_of_week'),
+        # Overlap checks: resource and day, then a range on start_time, filtered on end_time
+        db.Index('idx_timetables_class_id_day_of_week_start_time', 'class_id', 'day_of_week', 'start_time', 'end_time'),
+        db.Index('idx_timetables_teacher_id_day_of_week_start_time', 'teacher_id', 'day_of_week', 'start_time',
+                 'end_time'),
+        db.Index('idx_timetables_school_id_room_day_of_week_start_time', 'school_id', 'room', 'day_of_week',
+                 'start_time', 'end_time'),
+    )
+    
     def __repr__(self):
         return f'<Timetable {self.day_of_week}-{self.start_time}>'
     
@@ -45,6 +54,7 @@ class Attendance(db.Model):
     __tablename__ = 'attendance'
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    school_id = db.Column(db.String(36), db.ForeignKey('schools.id'), nullable=False)
     student_id = db.Column(db.String(36), db.ForeignKey('students.id'), nullable=False)
     class_id = db.Column(db.String(36), db.ForeignKey('school_classes.id'), nullable=False)
     subject_id = db.Column(db.String(36), db.ForeignKey('subjects.id'))
@@ -59,7 +69,14 @@ class Attendance(db.Model):
     subject = db.relationship('Subject', backref='attendance_records', lazy=True)
     marker = db.relationship('SchoolUser', backref='attendance_marked', lazy=True)
     
-    __table_args__ = (db.UniqueConstraint('student_id', 'class_id', 'subject_id', 'date', name='unique_attendance'),)
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'class_id', 'subject_id', 'date', name='unique_attendance'),
+        # Covers the attendance summary so it never reads the table itself
+        db.Index('idx_attendance_school_id_date_status', 'school_id', 'date', 'status', 'student_id', 'class_id'),
+        db.Index('idx_attendance_school_id_created_at_id', 'school_id', 'created_at', 'id'),
+        db.Index('idx_attendance_class_id_date', 'class_id', 'date'),
+        db.Index('idx_attendance_student_id_date', 'student_id', 'date'),
+    )
     
     def __repr__(self):
         return f'<Attendance {self.student_id}-{self.date}-{self.status}>'
@@ -67,6 +84,7 @@ class Attendance(db.Model):
     def to_dict(self):
         return {
             'id': self.id,
+            'school_id': self.school_id,
             'student_id': self.student_id,
             'class_id': self.class_id,
             'subject_id': self.subject_id,
@@ -77,10 +95,105 @@ class Attendance(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# Daily rollups of attendance, recomputed in the same transaction as every
+# attendance write (see src/services/attendance_rollups.py)
+class AttendanceStudentDaily(db.Model):
+    __tablename__ = 'attendance_student_daily'
+    
+    # Key order lets per-student summaries read the primary key in group order.
+    # No foreign keys on student and class: rows are only cleared after the
+    # attendance they summarize has been deleted, in the same transaction.
+    school_id = db.Column(db.String(36), db.ForeignKey('schools.id'), primary_key=True)
+    student_id = db.Column(db.String(36), primary_key=True)
+    class_id = db.Column(db.String(36), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    excused = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Clustered on the primary key, which is the only access path
+    __table_args__ = {'sqlite_with_rowid': False}
+    
+    def __repr__(self):
+        return f'<AttendanceStudentDaily {self.student_id}-{self.date}>'
+    
+    def to_dict(self):
+        return {
+            'school_id': self.school_id,
+            'student_id': self.student_id,
+            'class_id': self.class_id,
+            'date': self.date.isoformat() if self.date else None,
+            'present': self.present,
+            'absent': self.absent,
+            'late': self.late,
+            'excused': self.excused
+        }
+
+class AttendanceStudentMonthly(db.Model):
+    __tablename__ = 'attendance_student_monthly'
+    
+    # The daily student rollup summed per month, month being its first day.
+    # Summaries read whole months here and only the days at their edges from
+    # the daily rows.
+    school_id = db.Column(db.String(36), db.ForeignKey('schools.id'), primary_key=True)
+    student_id = db.Column(db.String(36), primary_key=True)
+    class_id = db.Column(db.String(36), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    excused = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = {'sqlite_with_rowid': False}
+    
+    def __repr__(self):
+        return f'<AttendanceStudentMonthly {self.student_id}-{self.month}>'
+    
+    def to_dict(self):
+        return {
+            'school_id': self.school_id,
+            'student_id': self.student_id,
+            'class_id': self.class_id,
+            'month': self.month.isoformat() if self.month else None,
+            'present': self.present,
+            'absent': self.absent,
+            'late': self.late,
+            'excused': self.excused
+        }
+
+class AttendanceClassDaily(db.Model):
+    __tablename__ = 'attendance_class_daily'
+    
+    school_id = db.Column(db.String(36), db.ForeignKey('schools.id'), primary_key=True)
+    class_id = db.Column(db.String(36), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    excused = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = {'sqlite_with_rowid': False}
+    
+    def __repr__(self):
+        return f'<AttendanceClassDaily {self.class_id}-{self.date}>'
+    
+    def to_dict(self):
+        return {
+            'school_id': self.school_id,
+            'class_id': self.class_id,
+            'date': self.date.isoformat() if self.date else None,
+            'present': self.present,
+            'absent': self.absent,
+            'late': self.late,
+            'excused': self.excused
+        }
+
 class Grade(db.Model):
     __tablename__ = 'grades'
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    school_id = db.Column(db.String(36), db.ForeignKey('schools.id'), nullable=False)
     student_id = db.Column(db.String(36), db.ForeignKey('students.id'), nullable=False)
     subject_id = db.Column(db.String(36), db.ForeignKey('subjects.id'), nullable=False)
     class_id = db.Column(db.String(36), db.ForeignKey('school_classes.id'), nullable=False)
@@ -102,12 +215,20 @@ class Grade(db.Model):
     school_class = db.relationship('SchoolClass', backref='grades', lazy=True)
     academic_year = db.relationship('AcademicYear', backref='grades', lazy=True)
     
+    __table_args__ = (
+        db.Index('idx_grades_school_id_created_at_id', 'school_id', 'created_at', 'id'),
+        db.Index('idx_grades_subject_id_academic_year_id', 'subject_id', 'academic_year_id'),
+        db.Index('idx_grades_class_id_academic_year_id', 'class_id', 'academic_year_id'),
+        db.Index('idx_grades_student_id_academic_year_id', 'student_id', 'academic_year_id'),
+    )
+    
     def __repr__(self):
         return f'<Grade {self.student_id}-{self.assessment_name}>'
     
     def to_dict(self):
         return {
             'id': self.id,
+            'school_id': self.school_id,
             'student_id': self.student_id,
             'subject_id': self.subject_id,
             'class_id': self.class_id,
@@ -125,6 +246,31 @@ class Grade(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class GradeBand(db.Model):
+    __tablename__ = 'grade_bands'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    school_id = db.Column(db.String(36), db.ForeignKey('schools.id'), nullable=False)
+    grade = db.Column(db.String(5), nullable=False)
+    min_percentage = db.Column(db.Numeric(5, 2), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('school_id', 'grade', name='unique_school_grade_band'),)
+    
+    def __repr__(self):
+        return f'<GradeBand {self.grade}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'school_id': self.school_id,
+            'grade': self.grade,
+            'min_percentage': float(self.min_percentage) if self.min_percentage is not None else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class Invoice(db.Model):
     __tablename__ = 'invoices'
     
@@ -140,9 +286,20 @@ class Invoice(db.Model):
     payment_method = db.Column(db.String(50))
     payment_reference = db.Column(db.String(255))
     paid_at = db.Column(db.DateTime)
+    fee_run_id = db.Column(db.String(36), db.ForeignKey('fee_runs.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Covers the outstanding balance aggregates without touching the table
+        db.Index('idx_invoices_school_id_status_currency', 'school_id', 'status', 'currency', 'due_date', 'amount'),
+        db.Index('idx_invoices_status_due_date', 'status', 'due_date'),
+        db.Index('idx_invoices_school_id_created_at_id', 'school_id', 'created_at', 'id'),
+        db.Index('idx_invoices_student_id', 'student_id'),
+        # A fee run bills each student at most once, even when resumed
+        db.Index('idx_invoices_fee_run_id_student_id', 'fee_run_id', 'student_id', unique=True),
+    )
+    
     def __repr__(self):
         return f'<Invoice {self.invoice_number}>'
     
@@ -160,6 +317,97 @@ class Invoice(db.Model):
             'payment_method': self.payment_method,
             'payment_reference': self.payment_reference,
             'paid_at': self.paid_at.isoformat() if self.paid_at else None,
+            'fee_run_id': self.fee_run_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+# Next invoice number per school, handed out in blocks (see src/services/fee_runs.py)
+class InvoiceSequence(db.Model):
+    __tablename__ = 'invoice_sequences'
+    
+    school_id = db.Column(db.String(36), db.ForeignKey('schools.id'), primary_key=True)
+    prefix = db.Column(db.String(30), nullable=False)
+    next_value = db.Column(db.Integer, nullable=False, default=1)
+    
+    def __repr__(self):
+        return f'<InvoiceSequence {self.prefix}{self.next_value}>'
+
+class FeeRun(db.Model):
+    __tablename__ = 'fee_runs'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    school_id = db.Column(db.String(36), db.ForeignKey('schools.id'), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    currency = db.Column(db.String(10), nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+    filters = db.Column(db.JSON, nullable=False, default=dict)  # class_ids, statuses, student_ids
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    cursor = db.Column(db.String(36))  # Last student invoiced; the run resumes after it
+    invoices_created = db.Column(db.Integer, nullable=False, default=0)
+    elapsed_seconds = db.Column(db.Float, nullable=False, default=0)
+    error = db.Column(db.Text)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_fee_runs_school_id_created_at_id', 'school_id', 'created_at', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<FeeRun {self.id} {self.status}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'school_id': self.school_id,
+            'description': self.description,
+            'amount': float(self.amount) if self.amount else None,
+            'currency': self.currency,
+            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'filters': self.filters,
+            'status': self.status,
+            'invoices_created': self.invoices_created,
+            'elapsed_seconds': round(self.elapsed_seconds or 0, 3),
+            'invoices_per_second': round(self.invoices_created / self.elapsed_seconds, 1) if self.elapsed_seconds else None,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class TimetableGeneration(db.Model):
+    __tablename__ = 'timetable_generations'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    school_id = db.Column(db.String(36), db.ForeignKey('schools.id'), nullable=False)
+    options = db.Column(db.JSON, nullable=False)  # The request body, validated again when it runs
+    dry_run = db.Column(db.Boolean, nullable=False, default=False)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, completed, failed
+    result = db.Column(db.JSON)  # Counts and elapsed time; the timetables of a dry run, the clashes of a failure
+    error = db.Column(db.Text)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TimetableGeneration {self.id} {self.status}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'school_id': self.school_id,
+            'dry_run': self.dry_run,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -184,6 +432,11 @@ class Document(db.Model):
     # Relationships
     uploader = db.relationship('SchoolUser', backref='uploaded_documents', lazy=True)
     
+    __table_args__ = (
+        db.Index('idx_documents_school_id', 'school_id'),
+        db.Index('idx_documents_student_id', 'student_id'),
+    )
+    
     def __repr__(self):
         return f'<Document {self.title}>'
     
@@ -223,6 +476,10 @@ class Announcement(db.Model):
     # Relationships
     author = db.relationship('SchoolUser', backref='announcements', lazy=True)
     
+    __table_args__ = (
+        db.Index('idx_announcements_school_id_created_at_id', 'school_id', 'created_at', 'id'),
+    )
+    
     def __repr__(self):
         return f'<Announcement {self.title}>'
     
@@ -259,6 +516,12 @@ class Message(db.Model):
     sender = db.relationship('SchoolUser', foreign_keys=[sender_id], backref='sent_messages', lazy=True)
     recipient = db.relationship('SchoolUser', foreign_keys=[recipient_id], backref='received_messages', lazy=True)
     
+    __table_args__ = (
+        # Keyset order of the inbox and outbox, (created_at, id) within a user
+        db.Index('idx_messages_recipient_id_created_at_id', 'recipient_id', 'created_at', 'id'),
+        db.Index('idx_messages_sender_id_created_at_id', 'sender_id', 'created_at', 'id'),
+    )
+    
     def __repr__(self):
         return f'<Message {self.subject}>'
     
@@ -275,3 +538,21 @@ class Message(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# Unread messages per recipient, adjusted in the same transaction as every
+# change to a message's read state (see src/services/messages.py)
+class MessageUnreadCount(db.Model):
+    __tablename__ = 'message_unread_counts'
+    
+    user_id = db.Column(db.String(36), db.ForeignKey('school_users.id'), primary_key=True)
+    school_id = db.Column(db.String(36), db.ForeignKey('schools.id'), nullable=False)
+    unread = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<MessageUnreadCount {self.user_id}={self.unread}>'
+    
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'school_id': self.school_id,
+            'unread': self.unread
+        }
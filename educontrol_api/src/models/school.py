@@ -1,9 +1,7 @@
-from flask_sqlalchemy import SQLAlchemy
+from src.extensions import db
 from datetime import datetime
 import uuid
 
-db = SQLAlchemy()
-
 class School(db.Model):
     __tablename__ = 'schools'
     
@@ -66,6 +64,13 @@ class SchoolUser(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_school_users_school_id_created_at_id', 'school_id', 'created_at', 'id'),
+        db.Index('idx_school_users_school_id_role', 'school_id', 'role'),
+        # Emails are matched case-insensitively, e.g. by the roster import
+        db.Index('idx_school_users_school_id_lower_email', 'school_id', db.text('lower(email)')),
+    )
+    
     def __repr__(self):
         return f'<SchoolUser {self.first_name} {self.last_name}>'
     
@@ -99,6 +104,10 @@ class AcademicYear(db.Model):
     # Relationships
     classes = db.relationship('SchoolClass', backref='academic_year', lazy=True)
     
+    __table_args__ = (
+        db.Index('idx_academic_years_school_id', 'school_id'),
+    )
+    
     def __repr__(self):
         return f'<AcademicYear {self.name}>'
     
@@ -130,6 +139,10 @@ class SchoolClass(db.Model):
     # Relationships
     students = db.relationship('Student', backref='school_class', lazy=True)
     
+    __table_args__ = (
+        db.Index('idx_school_classes_school_id', 'school_id'),
+    )
+    
     def __repr__(self):
         return f'<SchoolClass {self.name}>'
     
@@ -158,6 +171,10 @@ class Subject(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_subjects_school_id', 'school_id'),
+    )
+    
     def __repr__(self):
         return f'<Subject {self.name}>'
     
@@ -1,9 +1,7 @@
-from flask_sqlalchemy import SQLAlchemy
+from src.extensions import db
 from datetime import datetime, date
 import uuid
 
-db = SQLAlchemy()
-
 class Student(db.Model):
     __tablename__ = 'students'
     
@@ -30,6 +28,13 @@ class Student(db.Model):
     invoices = db.relationship('Invoice', backref='student', lazy=True, cascade='all, delete-orphan')
     documents = db.relationship('Document', backref='student', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        db.Index('idx_students_school_id_created_at_id', 'school_id', 'created_at', 'id'),
+        db.Index('idx_students_school_id_id', 'school_id', 'id'),
+        db.Index('idx_students_class_id', 'class_id'),
+        db.Index('idx_students_user_id', 'user_id'),
+    )
+    
     def __repr__(self):
         return f'<Student {self.student_id}>'
     
@@ -72,6 +77,11 @@ class Teacher(db.Model):
     timetables = db.relationship('Timetable', backref='teacher', lazy=True)
     grades_given = db.relationship('Grade', backref='teacher', lazy=True)
     
+    __table_args__ = (
+        db.Index('idx_teachers_school_id_created_at_id', 'school_id', 'created_at', 'id'),
+        db.Index('idx_teachers_user_id', 'user_id'),
+    )
+    
     def __repr__(self):
         return f'<Teacher {self.employee_id}>'
     
@@ -94,6 +104,7 @@ class ParentStudentRelationship(db.Model):
     __tablename__ = 'parent_student_relationships'
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    school_id = db.Column(db.String(36), db.ForeignKey('schools.id'), nullable=False)
     parent_id = db.Column(db.String(36), db.ForeignKey('school_users.id'), nullable=False)
     student_id = db.Column(db.String(36), db.ForeignKey('students.id'), nullable=False)
     relationship = db.Column(db.String(50), nullable=False)  # father, mother, guardian, etc.
@@ -103,7 +114,11 @@ class ParentStudentRelationship(db.Model):
     # Relationships
     parent = db.relationship('SchoolUser', backref='student_relationships', lazy=True)
     
-    __table_args__ = (db.UniqueConstraint('parent_id', 'student_id', name='unique_parent_student'),)
+    __table_args__ = (
+        db.UniqueConstraint('parent_id', 'student_id', name='unique_parent_student'),
+        db.Index('idx_parent_student_relationships_school_id', 'school_id'),
+        db.Index('idx_parent_student_relationships_student_id', 'student_id'),
+    )
     
     def __repr__(self):
         return f'<ParentStudentRelationship {self.relationship}>'
@@ -111,6 +126,7 @@ class ParentStudentRelationship(db.Model):
     def to_dict(self):
         return {
             'id': self.id,
+            'school_id': self.school_id,
             'parent_id': self.parent_id,
             'student_id': self.student_id,
             'relationship': self.relationship,
@@ -125,6 +141,7 @@ class ClassSubject(db.Model):
     class_id = db.Column(db.String(36), db.ForeignKey('school_classes.id'), nullable=False)
     subject_id = db.Column(db.String(36), db.ForeignKey('subjects.id'), nullable=False)
     teacher_id = db.Column(db.String(36), db.ForeignKey('teachers.id'))
+    periods_per_week = db.Column(db.Integer)  # Lessons per week for the timetable generator
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -142,6 +159,7 @@ class ClassSubject(db.Model):
             'class_id': self.class_id,
             'subject_id': self.subject_id,
             'teacher_id': self.teacher_id,
+            'periods_per_week': self.periods_per_week,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
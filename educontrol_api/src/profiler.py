@@ -0,0 +1,175 @@
+import bisect
+import json
+import logging
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger('educontrol.profiler')
+
+# Upper bounds of the per-endpoint histogram buckets
+DURATION_BUCKETS_MS = [1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+QUERY_COUNT_BUCKETS = [0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500]
+
+
+class Histogram:
+    """Counts of observations per bucket, with their sum"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def to_dict(self):
+        """[upper bound, cumulative count] pairs, as in Prometheus' le buckets"""
+        cumulative, buckets = 0, []
+        for bound, count in zip(self.bounds + ['+Inf'], self.counts):
+            cumulative += count
+            buckets.append([bound, cumulative])
+        return {'buckets': buckets, 'count': cumulative, 'sum': round(self.sum, 3)}
+
+
+class EndpointStats:
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS_MS)
+        self.db_time = Histogram(DURATION_BUCKETS_MS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.max_queries = 0
+
+    def to_dict(self):
+        duration = self.duration.to_dict()
+        return {
+            'requests': duration['count'],
+            'duration_ms': duration,
+            'db_ms': self.db_time.to_dict(),
+            'queries': self.queries.to_dict(),
+            'max_queries': self.max_queries,
+        }
+
+
+class RequestProfile:
+    """SQL executed while serving one request"""
+
+    def __init__(self, keep):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = []  # (seconds, statement, parameters), longest first
+        self.keep = keep
+
+    def record(self, seconds, statement, parameters):
+        self.queries += 1
+        self.db_time += seconds
+        if len(self.slowest) < self.keep or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, statement, parameters))
+            self.slowest.sort(key=lambda entry: entry[0], reverse=True)
+            del self.slowest[self.keep:]
+
+
+def redact(parameters):
+    """Parameter types in place of their values, which may hold personal data"""
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return f'{len(parameters)} parameter sets'  # executemany
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+class SQLProfiler:
+    """Opt-in per-request SQL instrumentation.
+
+    Engine events time every statement and charge it to the request being
+    served. Each response then carries a Server-Timing header with the
+    request's query count and database time, requests slower than
+    PROFILER_SLOW_REQUEST_MS are logged as JSON with their slowest
+    statements, and every request feeds per-endpoint histograms served by
+    /api/profiler/stats. Being app-wide hooks, they cover every blueprint.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_request_ms = 500
+        self.keep_statements = 5
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PROFILER_ENABLED', False)
+        self.slow_request_ms = app.config.get('PROFILER_SLOW_REQUEST_MS', 500)
+        self.keep_statements = app.config.get('PROFILER_SLOW_STATEMENTS', 5)
+        app.extensions['profiler'] = self
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            engine = app.extensions['sqlalchemy'].engine
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        g.sql_profile = RequestProfile(self.keep_statements)
+
+    def _after_request(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        duration_ms = (time.perf_counter() - profile.started) * 1000
+        db_ms = profile.db_time * 1000
+        response.headers.add('Server-Timing',
+                             f'db;dur={db_ms:.1f};desc="{profile.queries} queries", app;dur={duration_ms:.1f}')
+
+        endpoint = f'{request.method} {request.url_rule.rule}' if request.url_rule else 'unmatched'
+        self._observe(endpoint, duration_ms, db_ms, profile.queries)
+        if duration_ms >= self.slow_request_ms:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'endpoint': endpoint,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration_ms, 1),
+                'db_ms': round(db_ms, 1),
+                'queries': profile.queries,
+                'slowest': [{'duration_ms': round(seconds * 1000, 2), 'statement': statement,
+                             'parameters': redact(parameters)}
+                            for seconds, statement, parameters in profile.slowest],
+            }))
+        return response
+
+    def _observe(self, endpoint, duration_ms, db_ms, queries):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.duration.observe(duration_ms)
+            stats.db_time.observe(db_ms)
+            stats.queries.observe(queries)
+            stats.max_queries = max(stats.max_queries, queries)
+
+    def stats(self):
+        """Histograms of request time, database time and query count per endpoint"""
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in sorted(self._endpoints.items())}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, so a failed statement leaves nothing behind
+    context._profiler_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Statements outside a request (CLI commands, background threads) are not charged
+    if has_request_context():
+        profile = g.get('sql_profile')
+        if profile is not None:
+            profile.record(time.perf_counter() - context._profiler_started, statement, parameters)
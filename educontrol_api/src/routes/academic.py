@@ -1,50 +1,65 @@
-from flask import Blueprint, jsonify, request
-from src.models.academic import Timetable, Attendance, Grade, Invoice, Document, Announcement, Message, db
-from src.models.student import Student
-from datetime import datetime, time
+from flask import Blueprint, current_app, jsonify, request, url_for
+from src.extensions import cache
+from src.models.academic import Timetable, TimetableGeneration, Attendance, AttendanceClassDaily, AttendanceStudentDaily, Grade, GradeBand, Invoice, Document, Announcement, Message, db
+from src.models.school import AcademicYear, SchoolClass, Subject
+from src.models.student import Student, Teacher
+from src.services.attendance_rollups import refresh_attendance_rollups, student_attendance_rows
+from src.services.fee_runs import allocate_invoice_numbers, invoice_prefix
+from src.services.timetable_generator import GenerationError, prepare_generation, start_generation
+from src.services.timetables import TimetableIndex, describe_conflicts, parse_entry, saved_conflicts
+from src.utils.analytics import ATTENDANCE_STATUSES, PERIODS, attendance_rate, period_start
+from src.utils.bulk import upsert
+from src.utils.export import EXPORT_FORMATS, stream_export
+from src.utils.grading import DEFAULT_GRADE_BANDS, GradeScale, grade_batch, to_decimal
+from src.utils.pagination import paginate
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from datetime import date, datetime, time
+import csv
+import io
+import uuid
 
 academic_bp = Blueprint('academic', __name__)
 
+MAX_BULK_ATTENDANCE = 1000
+MAX_BULK_GRADES = 5000
+MAX_TIMETABLE_VALIDATE = 5000
+
+# group_by values of the attendance summary and the column each one groups on
+ATTENDANCE_SUMMARY_GROUPS = {'student': 'student_id', 'class': 'class_id', 'day': None}
+
+# Columns of a gradebook sheet that may be set once for every row
+GRADE_SHEET_FIELDS = ['subject_id', 'class_id', 'academic_year_id', 'assessment_type',
+                      'assessment_name', 'max_score', 'date_assessed', 'teacher_id']
+
 # Timetable endpoints
 @academic_bp.route('/schools/<school_id>/timetables', methods=['GET'])
+@cache.cached('timetables')
 def get_timetables(school_id):
-    """Get all timetables for a school"""
-    timetables = Timetable.query.filter_by(school_id=school_id).all()
-    return jsonify([timetable.to_dict() for timetable in timetables])
+    """Get timetables for a school, one page at a time"""
+    query = Timetable.query.filter_by(school_id=school_id)
+    return paginate(query, Timetable)
 
 @academic_bp.route('/schools/<school_id>/timetables', methods=['POST'])
 def create_timetable(school_id):
     """Create a new timetable entry"""
     data = request.json
     
-    # Validate required fields
-    required_fields = ['class_id', 'subject_id', 'day_of_week', 'start_time', 'end_time']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({'error': f'Missing required field: {field}'}), 400
-    
     try:
-        start_time = datetime.strptime(data['start_time'], '%H:%M').time()
-        end_time = datetime.strptime(data['end_time'], '%H:%M').time()
-    except ValueError:
-        return jsonify({'error': 'Invalid time format. Use HH:MM'}), 400
+        entry = parse_entry(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if not (1 <= data['day_of_week'] <= 7):
-        return jsonify({'error': 'day_of_week must be between 1 (Monday) and 7 (Sunday)'}), 400
+    # Reject double-booking of the teacher, room or class
+    conflicts = saved_conflicts(db.session, school_id, entry)
+    if conflicts:
+        return jsonify({'error': 'Timetable conflict', 'conflicts': describe_conflicts(conflicts)}), 409
     
-    timetable = Timetable(
-        school_id=school_id,
-        class_id=data['class_id'],
-        subject_id=data['subject_id'],
-        teacher_id=data.get('teacher_id'),
-        day_of_week=data['day_of_week'],
-        start_time=start_time,
-        end_time=end_time,
-        room=data.get('room')
-    )
+    timetable = Timetable(school_id=school_id, **entry)
     
     db.session.add(timetable)
     db.session.commit()
+    cache.invalidate(school_id, 'timetables')
     
     return jsonify(timetable.to_dict()), 201
 
@@ -71,30 +86,110 @@ def update_timetable(school_id, timetable_id):
             else:
                 setattr(timetable, field, data[field])
     
+    if timetable.start_time >= timetable.end_time:
+        db.session.rollback()
+        return jsonify({'error': 'start_time must be before end_time'}), 400
+    
+    # Reject double-booking of the teacher, room or class
+    entry = {field: getattr(timetable, field) for field in ['class_id', 'teacher_id', 'room', 'day_of_week', 'start_time', 'end_time']}
+    with db.session.no_autoflush:
+        conflicts = saved_conflicts(db.session, school_id, entry, exclude_id=timetable.id)
+    if conflicts:
+        db.session.rollback()
+        return jsonify({'error': 'Timetable conflict', 'conflicts': describe_conflicts(conflicts)}), 409
+    
     timetable.updated_at = datetime.utcnow()
     db.session.commit()
+    cache.invalidate(school_id, 'timetables')
     
     return jsonify(timetable.to_dict())
 
+@academic_bp.route('/schools/<school_id>/timetables/validate', methods=['POST'])
+def validate_timetables(school_id):
+    """Check a batch of timetable entries for errors and double-booking without saving them"""
+    data = request.json
+    
+    entries = data.get('entries') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'entries must be a non-empty list'}), 400
+    if len(entries) > MAX_TIMETABLE_VALIDATE:
+        return jsonify({'error': f'At most {MAX_TIMETABLE_VALIDATE} entries per request'}), 400
+    
+    # With replace, the batch is checked against itself only, as a new term's timetable
+    if data.get('replace'):
+        index = TimetableIndex()
+    else:
+        index = TimetableIndex.for_school(db.session, school_id)
+    
+    errors = []
+    conflicts = []
+    for position, item in enumerate(entries):
+        if not isinstance(item, dict):
+            errors.append({'index': position, 'error': 'Entry must be an object'})
+            continue
+        try:
+            entry = parse_entry(item)
+        except ValueError as e:
+            errors.append({'index': position, 'error': str(e)})
+            continue
+        found = index.check_and_add(entry, position)
+        if found:
+            conflicts.append({'index': position, 'conflicts': describe_conflicts(found)})
+    
+    return jsonify({'valid': not errors and not conflicts, 'errors': errors, 'conflicts': conflicts})
+
+@academic_bp.route('/schools/<school_id>/timetables/generate', methods=['POST'])
+def generate_timetables(school_id):
+    """Start generating a conflict-free timetable from the class-subject assignments"""
+    try:
+        prepare_generation(db.session, school_id, request.json)
+    except GenerationError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    generation = TimetableGeneration(
+        school_id=school_id,
+        options=request.json,
+        dry_run=request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    )
+    db.session.add(generation)
+    db.session.commit()
+    
+    # The search runs in the background; the generation's URL reports its result
+    response = jsonify(generation.to_dict())
+    start_generation(current_app._get_current_object(), generation.id)
+    location = url_for('academic.get_timetable_generation', school_id=school_id, generation_id=generation.id)
+    return response, 202, {'Location': location}
+
+@academic_bp.route('/schools/<school_id>/timetables/generations/<generation_id>', methods=['GET'])
+def get_timetable_generation(school_id, generation_id):
+    """Get a timetable generation with its result"""
+    generation = TimetableGeneration.query.filter_by(id=generation_id, school_id=school_id).first_or_404()
+    return jsonify(generation.to_dict())
+
 @academic_bp.route('/schools/<school_id>/timetables/<timetable_id>', methods=['DELETE'])
 def delete_timetable(school_id, timetable_id):
     """Delete a timetable entry"""
     timetable = Timetable.query.filter_by(id=timetable_id, school_id=school_id).first_or_404()
     db.session.delete(timetable)
     db.session.commit()
+    cache.invalidate(school_id, 'timetables')
     return '', 204
 
 # Attendance endpoints
 @academic_bp.route('/schools/<school_id>/attendance', methods=['GET'])
 def get_attendance(school_id):
     """Get attendance records for a school"""
+    export_format = request.args.get('format')
+    if export_format and export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Invalid format. Must be one of: {list(EXPORT_FORMATS)}'}), 400
+    
     # Filter by date range if provided
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     student_id = request.args.get('student_id')
     class_id = request.args.get('class_id')
     
-    query = db.session.query(Attendance).join(Student).filter(Student.school_id == school_id)
+    query = Attendance.query.filter(Attendance.school_id == school_id)
     
     if start_date:
         try:
@@ -116,8 +211,9 @@ def get_attendance(school_id):
     if class_id:
         query = query.filter(Attendance.class_id == class_id)
     
-    attendance_records = query.all()
-    return jsonify([record.to_dict() for record in attendance_records])
+    if export_format:
+        return stream_export(query, Attendance, export_format, 'attendance')
+    return paginate(query, Attendance)
 
 @academic_bp.route('/schools/<school_id>/attendance', methods=['POST'])
 def create_attendance(school_id):
@@ -145,6 +241,7 @@ def create_attendance(school_id):
         return jsonify({'error': f'Invalid status. Must be one of: {valid_statuses}'}), 400
     
     attendance = Attendance(
+        school_id=school_id,
         student_id=data['student_id'],
         class_id=data['class_id'],
         subject_id=data.get('subject_id'),
@@ -155,20 +252,199 @@ def create_attendance(school_id):
     )
     
     db.session.add(attendance)
+    db.session.flush()
+    refresh_attendance_rollups(db.session, school_id, [(attendance.student_id, attendance.class_id, attendance_date)])
     db.session.commit()
     
     return jsonify(attendance.to_dict()), 201
 
+@academic_bp.route('/schools/<school_id>/attendance/bulk', methods=['POST'])
+def bulk_create_attendance(school_id):
+    """Mark attendance for many students in one transaction"""
+    data = request.json
+    
+    records = data.get('records') if isinstance(data, dict) else None
+    if not isinstance(records, list) or not records:
+        return jsonify({'error': 'records must be a non-empty list'}), 400
+    if len(records) > MAX_BULK_ATTENDANCE:
+        return jsonify({'error': f'At most {MAX_BULK_ATTENDANCE} records per request'}), 400
+    
+    # Top-level class_id, subject_id, date and marked_by apply to every record
+    defaults = {field: data[field] for field in ['class_id', 'subject_id', 'date', 'marked_by'] if field in data}
+    
+    valid_statuses = ['present', 'absent', 'late', 'excused']
+    errors = []
+    rows = {}
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append({'index': index, 'error': 'Record must be an object'})
+            continue
+        record = {**defaults, **record}
+        
+        missing = [field for field in ['student_id', 'class_id', 'date', 'status'] if not record.get(field)]
+        if missing:
+            errors.append({'index': index, 'error': f'Missing required field: {missing[0]}'})
+            continue
+        
+        try:
+            attendance_date = datetime.strptime(record['date'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'error': 'Invalid date format. Use YYYY-MM-DD'})
+            continue
+        
+        if record['status'] not in valid_statuses:
+            errors.append({'index': index, 'error': f'Invalid status. Must be one of: {valid_statuses}'})
+            continue
+        
+        # A later record for the same slot wins
+        key = (record['student_id'], record['class_id'], record.get('subject_id'), attendance_date)
+        rows[key] = (index, {
+            'school_id': school_id,
+            'student_id': record['student_id'],
+            'class_id': record['class_id'],
+            'subject_id': record.get('subject_id'),
+            'date': attendance_date,
+            'status': record['status'],
+            'notes': record.get('notes'),
+            'marked_by': record.get('marked_by'),
+        })
+    
+    # Validate school membership for every student with a single IN query
+    student_ids = {key[0] for key in rows}
+    known_students = set()
+    if student_ids:
+        known_students = {student_id for (student_id,) in db.session.query(Student.id).filter(
+            Student.school_id == school_id,
+            Student.id.in_(student_ids)
+        )}
+    for key in list(rows):
+        if key[0] not in known_students:
+            index, _ = rows.pop(key)
+            errors.append({'index': index, 'error': 'Student not found in this school'})
+    
+    # NULLs never collide in unique_attendance, so whole-day records that
+    # already exist are updated by primary key instead of upserted
+    existing_ids = {}
+    daily_keys = [key for key in rows if key[2] is None]
+    if daily_keys:
+        existing = db.session.query(
+            Attendance.id, Attendance.student_id, Attendance.class_id, Attendance.date
+        ).filter(
+            Attendance.school_id == school_id,
+            Attendance.subject_id.is_(None),
+            Attendance.student_id.in_({key[0] for key in daily_keys}),
+            Attendance.date.in_({key[3] for key in daily_keys})
+        )
+        existing_ids = {(student_id, class_id, None, day): attendance_id
+                        for attendance_id, student_id, class_id, day in existing}
+    
+    now = datetime.utcnow()
+    inserts = []
+    updates = []
+    for key, (_, row) in rows.items():
+        if key in existing_ids:
+            updates.append({'id': existing_ids[key], 'status': row['status'],
+                            'notes': row['notes'], 'marked_by': row['marked_by']})
+        else:
+            inserts.append({'id': str(uuid.uuid4()), 'created_at': now, **row})
+    
+    try:
+        upsert(db.session, Attendance, inserts,
+               index_elements=['student_id', 'class_id', 'subject_id', 'date'],
+               update_columns=['status', 'notes', 'marked_by'])
+        if updates:
+            db.session.execute(update(Attendance), updates)
+        refresh_attendance_rollups(db.session, school_id, [(key[0], key[1], key[3]) for key in rows])
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return jsonify({'error': 'Could not save attendance records'}), 500
+    
+    errors.sort(key=lambda error: error['index'])
+    return jsonify({'saved': len(rows), 'errors': errors})
+
+@academic_bp.route('/schools/<school_id>/attendance/summary', methods=['GET'])
+def get_attendance_summary(school_id):
+    """Count attendance statuses per student, class or day"""
+    group_by = request.args.get('group_by', 'student')
+    if group_by not in ATTENDANCE_SUMMARY_GROUPS:
+        return jsonify({'error': f'Invalid group_by. Must be one of: {list(ATTENDANCE_SUMMARY_GROUPS)}'}), 400
+    
+    # Without a period, student and class totals cover the whole date range
+    period = request.args.get('period', 'day' if group_by == 'day' else None)
+    if period is not None and period not in PERIODS:
+        return jsonify({'error': f'Invalid period. Must be one of: {PERIODS}'}), 400
+    
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    try:
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    # Per-class and per-day counts come from the smaller class rollup unless
+    # they have to be narrowed to one student
+    student_id = request.args.get('student_id')
+    class_id = request.args.get('class_id')
+    if (group_by == 'student' or student_id) and period in (None, 'month'):
+        # Whole months are read from the monthly rollup, already narrowed
+        rollup = student_attendance_rows(school_id, start_date, end_date, student_id, class_id).subquery().c
+        filters = []
+    else:
+        rollup = AttendanceStudentDaily if group_by == 'student' or student_id else AttendanceClassDaily
+        filters = [rollup.school_id == school_id]
+        if start_date:
+            filters.append(rollup.date >= start_date)
+        if end_date:
+            filters.append(rollup.date <= end_date)
+        if student_id:
+            filters.append(rollup.student_id == student_id)
+        if class_id:
+            filters.append(rollup.class_id == class_id)
+    
+    dimension = ATTENDANCE_SUMMARY_GROUPS[group_by]
+    keys = []
+    if dimension is not None:
+        keys.append(getattr(rollup, dimension).label(dimension))
+    if period is not None:
+        dialect = db.session.get_bind().dialect.name
+        keys.append(period_start(rollup.date, period, dialect).label('period'))
+    counts = [func.sum(getattr(rollup, status)).label(status) for status in ATTENDANCE_STATUSES]
+    
+    query = db.session.query(*keys, *counts).filter(*filters).group_by(*keys).order_by(*keys)
+    
+    summary = []
+    for row in query:
+        item = row._asdict()
+        if period is not None:
+            item['period'] = item['period'].isoformat()
+        item['total'] = sum(item[status] for status in ATTENDANCE_STATUSES)
+        item['attendance_rate'] = attendance_rate(item)
+        summary.append(item)
+    
+    return jsonify({
+        'group_by': group_by,
+        'period': period,
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None,
+        'summary': summary
+    })
+
 # Grades endpoints
 @academic_bp.route('/schools/<school_id>/grades', methods=['GET'])
 def get_grades(school_id):
     """Get grades for a school"""
+    export_format = request.args.get('format')
+    if export_format and export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Invalid format. Must be one of: {list(EXPORT_FORMATS)}'}), 400
+    
     student_id = request.args.get('student_id')
     subject_id = request.args.get('subject_id')
     class_id = request.args.get('class_id')
     academic_year_id = request.args.get('academic_year_id')
     
-    query = db.session.query(Grade).join(Student).filter(Student.school_id == school_id)
+    query = Grade.query.filter(Grade.school_id == school_id)
     
     if student_id:
         query = query.filter(Grade.student_id == student_id)
@@ -179,8 +455,9 @@ def get_grades(school_id):
     if academic_year_id:
         query = query.filter(Grade.academic_year_id == academic_year_id)
     
-    grades = query.all()
-    return jsonify([grade.to_dict() for grade in grades])
+    if export_format:
+        return stream_export(query, Grade, export_format, 'grades')
+    return paginate(query, Grade)
 
 @academic_bp.route('/schools/<school_id>/grades', methods=['POST'])
 def create_grade(school_id):
@@ -216,6 +493,7 @@ def create_grade(school_id):
         percentage = (float(data['score']) / float(data['max_score'])) * 100
     
     grade = Grade(
+        school_id=school_id,
         student_id=data['student_id'],
         subject_id=data['subject_id'],
         class_id=data['class_id'],
@@ -236,6 +514,184 @@ def create_grade(school_id):
     
     return jsonify(grade.to_dict()), 201
 
+@academic_bp.route('/schools/<school_id>/grade-bands', methods=['GET'])
+def get_grade_bands(school_id):
+    """Get the letter grade bands for a school"""
+    bands = GradeBand.query.filter_by(school_id=school_id).order_by(GradeBand.min_percentage.desc()).all()
+    if not bands:
+        return jsonify([{'grade': grade, 'min_percentage': float(minimum)} for grade, minimum in DEFAULT_GRADE_BANDS])
+    return jsonify([band.to_dict() for band in bands])
+
+@academic_bp.route('/schools/<school_id>/grade-bands', methods=['PUT'])
+def update_grade_bands(school_id):
+    """Replace the letter grade bands for a school"""
+    data = request.json
+    
+    if not isinstance(data, list) or not data:
+        return jsonify({'error': 'Grade bands must be a non-empty list'}), 400
+    
+    bands = []
+    for band in data:
+        if not isinstance(band, dict) or 'grade' not in band or 'min_percentage' not in band:
+            return jsonify({'error': 'Each band needs grade and min_percentage'}), 400
+        try:
+            minimum = to_decimal(band['min_percentage'])
+        except ValueError:
+            minimum = None
+        if minimum is None or not (0 <= minimum <= 100):
+            return jsonify({'error': 'min_percentage must be a number between 0 and 100'}), 400
+        bands.append(GradeBand(school_id=school_id, grade=band['grade'], min_percentage=minimum))
+    
+    if len({band.grade for band in bands}) != len(bands):
+        return jsonify({'error': 'Each grade may only appear once'}), 400
+    
+    GradeBand.query.filter_by(school_id=school_id).delete()
+    db.session.add_all(bands)
+    db.session.commit()
+    
+    bands.sort(key=lambda band: band.min_percentage, reverse=True)
+    return jsonify([band.to_dict() for band in bands])
+
+def _read_grade_sheet():
+    """Return (defaults, rows) from a JSON body or a CSV upload"""
+    if request.mimetype == 'text/csv':
+        return request.args.to_dict(), csv.DictReader(io.StringIO(request.get_data(as_text=True)))
+    if 'file' in request.files:
+        sheet = io.TextIOWrapper(request.files['file'].stream, encoding='utf-8-sig')
+        return request.form.to_dict(), csv.DictReader(sheet)
+    
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and isinstance(data.get('grades'), list):
+        return {key: value for key, value in data.items() if key != 'grades'}, data['grades']
+    return None, None
+
+@academic_bp.route('/schools/<school_id>/grades/bulk', methods=['POST'])
+def bulk_create_grades(school_id):
+    """Create grades for a whole gradebook sheet in one transaction"""
+    defaults, sheet = _read_grade_sheet()
+    if sheet is None:
+        return jsonify({'error': 'Send a JSON object with a grades list, or a CSV sheet'}), 400
+    
+    # Shared columns such as subject_id or max_score may be given once for the sheet
+    defaults = {field: defaults[field] for field in GRADE_SHEET_FIELDS if defaults.get(field) not in (None, '')}
+    
+    required_fields = ['student_id', 'subject_id', 'class_id', 'academic_year_id',
+                      'assessment_type', 'assessment_name', 'max_score']
+    valid_assessment_types = ['assignment', 'quiz', 'exam', 'project']
+    errors = []
+    rows = []
+    for index, record in enumerate(sheet):
+        if len(rows) + len(errors) >= MAX_BULK_GRADES:
+            return jsonify({'error': f'At most {MAX_BULK_GRADES} grades per request'}), 400
+        if not isinstance(record, dict):
+            errors.append({'index': index, 'error': 'Grade must be an object'})
+            continue
+        record = {**defaults, **{key: value for key, value in record.items() if value not in (None, '')}}
+        
+        missing = [field for field in required_fields if field not in record]
+        if missing:
+            errors.append({'index': index, 'error': f'Missing required field: {missing[0]}'})
+            continue
+        
+        if record['assessment_type'] not in valid_assessment_types:
+            errors.append({'index': index, 'error': f'Invalid assessment_type. Must be one of: {valid_assessment_types}'})
+            continue
+        
+        try:
+            score = to_decimal(record.get('score'))
+            max_score = to_decimal(record['max_score'])
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+            continue
+        if max_score <= 0 or (score is not None and score < 0):
+            errors.append({'index': index, 'error': 'max_score must be positive and score must not be negative'})
+            continue
+        
+        try:
+            date_assessed = date.today()
+            if record.get('date_assessed'):
+                date_assessed = datetime.strptime(record['date_assessed'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'error': 'Invalid date format. Use YYYY-MM-DD'})
+            continue
+        
+        rows.append((index, {
+            'school_id': school_id,
+            'student_id': record['student_id'],
+            'subject_id': record['subject_id'],
+            'class_id': record['class_id'],
+            'academic_year_id': record['academic_year_id'],
+            'assessment_type': record['assessment_type'],
+            'assessment_name': record['assessment_name'],
+            'score': score,
+            'max_score': max_score,
+            'grade': record.get('grade'),
+            'date_assessed': date_assessed,
+            'teacher_id': record.get('teacher_id'),
+            'comments': record.get('comments'),
+        }))
+    
+    # Validate every foreign key with one IN query per referenced table
+    references = [
+        ('student_id', Student, 'Student not found in this school'),
+        ('subject_id', Subject, 'Subject not found in this school'),
+        ('class_id', SchoolClass, 'Class not found in this school'),
+        ('academic_year_id', AcademicYear, 'Academic year not found in this school'),
+        ('teacher_id', Teacher, 'Teacher not found in this school'),
+    ]
+    for field, model, message in references:
+        wanted = {row[field] for _, row in rows if row[field] is not None}
+        if not wanted:
+            continue
+        found = {row_id for (row_id,) in db.session.query(model.id).filter(
+            model.school_id == school_id,
+            model.id.in_(wanted)
+        )}
+        valid_rows = []
+        for index, row in rows:
+            if row[field] is None or row[field] in found:
+                valid_rows.append((index, row))
+            else:
+                errors.append({'index': index, 'error': message})
+        rows = valid_rows
+    
+    # Percentages and letter grades for the whole sheet in one pass
+    percentages, letters = grade_batch(
+        [row['score'] for _, row in rows],
+        [row['max_score'] for _, row in rows],
+        GradeScale.for_school(school_id)
+    )
+    
+    now = datetime.utcnow()
+    grades = []
+    for (_, row), percentage, letter in zip(rows, percentages, letters):
+        grades.append({
+            **row,
+            'id': str(uuid.uuid4()),
+            'percentage': percentage,
+            'grade': row['grade'] or letter,
+            'created_at': now,
+            'updated_at': now,
+        })
+    
+    try:
+        if grades:
+            db.session.execute(insert(Grade), grades)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return jsonify({'error': 'Could not save grades'}), 500
+    
+    created = [{
+        'index': index,
+        'id': grade['id'],
+        'percentage': float(grade['percentage']) if grade['percentage'] is not None else None,
+        'grade': grade['grade']
+    } for (index, _), grade in zip(rows, grades)]
+    
+    errors.sort(key=lambda error: error['index'])
+    return jsonify({'created': created, 'errors': errors})
+
 # Invoice endpoints
 @academic_bp.route('/schools/<school_id>/invoices', methods=['GET'])
 def get_invoices(school_id):
@@ -250,8 +706,7 @@ def get_invoices(school_id):
     if status:
         query = query.filter_by(status=status)
     
-    invoices = query.all()
-    return jsonify([invoice.to_dict() for invoice in invoices])
+    return paginate(query, Invoice)
 
 @academic_bp.route('/schools/<school_id>/invoices', methods=['POST'])
 def create_invoice(school_id):
@@ -259,7 +714,7 @@ def create_invoice(school_id):
     data = request.json
     
     # Validate required fields
-    required_fields = ['student_id', 'invoice_number', 'description', 'amount', 'currency', 'due_date']
+    required_fields = ['student_id', 'description', 'amount', 'currency', 'due_date']
     for field in required_fields:
         if field not in data:
             return jsonify({'error': f'Missing required field: {field}'}), 400
@@ -274,10 +729,21 @@ def create_invoice(school_id):
     except ValueError:
         return jsonify({'error': 'Invalid due_date format. Use YYYY-MM-DD'}), 400
     
+    # Without a client-supplied number the next one of the school's sequence is used
+    invoice_number = data.get('invoice_number')
+    if invoice_number:
+        if not isinstance(invoice_number, str):
+            return jsonify({'error': 'invoice_number must be a string'}), 400
+        prefix = invoice_prefix(db.session, school_id)
+        if invoice_number.upper().startswith(prefix.upper()):
+            return jsonify({'error': f'invoice_number must not start with {prefix}, which is reserved for numbered invoices'}), 400
+    else:
+        invoice_number = allocate_invoice_numbers(db.session, school_id, 1)[0]
+    
     invoice = Invoice(
         school_id=school_id,
         student_id=data['student_id'],
-        invoice_number=data['invoice_number'],
+        invoice_number=invoice_number,
         description=data['description'],
         amount=data['amount'],
         currency=data['currency'],
@@ -286,7 +752,11 @@ def create_invoice(school_id):
     )
     
     db.session.add(invoice)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': f'invoice_number {invoice_number} already exists'}), 409
     
     return jsonify(invoice.to_dict()), 201
 
@@ -304,8 +774,7 @@ def get_announcements(school_id):
     if is_published is not None:
         query = query.filter_by(is_published=is_published.lower() == 'true')
     
-    announcements = query.order_by(Announcement.created_at.desc()).all()
-    return jsonify([announcement.to_dict() for announcement in announcements])
+    return paginate(query, Announcement, descending=True)
 
 @academic_bp.route('/schools/<school_id>/announcements', methods=['POST'])
 def create_announcement(school_id):
@@ -0,0 +1,33 @@
+from flask import Blueprint, Response, jsonify, request
+from src.extensions import events
+from src.models.school import SchoolUser
+from src.services.notifications import AUDIENCES, school_channels, user_channel
+
+events_bp = Blueprint('events', __name__)
+
+@events_bp.route('/schools/<school_id>/events', methods=['GET'])
+def stream_events(school_id):
+    """Stream new announcements and a user's messages as Server-Sent Events"""
+    if not events.enabled:
+        return jsonify({'error': 'Event streaming is disabled'}), 503
+    
+    audience = request.args.get('audience')
+    if audience and audience not in AUDIENCES:
+        return jsonify({'error': f'Invalid audience. Must be one of: {AUDIENCES}'}), 400
+    
+    channels = school_channels(school_id, audience)
+    user_id = request.args.get('user_id')
+    if user_id:
+        if not SchoolUser.query.filter_by(id=user_id, school_id=school_id).first():
+            return jsonify({'error': 'User not found in this school'}), 400
+        channels.append(user_channel(user_id))
+    
+    # The stream never touches the database, so no connection is held while it is open
+    subscription = events.subscribe(channels)
+    response = Response(events.stream(subscription), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # The stream's own cleanup never runs for a client gone before its first frame
+    response.call_on_close(subscription.close)
+    return response
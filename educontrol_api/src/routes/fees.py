@@ -0,0 +1,68 @@
+from flask import Blueprint, current_app, jsonify, request, url_for
+from src.models.academic import FeeRun, db
+from src.services.fee_runs import FeeRunError, claim_fee_run, parse_fee_run, start_fee_run
+from src.services.invoices import outstanding_by_currency
+from src.utils.pagination import paginate
+from datetime import date
+
+fees_bp = Blueprint('fees', __name__)
+
+def _started_response(run):
+    # The run continues in the background; its URL reports progress
+    response = jsonify(run.to_dict())
+    start_fee_run(current_app._get_current_object(), run.id)
+    location = url_for('fees.get_fee_run', school_id=run.school_id, fee_run_id=run.id)
+    return response, 202, {'Location': location}
+
+@fees_bp.route('/schools/<school_id>/fee-runs', methods=['GET'])
+def get_fee_runs(school_id):
+    """Get a school's fee runs, newest first"""
+    query = FeeRun.query.filter_by(school_id=school_id)
+    status = request.args.get('status')
+    if status:
+        query = query.filter_by(status=status)
+    
+    return paginate(query, FeeRun, descending=True, serialize=FeeRun.to_dict)
+
+@fees_bp.route('/schools/<school_id>/fee-runs', methods=['POST'])
+def create_fee_run(school_id):
+    """Start invoicing every matching student of a school with server-allocated invoice numbers"""
+    try:
+        values = parse_fee_run(request.json)
+    except FeeRunError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    run = FeeRun(school_id=school_id, **values)
+    db.session.add(run)
+    db.session.commit()
+    
+    claim_fee_run(db.session, run)
+    return _started_response(run)
+
+@fees_bp.route('/schools/<school_id>/fee-runs/<fee_run_id>', methods=['GET'])
+def get_fee_run(school_id, fee_run_id):
+    """Get a fee run with its progress and throughput"""
+    run = FeeRun.query.filter_by(id=fee_run_id, school_id=school_id).first_or_404()
+    return jsonify(run.to_dict())
+
+@fees_bp.route('/schools/<school_id>/fee-runs/<fee_run_id>/resume', methods=['POST'])
+def resume_fee_run(school_id, fee_run_id):
+    """Continue a failed or interrupted fee run after its last invoiced student"""
+    run = FeeRun.query.filter_by(id=fee_run_id, school_id=school_id).first_or_404()
+    
+    try:
+        claim_fee_run(db.session, run)
+    except FeeRunError as e:
+        return jsonify({'error': str(e)}), 409
+    
+    return _started_response(run)
+
+@fees_bp.route('/schools/<school_id>/invoices/outstanding', methods=['GET'])
+def get_outstanding_invoices(school_id):
+    """Get unpaid invoice counts and amounts per currency, split into pending and overdue"""
+    today = date.today()
+    return jsonify({
+        'school_id': school_id,
+        'as_of': today.isoformat(),
+        'currencies': outstanding_by_currency(db.session, school_id, today)
+    })
@@ -0,0 +1,114 @@
+from flask import Blueprint, jsonify, request
+from src.extensions import events
+from src.models.academic import Message, db
+from src.models.school import SchoolUser
+from src.services.messages import UNREAD, adjust_unread, mark_read, unread_count
+from src.services.notifications import user_channel
+from src.utils.pagination import paginate
+from sqlalchemy import and_, or_
+from datetime import datetime
+
+messages_bp = Blueprint('messages', __name__)
+
+MAX_MARK_READ = 1000
+
+def _unread_only():
+    return request.args.get('unread', '').lower() == 'true'
+
+@messages_bp.route('/schools/<school_id>/messages', methods=['POST'])
+def send_message(school_id):
+    """Send a message from one school user to another"""
+    data = request.json
+    
+    # Validate required fields
+    required_fields = ['sender_id', 'recipient_id', 'content']
+    for field in required_fields:
+        if field not in data:
+            return jsonify({'error': f'Missing required field: {field}'}), 400
+    
+    users = {user_id for (user_id,) in db.session.query(SchoolUser.id).filter(
+        SchoolUser.school_id == school_id,
+        SchoolUser.id.in_([data['sender_id'], data['recipient_id']])
+    )}
+    for field in ['sender_id', 'recipient_id']:
+        if data[field] not in users:
+            return jsonify({'error': f'{field} is not a user of this school'}), 400
+    
+    message = Message(
+        school_id=school_id,
+        sender_id=data['sender_id'],
+        recipient_id=data['recipient_id'],
+        subject=data.get('subject'),
+        content=data['content'],
+        is_read=False
+    )
+    
+    db.session.add(message)
+    adjust_unread(db.session, school_id, {message.recipient_id: 1})
+    db.session.commit()
+    
+    return jsonify(message.to_dict()), 201
+
+@messages_bp.route('/schools/<school_id>/users/<user_id>/messages/inbox', methods=['GET'])
+def get_inbox(school_id, user_id):
+    """Get messages received by a user, newest first, one page at a time"""
+    query = Message.query.filter_by(school_id=school_id, recipient_id=user_id)
+    if _unread_only():
+        query = query.filter(UNREAD)
+    
+    response = paginate(query, Message, descending=True)
+    if isinstance(response, tuple):
+        return response
+    response.headers['X-Unread-Count'] = str(unread_count(db.session, user_id))
+    return response
+
+@messages_bp.route('/schools/<school_id>/users/<user_id>/messages/outbox', methods=['GET'])
+def get_outbox(school_id, user_id):
+    """Get messages sent by a user, newest first, one page at a time"""
+    query = Message.query.filter_by(school_id=school_id, sender_id=user_id)
+    return paginate(query, Message, descending=True)
+
+@messages_bp.route('/schools/<school_id>/users/<user_id>/messages/thread/<other_user_id>', methods=['GET'])
+def get_thread(school_id, user_id, other_user_id):
+    """Get the conversation between two users, newest first, one page at a time"""
+    query = Message.query.filter(
+        Message.school_id == school_id,
+        or_(and_(Message.sender_id == user_id, Message.recipient_id == other_user_id),
+            and_(Message.sender_id == other_user_id, Message.recipient_id == user_id))
+    )
+    return paginate(query, Message, descending=True)
+
+@messages_bp.route('/schools/<school_id>/users/<user_id>/messages/unread-count', methods=['GET'])
+def get_unread_count(school_id, user_id):
+    """Get the number of unread messages of a user"""
+    return jsonify({'user_id': user_id, 'unread': unread_count(db.session, user_id)})
+
+@messages_bp.route('/schools/<school_id>/users/<user_id>/messages/read', methods=['POST'])
+def mark_messages_read(school_id, user_id):
+    """Mark a user's messages read: the given message_ids, those up to before, or all"""
+    data = request.json or {}
+    
+    message_ids = data.get('message_ids')
+    if message_ids is not None:
+        if not isinstance(message_ids, list) or not message_ids:
+            return jsonify({'error': 'message_ids must be a non-empty list'}), 400
+        if len(message_ids) > MAX_MARK_READ:
+            return jsonify({'error': f'At most {MAX_MARK_READ} message_ids per request'}), 400
+    
+    before = None
+    if data.get('before'):
+        try:
+            before = datetime.fromisoformat(data['before'])
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid before. Use an ISO 8601 timestamp'}), 400
+    
+    if message_ids is None and before is None and not data.get('all'):
+        return jsonify({'error': 'Provide message_ids, before or all'}), 400
+    
+    updated = mark_read(db.session, school_id, user_id, message_ids, before)
+    unread = unread_count(db.session, user_id)
+    # Other open sessions of the user update their badge
+    events.publish_after_commit(db.session, user_channel(user_id), 'unread', {'user_id': user_id, 'unread': unread})
+    db.session.commit()
+    
+    return jsonify({'updated': updated, 'unread': unread})
@@ -0,0 +1,30 @@
+from flask import Blueprint, jsonify, request
+from src.models.academic import Grade, GradeBand, db
+from src.models.school import SchoolClass
+from src.services.reports import ReportError, class_report, parse_weights
+from src.utils.conditional import collection_validators, is_not_modified, not_modified, with_validators
+
+reports_bp = Blueprint('reports', __name__)
+
+@reports_bp.route('/schools/<school_id>/classes/<class_id>/report', methods=['GET'])
+def get_class_report(school_id, class_id):
+    """Get subject averages, weighted totals and ranks for a class"""
+    school_class = SchoolClass.query.filter_by(id=class_id, school_id=school_id).first_or_404()
+    academic_year_id = request.args.get('academic_year_id', school_class.academic_year_id)
+    
+    try:
+        weights = parse_weights(request.args.get('weights'))
+    except ReportError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # The report only changes with its grades or the school's grade bands
+    grades = Grade.query.filter_by(school_id=school_id, class_id=class_id, academic_year_id=academic_year_id)
+    grades_etag, grades_modified = collection_validators(grades, Grade)
+    bands_etag, bands_modified = collection_validators(GradeBand.query.filter_by(school_id=school_id), GradeBand)
+    etag = f'{grades_etag}-{bands_etag}'
+    last_modified = max(filter(None, [grades_modified, bands_modified]), default=None)
+    if is_not_modified(etag, last_modified):
+        return not_modified(etag, last_modified)
+    
+    report = class_report(db.session, school_id, class_id, academic_year_id, weights)
+    return with_validators(jsonify(report), etag, last_modified)
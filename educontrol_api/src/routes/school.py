@@ -1,9 +1,17 @@
 from flask import Blueprint, jsonify, request
+from src.extensions import cache
+from src.models.academic import AttendanceClassDaily, AttendanceStudentDaily, AttendanceStudentMonthly
 from src.models.school import School, SchoolUser, AcademicYear, SchoolClass, Subject, db
+from src.utils.conditional import collection_response, resource_response
+from src.utils.pagination import paginate
+from sqlalchemy import delete
 from datetime import datetime
 
 school_bp = Blueprint('school', __name__)
 
+# Every cached namespace that belongs to a school
+SCHOOL_CACHE_NAMESPACES = ['school', 'academic_years', 'classes', 'subjects', 'timetables']
+
 @school_bp.route('/schools', methods=['GET'])
 def get_schools():
     """Get all schools"""
@@ -41,10 +49,11 @@ def create_school():
     return jsonify(school.to_dict()), 201
 
 @school_bp.route('/schools/<school_id>', methods=['GET'])
+@cache.cached('school')
 def get_school(school_id):
     """Get a specific school"""
     school = School.query.get_or_404(school_id)
-    return jsonify(school.to_dict())
+    return resource_response(school)
 
 @school_bp.route('/schools/<school_id>', methods=['PUT'])
 def update_school(school_id):
@@ -62,6 +71,7 @@ def update_school(school_id):
     
     school.updated_at = datetime.utcnow()
     db.session.commit()
+    cache.invalidate(school_id, 'school')
     
     return jsonify(school.to_dict())
 
@@ -69,16 +79,20 @@ def update_school(school_id):
 def delete_school(school_id):
     """Delete a school"""
     school = School.query.get_or_404(school_id)
+    # The attendance rollups have no cascade from the school; clear them in the same transaction
+    for rollup in [AttendanceStudentDaily, AttendanceStudentMonthly, AttendanceClassDaily]:
+        db.session.execute(delete(rollup).where(rollup.school_id == school_id))
     db.session.delete(school)
     db.session.commit()
+    cache.invalidate(school_id, *SCHOOL_CACHE_NAMESPACES)
     return '', 204
 
 # School Users endpoints
 @school_bp.route('/schools/<school_id>/users', methods=['GET'])
 def get_school_users(school_id):
-    """Get all users in a school"""
-    users = SchoolUser.query.filter_by(school_id=school_id).all()
-    return jsonify([user.to_dict() for user in users])
+    """Get users in a school, one page at a time"""
+    query = SchoolUser.query.filter_by(school_id=school_id)
+    return paginate(query, SchoolUser)
 
 @school_bp.route('/schools/<school_id>/users', methods=['POST'])
 def create_school_user(school_id):
@@ -116,7 +130,7 @@ def create_school_user(school_id):
 def get_school_user(school_id, user_id):
     """Get a specific user in a school"""
     user = SchoolUser.query.filter_by(id=user_id, school_id=school_id).first_or_404()
-    return jsonify(user.to_dict())
+    return resource_response(user)
 
 @school_bp.route('/schools/<school_id>/users/<user_id>', methods=['PUT'])
 def update_school_user(school_id, user_id):
@@ -150,10 +164,11 @@ def delete_school_user(school_id, user_id):
 
 # Academic Years endpoints
 @school_bp.route('/schools/<school_id>/academic-years', methods=['GET'])
+@cache.cached('academic_years')
 def get_academic_years(school_id):
     """Get all academic years for a school"""
-    academic_years = AcademicYear.query.filter_by(school_id=school_id).all()
-    return jsonify([year.to_dict() for year in academic_years])
+    query = AcademicYear.query.filter_by(school_id=school_id)
+    return collection_response(query, AcademicYear)
 
 @school_bp.route('/schools/<school_id>/academic-years', methods=['POST'])
 def create_academic_year(school_id):
@@ -182,15 +197,17 @@ def create_academic_year(school_id):
     
     db.session.add(academic_year)
     db.session.commit()
+    cache.invalidate(school_id, 'academic_years')
     
     return jsonify(academic_year.to_dict()), 201
 
 # Classes endpoints
 @school_bp.route('/schools/<school_id>/classes', methods=['GET'])
+@cache.cached('classes')
 def get_school_classes(school_id):
     """Get all classes for a school"""
-    classes = SchoolClass.query.filter_by(school_id=school_id).all()
-    return jsonify([cls.to_dict() for cls in classes])
+    query = SchoolClass.query.filter_by(school_id=school_id)
+    return collection_response(query, SchoolClass)
 
 @school_bp.route('/schools/<school_id>/classes', methods=['POST'])
 def create_school_class(school_id):
@@ -214,15 +231,17 @@ def create_school_class(school_id):
     
     db.session.add(school_class)
     db.session.commit()
+    cache.invalidate(school_id, 'classes')
     
     return jsonify(school_class.to_dict()), 201
 
 # Subjects endpoints
 @school_bp.route('/schools/<school_id>/subjects', methods=['GET'])
+@cache.cached('subjects')
 def get_school_subjects(school_id):
     """Get all subjects for a school"""
-    subjects = Subject.query.filter_by(school_id=school_id).all()
-    return jsonify([subject.to_dict() for subject in subjects])
+    query = Subject.query.filter_by(school_id=school_id)
+    return collection_response(query, Subject)
 
 @school_bp.route('/schools/<school_id>/subjects', methods=['POST'])
 def create_school_subject(school_id):
@@ -245,6 +264,7 @@ def create_school_subject(school_id):
     
     db.session.add(subject)
     db.session.commit()
+    cache.invalidate(school_id, 'subjects')
     
     return jsonify(subject.to_dict()), 201
 
@@ -0,0 +1,31 @@
+from flask import Blueprint, jsonify, request
+from src.models.school import db
+from src.services.search import MAX_SEARCH_LIMIT, SEARCH_LIMIT, search_people
+from src.utils.pagination import PaginationError, parse_limit
+
+search_bp = Blueprint('search', __name__)
+
+VALID_ROLES = ['admin', 'teacher', 'parent', 'student']
+
+@search_bp.route('/schools/<school_id>/search', methods=['GET'])
+def search(school_id):
+    """Find a school's people by name, email, student_id or employee_id prefix"""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'Missing query parameter: q'}), 400
+    
+    roles = request.args.getlist('role')
+    for role in roles:
+        if role not in VALID_ROLES:
+            return jsonify({'error': f'Invalid role. Must be one of: {VALID_ROLES}'}), 400
+    
+    try:
+        limit = parse_limit(request.args.get('limit'), SEARCH_LIMIT, MAX_SEARCH_LIMIT)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    rows = search_people(db.session, school_id, q, roles, limit)
+    return jsonify([
+        {**user.to_dict(), 'student_id': student_id, 'employee_id': employee_id}
+        for user, student_id, employee_id in rows
+    ])
@@ -1,6 +1,13 @@
 from flask import Blueprint, jsonify, request
+from src.extensions import cache
 from src.models.student import Student, Teacher, ParentStudentRelationship, ClassSubject, db
-from src.models.school import SchoolUser
+from src.models.school import School, SchoolClass, SchoolUser
+from src.models.academic import Attendance
+from src.services.attendance_rollups import refresh_attendance_rollups
+from src.services.roster import ROSTER_FORMATS, RosterError, RosterImport, read_roster
+from src.services.timetable_generator import GenerationError, parse_periods_per_week
+from src.utils.conditional import collection_response, resource_response
+from src.utils.pagination import paginate
 from datetime import datetime
 
 student_bp = Blueprint('student', __name__)
@@ -8,9 +15,9 @@ student_bp = Blueprint('student', __name__)
 # Student endpoints
 @student_bp.route('/schools/<school_id>/students', methods=['GET'])
 def get_students(school_id):
-    """Get all students in a school"""
-    students = Student.query.filter_by(school_id=school_id).all()
-    return jsonify([student.to_dict() for student in students])
+    """Get students in a school, one page at a time"""
+    query = Student.query.filter_by(school_id=school_id)
+    return paginate(query, Student)
 
 @student_bp.route('/schools/<school_id>/students', methods=['POST'])
 def create_student(school_id):
@@ -62,7 +69,7 @@ def create_student(school_id):
 def get_student(school_id, student_id):
     """Get a specific student"""
     student = Student.query.filter_by(id=student_id, school_id=school_id).first_or_404()
-    return jsonify(student.to_dict())
+    return resource_response(student)
 
 @student_bp.route('/schools/<school_id>/students/<student_id>', methods=['PUT'])
 def update_student(school_id, student_id):
@@ -94,16 +101,24 @@ def update_student(school_id, student_id):
 def delete_student(school_id, student_id):
     """Delete a student"""
     student = Student.query.filter_by(id=student_id, school_id=school_id).first_or_404()
+    
+    # The student's attendance is deleted with them, so their rollup rows go too
+    attendance_keys = db.session.query(Attendance.student_id, Attendance.class_id, Attendance.date).filter(
+        Attendance.school_id == school_id,
+        Attendance.student_id == student_id
+    ).all()
     db.session.delete(student)
+    db.session.flush()
+    refresh_attendance_rollups(db.session, school_id, attendance_keys)
     db.session.commit()
     return '', 204
 
 # Teacher endpoints
 @student_bp.route('/schools/<school_id>/teachers', methods=['GET'])
 def get_teachers(school_id):
-    """Get all teachers in a school"""
-    teachers = Teacher.query.filter_by(school_id=school_id).all()
-    return jsonify([teacher.to_dict() for teacher in teachers])
+    """Get teachers in a school, one page at a time"""
+    query = Teacher.query.filter_by(school_id=school_id)
+    return paginate(query, Teacher)
 
 @student_bp.route('/schools/<school_id>/teachers', methods=['POST'])
 def create_teacher(school_id):
@@ -148,7 +163,7 @@ def create_teacher(school_id):
 def get_teacher(school_id, teacher_id):
     """Get a specific teacher"""
     teacher = Teacher.query.filter_by(id=teacher_id, school_id=school_id).first_or_404()
-    return jsonify(teacher.to_dict())
+    return resource_response(teacher)
 
 @student_bp.route('/schools/<school_id>/teachers/<teacher_id>', methods=['PUT'])
 def update_teacher(school_id, teacher_id):
@@ -171,6 +186,8 @@ def update_teacher(school_id, teacher_id):
     
     teacher.updated_at = datetime.utcnow()
     db.session.commit()
+    # Cached timetable pages embed the teacher with expand=teacher
+    cache.invalidate(school_id, 'timetables')
     
     return jsonify(teacher.to_dict())
 
@@ -180,16 +197,16 @@ def delete_teacher(school_id, teacher_id):
     teacher = Teacher.query.filter_by(id=teacher_id, school_id=school_id).first_or_404()
     db.session.delete(teacher)
     db.session.commit()
+    # Deleting the teacher sets teacher_id to NULL on their timetable entries
+    cache.invalidate(school_id, 'timetables')
     return '', 204
 
 # Parent-Student relationship endpoints
 @student_bp.route('/schools/<school_id>/parent-student-relationships', methods=['GET'])
 def get_parent_student_relationships(school_id):
     """Get all parent-student relationships in a school"""
-    relationships = db.session.query(ParentStudentRelationship).join(Student).filter(
-        Student.school_id == school_id
-    ).all()
-    return jsonify([rel.to_dict() for rel in relationships])
+    query = ParentStudentRelationship.query.filter_by(school_id=school_id)
+    return collection_response(query, ParentStudentRelationship)
 
 @student_bp.route('/schools/<school_id>/parent-student-relationships', methods=['POST'])
 def create_parent_student_relationship(school_id):
@@ -213,6 +230,7 @@ def create_parent_student_relationship(school_id):
         return jsonify({'error': 'Student not found'}), 400
     
     relationship = ParentStudentRelationship(
+        school_id=school_id,
         parent_id=data['parent_id'],
         student_id=data['student_id'],
         relationship=data['relationship'],
@@ -227,9 +245,9 @@ def create_parent_student_relationship(school_id):
 @student_bp.route('/schools/<school_id>/parent-student-relationships/<relationship_id>', methods=['DELETE'])
 def delete_parent_student_relationship(school_id, relationship_id):
     """Delete a parent-student relationship"""
-    relationship = db.session.query(ParentStudentRelationship).join(Student).filter(
-        ParentStudentRelationship.id == relationship_id,
-        Student.school_id == school_id
+    relationship = ParentStudentRelationship.query.filter_by(
+        id=relationship_id,
+        school_id=school_id
     ).first_or_404()
     
     db.session.delete(relationship)
@@ -240,11 +258,8 @@ def delete_parent_student_relationship(school_id, relationship_id):
 @student_bp.route('/schools/<school_id>/class-subjects', methods=['GET'])
 def get_class_subjects(school_id):
     """Get all class-subject assignments in a school"""
-    class_subjects = db.session.query(ClassSubject).join(
-        'school_class'
-    ).filter_by(school_id=school_id).all()
-    
-    return jsonify([cs.to_dict() for cs in class_subjects])
+    query = ClassSubject.query.join(ClassSubject.school_class).filter(SchoolClass.school_id == school_id)
+    return collection_response(query, ClassSubject)
 
 @student_bp.route('/schools/<school_id>/class-subjects', methods=['POST'])
 def create_class_subject(school_id):
@@ -257,10 +272,16 @@ def create_class_subject(school_id):
         if field not in data:
             return jsonify({'error': f'Missing required field: {field}'}), 400
     
+    try:
+        periods_per_week = parse_periods_per_week(data.get('periods_per_week'))
+    except GenerationError as e:
+        return jsonify({'error': str(e)}), 400
+    
     class_subject = ClassSubject(
         class_id=data['class_id'],
         subject_id=data['subject_id'],
-        teacher_id=data.get('teacher_id')
+        teacher_id=data.get('teacher_id'),
+        periods_per_week=periods_per_week
     )
     
     db.session.add(class_subject)
@@ -271,17 +292,20 @@ def create_class_subject(school_id):
 @student_bp.route('/schools/<school_id>/class-subjects/<class_subject_id>', methods=['PUT'])
 def update_class_subject(school_id, class_subject_id):
     """Update a class-subject assignment"""
-    class_subject = db.session.query(ClassSubject).join(
-        'school_class'
-    ).filter(
+    class_subject = ClassSubject.query.join(ClassSubject.school_class).filter(
         ClassSubject.id == class_subject_id,
-        'school_class.school_id' == school_id
+        SchoolClass.school_id == school_id
     ).first_or_404()
     
     data = request.json
     
     if 'teacher_id' in data:
         class_subject.teacher_id = data['teacher_id']
+    if 'periods_per_week' in data:
+        try:
+            class_subject.periods_per_week = parse_periods_per_week(data['periods_per_week'])
+        except GenerationError as e:
+            return jsonify({'error': str(e)}), 400
     
     db.session.commit()
     
@@ -290,14 +314,33 @@ def update_class_subject(school_id, class_subject_id):
 @student_bp.route('/schools/<school_id>/class-subjects/<class_subject_id>', methods=['DELETE'])
 def delete_class_subject(school_id, class_subject_id):
     """Delete a class-subject assignment"""
-    class_subject = db.session.query(ClassSubject).join(
-        'school_class'
-    ).filter(
+    class_subject = ClassSubject.query.join(ClassSubject.school_class).filter(
         ClassSubject.id == class_subject_id,
-        'school_class.school_id' == school_id
+        SchoolClass.school_id == school_id
     ).first_or_404()
     
     db.session.delete(class_subject)
     db.session.commit()
     return '', 204
 
+# Roster import
+@student_bp.route('/schools/<school_id>/roster/import', methods=['POST'])
+def import_roster(school_id):
+    """Import students and their parents from an uploaded CSV or XLSX roster"""
+    School.query.get_or_404(school_id)
+    
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'error': 'Missing roster file: file'}), 400
+    
+    fmt = request.args.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+    if fmt not in ROSTER_FORMATS:
+        return jsonify({'error': f'Invalid format. Must be one of: {ROSTER_FORMATS}'}), 400
+    dry_run = request.args.get('dry_run', '').lower() == 'true'
+    
+    try:
+        result = RosterImport(db.session, school_id, dry_run=dry_run).run(read_roster(upload.stream, fmt))
+    except RosterError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(result.summary()), 200 if dry_run else 201
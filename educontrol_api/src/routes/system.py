@@ -0,0 +1,14 @@
+from flask import Blueprint, jsonify
+from src.extensions import cache, profiler
+
+system_bp = Blueprint('system', __name__)
+
+@system_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get response cache hit and miss counts"""
+    return jsonify(cache.stats())
+
+@system_bp.route('/profiler/stats', methods=['GET'])
+def get_profiler_stats():
+    """Get per-endpoint histograms of request time, database time and query count"""
+    return jsonify({'enabled': profiler.enabled, 'endpoints': profiler.stats()})
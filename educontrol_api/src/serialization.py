@@ -0,0 +1,87 @@
+import json
+from functools import lru_cache
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Date, DateTime, Numeric, Time
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+
+def _expression(column, name):
+    """Python source that formats variable name the way to_dict formats column"""
+    if isinstance(column.type, (DateTime, Date)):
+        return f'{name}.isoformat() if {name} else None'
+    if isinstance(column.type, Time):
+        return f"{name}.strftime('%H:%M') if {name} else None"
+    if isinstance(column.type, Numeric):
+        return f'float({name}) if {name} else None'
+    return name
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(columns, skip=0):
+    """Generate a function that turns a row of columns into a to_dict-style dict.
+
+    columns is a tuple of Column objects and the row must hold their values
+    in the same order after skip leading values, e.g. a Row from
+    select(*columns). The function is generated once per column tuple, so
+    serializing a row costs one tuple unpack and one dict display instead
+    of a to_dict call per instance.
+    """
+    names = [f'v{i}' for i in range(len(columns))]
+    items = ', '.join(f'{column.name!r}: {_expression(column, name)}' for column, name in zip(columns, names))
+    unpack = ', '.join(['_'] * skip + names) + (',' if skip + len(names) == 1 else '')
+    source = f'def serialize(row):\n    {unpack} = row\n    return {{{items}}}\n'
+    namespace = {}
+    exec(compile(source, f'<serializer {columns[0].table.name}>', 'exec'), namespace)
+    return namespace['serialize']
+
+
+def model_columns(model):
+    """All columns of model in declaration order, which is also to_dict's key order"""
+    return tuple(model.__table__.columns)
+
+
+def serializer_for(model):
+    return compile_serializer(model_columns(model))
+
+
+def serialize_rows(model, rows):
+    """Serialize rows selected with model_columns(model)"""
+    serialize = serializer_for(model)
+    return [serialize(row) for row in rows]
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes compact responses with orjson.
+
+    Output is byte-for-byte what DefaultJSONProvider produces. Keys are
+    sorted, separators are compact, and non-JSON types go through the same
+    default() hook. Bodies that would contain non-ASCII characters fall back
+    to the stdlib encoder so they keep their \\uXXXX escapes.
+    """
+
+    def _orjson_options(self):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_SUBCLASS | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def response(self, *args, **kwargs):
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        if orjson is None or pretty:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = orjson.dumps(obj, default=self.default, option=self._orjson_options())
+        except TypeError:
+            # e.g. integers beyond 64 bits, which only the stdlib can encode
+            return super().response(*args, **kwargs)
+        if not body.isascii() and self.ensure_ascii:
+            body = json.dumps(obj, default=self.default, ensure_ascii=True, sort_keys=self.sort_keys,
+                              separators=(',', ':')).encode('ascii')
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,210 @@
+"""Daily and monthly attendance rollups.
+
+attendance_student_daily and attendance_class_daily hold one row of status
+counts per (student, class, day) and per (class, day);
+attendance_student_monthly sums the student rows per month. Writers call
+refresh_attendance_rollups() with the keys they touched before committing.
+The touched rollup rows are then recomputed in the same transaction, the
+daily ones from attendance and the monthly ones from the daily ones, so new
+records and status changes are reflected atomically.
+"""
+from datetime import timedelta
+
+from sqlalchemy import and_, case, delete, except_, func, insert, or_, select, union_all
+
+from src.models.academic import Attendance, AttendanceClassDaily, AttendanceStudentDaily, AttendanceStudentMonthly
+from src.utils.analytics import ATTENDANCE_STATUSES, period_start
+
+# Rollup model and the attendance columns it is grouped on, after school_id
+ROLLUPS = [
+    (AttendanceStudentDaily, ['student_id', 'class_id', 'date']),
+    (AttendanceClassDaily, ['class_id', 'date']),
+]
+
+# Keys of attendance_student_monthly after school_id; month is the first day of the month
+MONTHLY_KEYS = ['student_id', 'class_id', 'month']
+
+# Dates per statement when recomputing, to stay below bound-parameter limits
+REFRESH_CHUNK_SIZE = 500
+
+
+def _chunks(values, size):
+    values = sorted(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _dialect(executor):
+    # Sessions and migration connections both maintain the rollups
+    bind = executor.get_bind() if hasattr(executor, 'get_bind') else executor
+    return bind.dialect.name
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _aggregate(keys, *where, dialect=None):
+    """SELECT school_id, *keys and one count per status from attendance.
+
+    The month key is the first day of each record's month.
+    """
+    columns = [Attendance.school_id] + [
+        period_start(Attendance.date, 'month', dialect).label(key) if key == 'month' else getattr(Attendance, key)
+        for key in keys
+    ]
+    counts = [func.sum(case((Attendance.status == status, 1), else_=0)).label(status)
+              for status in ATTENDANCE_STATUSES]
+    return select(*columns, *counts).where(*where).group_by(*columns)
+
+
+def _recompute(executor, model, keys, *where):
+    """Replace model's rows matching where with fresh aggregates of attendance.
+
+    where is built from attendance columns that also exist on the rollup,
+    so the same predicate selects the rows to drop and the rows to rebuild.
+    """
+    rollup_where = [clause(model) for clause in where]
+    source_where = [clause(Attendance) for clause in where]
+    executor.execute(delete(model).where(*rollup_where))
+    executor.execute(insert(model).from_select(
+        ['school_id', *keys, *ATTENDANCE_STATUSES], _aggregate(keys, *source_where)
+    ))
+
+
+def _recompute_monthly(executor, school_id=None, students=None, months=None):
+    """Replace monthly rows with sums of the daily student rollup.
+
+    Only the rows of school_id, students and months are replaced when they
+    are given; the daily rows must be up to date already.
+    """
+    daily, monthly = AttendanceStudentDaily, AttendanceStudentMonthly
+    month = period_start(daily.date, 'month', _dialect(executor))
+    rollup_where, source_where = [], []
+    if school_id:
+        rollup_where.append(monthly.school_id == school_id)
+        source_where.append(daily.school_id == school_id)
+    if students is not None:
+        rollup_where.append(monthly.student_id.in_(students))
+        source_where.append(daily.student_id.in_(students))
+    if months is not None:
+        rollup_where.append(monthly.month.in_(months))
+        # Date ranges rather than the month expression, so the primary key narrows each student's rows
+        source_where.append(or_(*[and_(daily.date >= first, daily.date < _next_month(first)) for first in months]))
+    columns = [daily.school_id, daily.student_id, daily.class_id, month]
+    counts = [func.sum(getattr(daily, status)) for status in ATTENDANCE_STATUSES]
+    executor.execute(delete(monthly).where(*rollup_where))
+    executor.execute(insert(monthly).from_select(
+        ['school_id', *MONTHLY_KEYS, *ATTENDANCE_STATUSES],
+        select(*columns, *counts).where(*source_where).group_by(*columns)
+    ))
+
+
+def refresh_attendance_rollups(executor, school_id, records):
+    """Recompute the rollup rows for records after they were written.
+
+    records are (student_id, class_id, date) tuples of attendance rows that
+    were inserted, updated or deleted. Nothing is committed here.
+    """
+    records = set(records)
+    if not records:
+        return
+    students = {student_id for student_id, _, _ in records}
+    classes = {class_id for _, class_id, _ in records}
+    for dates in _chunks({day for _, _, day in records}, REFRESH_CHUNK_SIZE):
+        _recompute(executor, AttendanceStudentDaily, ['student_id', 'class_id', 'date'],
+                   lambda table: table.school_id == school_id,
+                   lambda table: table.student_id.in_(students),
+                   lambda table: table.date.in_(dates))
+        _recompute(executor, AttendanceClassDaily, ['class_id', 'date'],
+                   lambda table: table.school_id == school_id,
+                   lambda table: table.class_id.in_(classes),
+                   lambda table: table.date.in_(dates))
+    months = sorted({_month_start(day) for _, _, day in records})
+    _recompute_monthly(executor, school_id, students, months)
+
+
+def rebuild_attendance_rollups(executor, school_id=None):
+    """Recompute every rollup row, for one school or for all of them"""
+    where = [lambda table: table.school_id == school_id] if school_id else []
+    for model, keys in ROLLUPS:
+        _recompute(executor, model, keys, *where)
+    _recompute_monthly(executor, school_id)
+
+
+def rebuild_attendance_monthly(executor, school_id=None):
+    """Recompute the monthly rollup from the daily one, for one school or for all"""
+    _recompute_monthly(executor, school_id)
+
+
+def verify_attendance_rollups(executor, school_id=None):
+    """Compare the rollups with attendance and report drift.
+
+    Returns {table name: {school_id: number of keys that are missing,
+    stale or should not exist}}, empty for tables without drift. The
+    comparison runs in the database and only the counts are returned.
+    """
+    where = [lambda table: table.school_id == school_id] if school_id else []
+    dialect = _dialect(executor)
+    drift = {}
+    for model, keys in ROLLUPS + [(AttendanceStudentMonthly, MONTHLY_KEYS)]:
+        expected = _aggregate(keys, *[clause(Attendance) for clause in where], dialect=dialect)
+        actual = select(*[getattr(model, column) for column in ['school_id', *keys, *ATTENDANCE_STATUSES]]).where(
+            *[clause(model) for clause in where]
+        )
+
+        # Rows on either side only; a stale key shows up once on each side
+        differences = union_all(
+            select(except_(expected, actual).subquery()),
+            select(except_(actual, expected).subquery()),
+        ).subquery()
+        drifted_keys = select(differences.c.school_id).group_by(
+            *[differences.c[column] for column in ['school_id', *keys]]
+        ).subquery()
+        counts = select(drifted_keys.c.school_id, func.count()).group_by(drifted_keys.c.school_id)
+
+        schools = dict(executor.execute(counts).all())
+        if schools:
+            drift[model.__tablename__] = schools
+    return drift
+
+
+def student_attendance_rows(school_id, start_date=None, end_date=None, student_id=None, class_id=None):
+    """Per-student status counts between two dates, read from as few rows as possible.
+
+    Whole months come from attendance_student_monthly and only the days
+    before the first and after the last of them from the daily rollup.
+    Every row has student_id, class_id, date (the month's first day for
+    monthly rows) and one count per status, for the caller to group.
+    """
+    def rows(model, day, *where):
+        where = [model.school_id == school_id, *where]
+        if student_id:
+            where.append(model.student_id == student_id)
+        if class_id:
+            where.append(model.class_id == class_id)
+        counts = [getattr(model, status) for status in ATTENDANCE_STATUSES]
+        return select(model.student_id, model.class_id, day.label('date'), *counts).where(*where)
+
+    daily, monthly = AttendanceStudentDaily, AttendanceStudentMonthly
+    # Whole months are those from first up to, not including, stop
+    first = start_date if start_date is None or start_date.day == 1 else _next_month(start_date)
+    stop = _month_start(end_date + timedelta(days=1)) if end_date else None
+    if first and stop and first >= stop:
+        return rows(daily, daily.date, daily.date >= start_date, daily.date <= end_date)
+
+    months = []
+    if first:
+        months.append(monthly.month >= first)
+    if stop:
+        months.append(monthly.month < stop)
+    parts = [rows(monthly, monthly.month, *months)]
+    if start_date and start_date < first:
+        parts.append(rows(daily, daily.date, daily.date >= start_date, daily.date < first))
+    if end_date and stop <= end_date:
+        parts.append(rows(daily, daily.date, daily.date >= stop, daily.date <= end_date))
+    return union_all(*parts) if len(parts) > 1 else parts[0]
@@ -0,0 +1,241 @@
+"""Fee runs: invoice every matching student of a school in one job.
+
+Students are processed in id order, one chunk per transaction. Each chunk
+reserves a block of invoice numbers from the school's sequence, inserts its
+invoices with one executemany and moves the run's cursor past its last
+student, all in the same commit. A run that stops half way, for whatever
+reason, resumes after the cursor without skipping or double-billing anyone.
+The API runs them on a background thread (start_fee_run); the fee-run CLI
+command runs them in the foreground.
+"""
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.extensions import db
+from src.models.academic import FeeRun, Invoice, InvoiceSequence
+from src.models.student import Student
+from src.utils.bulk import dialect_insert
+
+logger = logging.getLogger('educontrol.fee_runs')
+
+FEE_RUN_CHUNK_SIZE = 1000
+
+# A run still marked running without progress for this long is assumed dead
+FEE_RUN_STALE_AFTER = timedelta(minutes=5)
+
+STUDENT_STATUSES = ['active', 'inactive', 'graduated', 'transferred']
+
+
+class FeeRunError(ValueError):
+    """Raised when a fee run is invalid or cannot be started"""
+
+
+def _id_list(data, field):
+    values = data.get(field)
+    if values is None:
+        return None
+    if not isinstance(values, list) or not values or not all(isinstance(value, str) for value in values):
+        raise FeeRunError(f'{field} must be a non-empty list of ids')
+    return sorted(set(values))
+
+
+def parse_fee_run(data):
+    """Validate a fee run from JSON and return FeeRun column values"""
+    if not isinstance(data, dict):
+        raise FeeRunError('Request body must be an object')
+    for field in ['description', 'amount', 'currency', 'due_date']:
+        if field not in data:
+            raise FeeRunError(f'Missing required field: {field}')
+    try:
+        amount = Decimal(str(data['amount']))
+    except InvalidOperation:
+        raise FeeRunError('amount must be a number')
+    if not amount.is_finite() or amount <= 0:
+        raise FeeRunError('amount must be positive')
+    try:
+        due_date = datetime.strptime(data['due_date'], '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise FeeRunError('Invalid due_date format. Use YYYY-MM-DD')
+
+    statuses = data.get('statuses', ['active'])
+    if not isinstance(statuses, list) or not statuses or not set(statuses) <= set(STUDENT_STATUSES):
+        raise FeeRunError(f'statuses must be a non-empty list of: {STUDENT_STATUSES}')
+
+    filters = {'statuses': sorted(set(statuses))}
+    for field in ['class_ids', 'student_ids']:
+        values = _id_list(data, field)
+        if values is not None:
+            filters[field] = values
+
+    return {
+        'description': data['description'],
+        'amount': amount,
+        'currency': data['currency'],
+        'due_date': due_date,
+        'filters': filters,
+    }
+
+
+def default_invoice_prefix(school_id):
+    """Prefix of a school's invoice numbers until one is configured"""
+    return f'INV-{school_id[:8].upper()}-'
+
+
+def invoice_prefix(executor, school_id):
+    """Prefix of a school's numbered invoices, which client-supplied numbers may not use"""
+    prefix = executor.execute(
+        select(InvoiceSequence.prefix).where(InvoiceSequence.school_id == school_id)
+    ).scalar()
+    return prefix or default_invoice_prefix(school_id)
+
+
+def allocate_invoice_numbers(executor, school_id, count):
+    """Reserve count invoice numbers for a school, in ascending order.
+
+    The sequence row is bumped with a single UPDATE, which holds its lock
+    until the caller's transaction ends, so concurrent allocations never
+    receive the same block. A rolled back block rolls the sequence back
+    with it, so its numbers are handed out again. Numbers already taken by
+    an existing invoice are skipped.
+    """
+    executor.execute(
+        dialect_insert(executor, InvoiceSequence)
+        .values(school_id=school_id, prefix=default_invoice_prefix(school_id), next_value=1)
+        .on_conflict_do_nothing(index_elements=['school_id'])
+    )
+    executor.execute(
+        update(InvoiceSequence)
+        .where(InvoiceSequence.school_id == school_id)
+        .values(next_value=InvoiceSequence.next_value + count)
+    )
+    prefix, next_value = executor.execute(
+        select(InvoiceSequence.prefix, InvoiceSequence.next_value)
+        .where(InvoiceSequence.school_id == school_id)
+    ).one()
+    numbers = [f'{prefix}{number:06d}' for number in range(next_value - count, next_value)]
+    taken = set(executor.execute(
+        select(Invoice.invoice_number).where(Invoice.invoice_number.in_(numbers))
+    ).scalars())
+    if taken:
+        numbers = [number for number in numbers if number not in taken]
+        numbers += allocate_invoice_numbers(executor, school_id, len(taken))
+    return numbers
+
+
+def _students(run):
+    query = select(Student.id).where(Student.school_id == run.school_id,
+                                     Student.status.in_(run.filters['statuses']))
+    if run.filters.get('class_ids'):
+        query = query.where(Student.class_id.in_(run.filters['class_ids']))
+    if run.filters.get('student_ids'):
+        query = query.where(Student.id.in_(run.filters['student_ids']))
+    if run.cursor:
+        query = query.where(Student.id > run.cursor)
+    return query.order_by(Student.id)
+
+
+def claim_fee_run(session, run, force=False):
+    """Mark run as running unless another worker is running it.
+
+    A run is claimed with a conditional UPDATE, so two callers can never
+    both start it. force takes over a run marked running regardless of
+    its last progress, for operators who know its worker has died.
+    """
+    claimable = FeeRun.status.in_(['pending', 'failed'])
+    if force:
+        claimable = FeeRun.status != 'completed'
+    else:
+        claimable = claimable | ((FeeRun.status == 'running')
+                                 & (FeeRun.updated_at < datetime.utcnow() - FEE_RUN_STALE_AFTER))
+    now = datetime.utcnow()
+    claimed = session.execute(
+        update(FeeRun)
+        .where(FeeRun.id == run.id, claimable)
+        .values(status='running', error=None, started_at=run.started_at or now, updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.commit()
+    session.refresh(run)
+    if not claimed:
+        raise FeeRunError(f'Fee run is {run.status}')
+
+
+def execute_fee_run(session, run, chunk_size=FEE_RUN_CHUNK_SIZE, progress=None):
+    """Invoice the remaining students of a claimed run, one chunk per commit.
+
+    progress, when given, is called with the run after every chunk. On a
+    database error the chunk is rolled back and the run is returned marked
+    failed; it can then be resumed from its cursor.
+    """
+    try:
+        while True:
+            started = time.perf_counter()
+            student_ids = session.execute(_students(run).limit(chunk_size)).scalars().all()
+            if not student_ids:
+                break
+
+            now = datetime.utcnow()
+            numbers = allocate_invoice_numbers(session, run.school_id, len(student_ids))
+            session.execute(insert(Invoice), [{
+                'id': str(uuid.uuid4()),
+                'school_id': run.school_id,
+                'student_id': student_id,
+                'invoice_number': number,
+                'description': run.description,
+                'amount': run.amount,
+                'currency': run.currency,
+                'due_date': run.due_date,
+                'status': 'pending',
+                'fee_run_id': run.id,
+                'created_at': now,
+                'updated_at': now,
+            } for student_id, number in zip(student_ids, numbers)])
+
+            run.cursor = student_ids[-1]
+            run.invoices_created += len(student_ids)
+            run.elapsed_seconds += time.perf_counter() - started
+            run.updated_at = now
+            session.commit()
+            if progress:
+                progress(run)
+    except SQLAlchemyError as e:
+        session.rollback()
+        run.status = 'failed'
+        run.error = str(e.orig if getattr(e, 'orig', None) else e)
+        session.commit()
+        return run
+
+    run.status = 'completed'
+    run.finished_at = datetime.utcnow()
+    session.commit()
+    return run
+
+
+def start_fee_run(app, fee_run_id, chunk_size=FEE_RUN_CHUNK_SIZE):
+    """Execute a claimed run on a daemon thread, with its own app context and session.
+
+    The caller returns at once and clients poll the run. A run whose process
+    exits part way stays running until FEE_RUN_STALE_AFTER has passed
+    without progress, then resumes from its cursor.
+    """
+    def work():
+        with app.app_context():
+            run = db.session.get(FeeRun, fee_run_id)
+            try:
+                run = execute_fee_run(db.session, run, chunk_size)
+            except Exception:
+                logger.exception('Fee run %s stopped', fee_run_id)
+                return
+            if run.status == 'failed':
+                logger.warning('Fee run %s failed: %s', fee_run_id, run.error)
+
+    thread = threading.Thread(target=work, name=f'fee-run-{fee_run_id}', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,74 @@
+"""Invoice status transitions and outstanding balances.
+
+The overdue sweep moves pending invoices past their due date to overdue in
+bounded batches. Each batch is one UPDATE over ids found through the
+(status, due_date) index and is committed on its own, so the sweep never
+holds long locks and can be interrupted at any point.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import and_, case, func, or_, select, update
+
+from src.models.academic import Invoice
+
+OVERDUE_SWEEP_BATCH_SIZE = 5000
+
+OUTSTANDING_STATUSES = ['pending', 'overdue']
+
+
+def sweep_overdue_invoices(session, today=None, school_id=None, batch_size=OVERDUE_SWEEP_BATCH_SIZE,
+                           progress=None):
+    """Mark pending invoices due before today as overdue; returns how many changed"""
+    today = today or date.today()
+    due = [Invoice.status == 'pending', Invoice.due_date < today]
+    if school_id:
+        due.append(Invoice.school_id == school_id)
+
+    swept = 0
+    while True:
+        batch = select(Invoice.id).where(*due).limit(batch_size).scalar_subquery()
+        changed = session.execute(
+            update(Invoice)
+            .where(Invoice.id.in_(batch), Invoice.status == 'pending')
+            .values(status='overdue', updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        session.commit()
+        swept += changed
+        if progress:
+            progress(swept)
+        if changed < batch_size:
+            return swept
+
+
+def outstanding_by_currency(session, school_id, today=None):
+    """Count and amount of a school's unpaid invoices per currency.
+
+    Pending invoices already past due count as overdue, so the figures are
+    right between sweeps. The query reads only
+    idx_invoices_school_id_status_currency, never the invoices table.
+    """
+    today = today or date.today()
+    overdue = or_(Invoice.status == 'overdue',
+                  and_(Invoice.status == 'pending', Invoice.due_date < today))
+    rows = session.execute(
+        select(
+            Invoice.currency,
+            func.count().label('count'),
+            func.sum(Invoice.amount).label('amount'),
+            func.sum(case((overdue, 1), else_=0)).label('overdue_count'),
+            func.sum(case((overdue, Invoice.amount), else_=0)).label('overdue_amount'),
+        )
+        .where(Invoice.school_id == school_id, Invoice.status.in_(OUTSTANDING_STATUSES))
+        .group_by(Invoice.currency)
+        .order_by(Invoice.currency)
+    )
+    return [{
+        'currency': row.currency,
+        'count': row.count,
+        'amount': round(float(row.amount or 0), 2),
+        'overdue_count': row.overdue_count,
+        'overdue_amount': round(float(row.overdue_amount or 0), 2),
+        'pending_count': row.count - row.overdue_count,
+        'pending_amount': round(float((row.amount or 0) - (row.overdue_amount or 0)), 2),
+    } for row in rows]
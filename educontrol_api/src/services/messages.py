@@ -0,0 +1,74 @@
+"""Message read state and per-user unread counters.
+
+message_unread_counts holds one row per recipient. Sending a message and
+marking messages read adjust it by a delta in the same transaction as the
+change to messages, so an unread badge is a primary key lookup instead of
+a COUNT(*) over the inbox on every poll.
+"""
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, update
+
+from src.models.academic import Message, MessageUnreadCount
+from src.utils.bulk import dialect_insert
+
+# NULL is_read, from rows written before it had a default, counts as unread
+UNREAD = Message.is_read.isnot(True)
+
+
+def adjust_unread(executor, school_id, deltas):
+    """Add {recipient_id: delta} to the recipients' unread counters"""
+    rows = [{'user_id': user_id, 'school_id': school_id, 'unread': delta}
+            for user_id, delta in deltas.items() if delta]
+    if not rows:
+        return
+    stmt = dialect_insert(executor, MessageUnreadCount)
+    executor.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={'unread': MessageUnreadCount.unread + stmt.excluded.unread},
+        ),
+        rows,
+    )
+
+
+def unread_count(executor, user_id):
+    return executor.execute(
+        select(MessageUnreadCount.unread).where(MessageUnreadCount.user_id == user_id)
+    ).scalar() or 0
+
+
+def mark_read(executor, school_id, user_id, message_ids=None, before=None):
+    """Mark a recipient's unread messages read with one UPDATE; returns how many changed.
+
+    Without message_ids or before, every unread message of the user is
+    marked. The counter is decremented by the UPDATE's rowcount, so
+    messages that were already read are never subtracted twice.
+    """
+    where = [Message.school_id == school_id, Message.recipient_id == user_id, UNREAD]
+    if message_ids is not None:
+        where.append(Message.id.in_(message_ids))
+    if before is not None:
+        where.append(Message.created_at <= before)
+
+    changed = executor.execute(
+        update(Message)
+        .where(*where)
+        .values(is_read=True, read_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    adjust_unread(executor, school_id, {user_id: -changed})
+    return changed
+
+
+def rebuild_unread_counts(executor, school_id=None):
+    """Recompute the unread counters from messages, for one school or all"""
+    counter_where = [MessageUnreadCount.school_id == school_id] if school_id else []
+    message_where = [Message.school_id == school_id] if school_id else []
+    executor.execute(delete(MessageUnreadCount).where(*counter_where))
+    executor.execute(insert(MessageUnreadCount).from_select(
+        ['user_id', 'school_id', 'unread'],
+        select(Message.recipient_id, Message.school_id, func.count())
+        .where(UNREAD, *message_where)
+        .group_by(Message.recipient_id, Message.school_id)
+    ))
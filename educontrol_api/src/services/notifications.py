@@ -0,0 +1,56 @@
+"""Which committed rows are pushed to Server-Sent Events listeners.
+
+New messages go to the channels of their sender and recipient, and
+published announcements to the school's channel for their audience. Events
+are collected when the rows are flushed and sent by the EventBus once the
+transaction commits.
+"""
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from src.extensions import events
+from src.models.academic import Announcement, Message
+
+AUDIENCES = ['all', 'teachers', 'parents', 'students']
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def announcement_channel(school_id, audience):
+    return f'school:{school_id}:{audience}'
+
+
+def school_channels(school_id, audience=None):
+    """Announcement channels a listener of audience receives; every audience when None"""
+    audiences = ['all', audience] if audience and audience != 'all' else AUDIENCES
+    return [announcement_channel(school_id, name) for name in audiences]
+
+
+def _publish_announcement(session, announcement):
+    events.publish_after_commit(
+        session, announcement_channel(announcement.school_id, announcement.target_audience or 'all'),
+        'announcement', announcement.to_dict(), announcement.id
+    )
+
+
+def _collect(session, flush_context):
+    # after_flush still sees the pre-flush new and dirty sets and attribute history
+    for instance in session.new:
+        if isinstance(instance, Message):
+            data = instance.to_dict()
+            for user_id in {instance.recipient_id, instance.sender_id}:
+                events.publish_after_commit(session, user_channel(user_id), 'message', data, instance.id)
+        elif isinstance(instance, Announcement) and instance.is_published:
+            _publish_announcement(session, instance)
+    for instance in session.dirty:
+        if (isinstance(instance, Announcement) and instance.is_published
+                and inspect(instance).attrs.is_published.history.added):
+            _publish_announcement(session, instance)
+
+
+def watch_notifications():
+    """Collect events from every session's flushes; safe to call more than once"""
+    if not event.contains(Session, 'after_flush', _collect):
+        event.listen(Session, 'after_flush', _collect)
@@ -0,0 +1,226 @@
+"""Gradebook reports: subject averages, weighted totals and class rank.
+
+A class report is built from one GROUP BY over the class's grade rows. The
+query returns the sum and count of percentages per (student, subject,
+assessment_type), and everything else is derived from those partial sums
+in a single pass, without further queries per student. Whole-school report
+cards run the class reports side by side in a process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import func, select
+
+from src.models.academic import Grade
+from src.utils.grading import HUNDREDTHS, GradeScale
+
+# Share of a subject's weighted total carried by each assessment type. A
+# student's missing types are left out and the remaining weights rescaled.
+DEFAULT_ASSESSMENT_WEIGHTS = {
+    'assignment': Decimal('20'),
+    'quiz': Decimal('20'),
+    'exam': Decimal('40'),
+    'project': Decimal('20'),
+}
+
+
+class ReportError(ValueError):
+    """Raised when report parameters are invalid"""
+
+
+def parse_weights(value):
+    """Parse 'exam:50,quiz:25,...' into assessment type weights"""
+    if not value:
+        return dict(DEFAULT_ASSESSMENT_WEIGHTS)
+    weights = {}
+    for item in value.split(','):
+        assessment_type, _, weight = item.partition(':')
+        try:
+            weight = Decimal(weight)
+        except ArithmeticError:
+            raise ReportError(f'Invalid weight for {assessment_type.strip()!r}')
+        if not weight.is_finite() or weight < 0:
+            raise ReportError(f'Invalid weight for {assessment_type.strip()!r}')
+        weights[assessment_type.strip()] = weight
+    if not any(weights.values()):
+        raise ReportError('At least one weight must be positive')
+    return weights
+
+
+def _round(value):
+    return float(value.quantize(HUNDREDTHS, rounding=ROUND_HALF_UP)) if value is not None else None
+
+
+def _rank(scores):
+    """Competition ranks (1, 2, 2, 4) for {key: score}, highest score first"""
+    ranks = {}
+    ordered = sorted(((score, key) for key, score in scores.items() if score is not None), reverse=True)
+    previous = None
+    for position, (score, key) in enumerate(ordered, start=1):
+        if score != previous:
+            rank, previous = position, score
+        ranks[key] = rank
+    return ranks
+
+
+def _grade_sums(session, school_id, class_id, academic_year_id):
+    """(student_id, subject_id, assessment_type, sum, count) of graded percentages"""
+    return session.execute(
+        select(Grade.student_id, Grade.subject_id, Grade.assessment_type,
+               func.sum(Grade.percentage), func.count(Grade.percentage))
+        .where(Grade.school_id == school_id,
+               Grade.class_id == class_id,
+               Grade.academic_year_id == academic_year_id,
+               Grade.percentage.isnot(None))
+        .group_by(Grade.student_id, Grade.subject_id, Grade.assessment_type)
+    )
+
+
+def class_report(session, school_id, class_id, academic_year_id, weights=None, scale=None):
+    """Averages, weighted totals, letter grades and ranks for one class and year"""
+    weights = weights or DEFAULT_ASSESSMENT_WEIGHTS
+    scale = scale or GradeScale.for_school(school_id)
+
+    # student -> subject -> assessment_type -> [sum, count]
+    sums = {}
+    for student_id, subject_id, assessment_type, total, count in _grade_sums(
+            session, school_id, class_id, academic_year_id):
+        sums.setdefault(student_id, {}).setdefault(subject_id, {})[assessment_type] = (Decimal(str(total)), count)
+
+    students = {}
+    subject_scores = {}
+    for student_id, subjects in sums.items():
+        subject_reports = {}
+        for subject_id, by_type in subjects.items():
+            total = sum(type_total for type_total, _ in by_type.values())
+            count = sum(type_count for _, type_count in by_type.values())
+            weighted = sum(weights.get(assessment_type, 0) * type_total / type_count
+                           for assessment_type, (type_total, type_count) in by_type.items())
+            weight = sum(weights.get(assessment_type, 0) for assessment_type in by_type)
+            # Without any weighted assessment type the plain average stands in
+            weighted_average = weighted / weight if weight else total / count
+            subject_reports[subject_id] = {
+                'subject_id': subject_id,
+                'average': total / count,
+                'weighted_average': weighted_average,
+                'assessments': {
+                    assessment_type: {'average': _round(type_total / type_count), 'count': type_count}
+                    for assessment_type, (type_total, type_count) in sorted(by_type.items())
+                },
+            }
+            subject_scores.setdefault(subject_id, {})[student_id] = weighted_average
+
+        overall = sum(report['weighted_average'] for report in subject_reports.values()) / len(subject_reports)
+        students[student_id] = {'student_id': student_id, 'overall': overall, 'subjects': subject_reports}
+
+    overall_ranks = _rank({student_id: _round(report['overall']) for student_id, report in students.items()})
+    subject_ranks = {
+        subject_id: _rank({student_id: _round(score) for student_id, score in scores.items()})
+        for subject_id, scores in subject_scores.items()
+    }
+
+    student_reports = []
+    for student_id, report in students.items():
+        subjects = []
+        for subject_id, subject in sorted(report['subjects'].items()):
+            weighted_average = _round(subject['weighted_average'])
+            subjects.append({
+                'subject_id': subject_id,
+                'average': _round(subject['average']),
+                'weighted_average': weighted_average,
+                'grade': scale.letter(Decimal(str(weighted_average))),
+                'rank': subject_ranks[subject_id][student_id],
+                'assessments': subject['assessments'],
+            })
+        overall = _round(report['overall'])
+        student_reports.append({
+            'student_id': student_id,
+            'overall_average': overall,
+            'grade': scale.letter(Decimal(str(overall))),
+            'rank': overall_ranks[student_id],
+            'subjects': subjects,
+        })
+    student_reports.sort(key=lambda report: (report['rank'], report['student_id']))
+
+    subject_summaries = [
+        {
+            'subject_id': subject_id,
+            'students': len(scores),
+            'average': _round(sum(scores.values()) / len(scores)),
+        }
+        for subject_id, scores in sorted(subject_scores.items())
+    ]
+
+    return {
+        'school_id': school_id,
+        'class_id': class_id,
+        'academic_year_id': academic_year_id,
+        'class_size': len(student_reports),
+        'weights': {assessment_type: float(weight) for assessment_type, weight in sorted(weights.items())},
+        'subjects': subject_summaries,
+        'students': student_reports,
+    }
+
+
+def report_cards(report):
+    """Split a class report into one report card per student"""
+    for student in report['students']:
+        yield {
+            'school_id': report['school_id'],
+            'class_id': report['class_id'],
+            'academic_year_id': report['academic_year_id'],
+            'class_size': report['class_size'],
+            **student,
+        }
+
+
+def graded_classes(session, school_id, academic_year_id):
+    """Ids of the classes with at least one grade in the academic year"""
+    return session.execute(
+        select(Grade.class_id).distinct()
+        .where(Grade.school_id == school_id, Grade.academic_year_id == academic_year_id)
+        .order_by(Grade.class_id)
+    ).scalars().all()
+
+
+# Per-process application for report workers, created by _init_worker
+_worker_app = None
+
+
+def _init_worker(database_uri):
+    # Each worker opens its own engine; connections must never cross a fork
+    global _worker_app
+    from src.app import create_app
+    from src.config import Config
+
+    worker_config = type('ReportWorkerConfig', (Config,), {
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'CACHE_BACKEND': 'none',
+    })
+    _worker_app = create_app(worker_config)
+
+
+def _class_report_job(args):
+    from src.extensions import db
+
+    school_id, class_id, academic_year_id, weights = args
+    with _worker_app.app_context():
+        try:
+            return class_report(db.session, school_id, class_id, academic_year_id, weights)
+        finally:
+            db.session.remove()
+
+
+def school_report_cards(database_uri, school_id, academic_year_id, class_ids, weights=None, workers=None):
+    """Yield report cards for every class in class_ids, computed in parallel.
+
+    Each class report runs in a worker process with its own database
+    connection. Reports are yielded in class order as they complete.
+    """
+    workers = workers or os.cpu_count() or 1
+    jobs = [(school_id, class_id, academic_year_id, weights) for class_id in class_ids]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)) or 1,
+                             initializer=_init_worker, initargs=(database_uri,)) as pool:
+        for report in pool.map(_class_report_job, jobs):
+            yield from report_cards(report)
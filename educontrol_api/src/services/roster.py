@@ -0,0 +1,358 @@
+"""Roster import: student users, students and their parents from CSV or XLSX.
+
+Each roster row describes one student and up to two parents. Rows are read
+incrementally and handled in chunks. A chunk resolves everything it
+refers to with one query per kind: existing students by student_id, users
+by email and classes by name or id. It then inserts the new users,
+students and parent links with one executemany per table and commits.
+
+Students are matched by student_id and users by email, ignoring case, so
+importing the same file again creates nothing and a corrected file adds
+only what failed before. Rows that fail validation are reported with their
+line number and never stop the import; neither does a chunk the database
+rejects, whose rows are reported instead.
+"""
+import csv
+import io
+import re
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from src.models.school import SchoolClass, SchoolUser
+from src.models.student import ParentStudentRelationship, Student
+
+try:
+    import openpyxl
+except ImportError:  # optional, only needed for XLSX rosters
+    openpyxl = None
+
+ROSTER_CHUNK_SIZE = 1000
+
+ROSTER_FORMATS = ['csv', 'xlsx']
+
+# Column prefixes of the parents a row may describe, e.g. parent_email, parent2_email
+PARENT_PREFIXES = ['parent_', 'parent2_']
+
+STUDENT_STATUSES = ['active', 'inactive', 'graduated', 'transferred']
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class RosterError(ValueError):
+    """Raised when a roster file cannot be read at all"""
+
+
+def _normalize_header(name):
+    return str(name or '').strip().lower().replace(' ', '_')
+
+
+def read_csv(stream):
+    """Yield (line number, row dict) from a binary CSV stream"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = [_normalize_header(name) for name in next(reader, [])]
+    for row in reader:
+        if any(cell.strip() for cell in row):
+            yield reader.line_num, dict(zip(header, (cell.strip() for cell in row)))
+
+
+def read_xlsx(stream):
+    """Yield (line number, row dict) from the first sheet of an XLSX workbook"""
+    if openpyxl is None:
+        raise RosterError('XLSX rosters require the openpyxl package')
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [_normalize_header(name) for name in next(rows, ())]
+        for line, row in enumerate(rows, start=2):
+            cells = ['' if cell is None else
+                     cell.date().isoformat() if isinstance(cell, datetime) else str(cell).strip()
+                     for cell in row]
+            if any(cells):
+                yield line, dict(zip(header, cells))
+    finally:
+        workbook.close()
+
+
+def read_roster(stream, fmt):
+    if fmt not in ROSTER_FORMATS:
+        raise RosterError(f'Invalid format. Must be one of: {ROSTER_FORMATS}')
+    return read_xlsx(stream) if fmt == 'xlsx' else read_csv(stream)
+
+
+def _date(value, field):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Invalid {field}. Use YYYY-MM-DD')
+
+
+def _email(value, field):
+    email = (value or '').strip().lower()
+    if not EMAIL_PATTERN.match(email):
+        raise ValueError(f'Invalid or missing {field}')
+    return email
+
+
+def parse_row(row, classes):
+    """Validate one roster row; raises ValueError with the reason"""
+    for field in ['student_id', 'first_name', 'last_name', 'email']:
+        if not row.get(field):
+            raise ValueError(f'Missing required field: {field}')
+    status = row.get('status') or 'active'
+    if status not in STUDENT_STATUSES:
+        raise ValueError(f'Invalid status. Must be one of: {STUDENT_STATUSES}')
+    class_id = None
+    if row.get('class'):
+        class_id = classes.get(row['class'])
+        if class_id is None:
+            raise ValueError(f'Unknown class: {row["class"]}')
+
+    parents = []
+    for prefix in PARENT_PREFIXES:
+        if not any(value for key, value in row.items() if key.startswith(prefix)):
+            continue
+        for field in ['first_name', 'last_name']:
+            if not row.get(prefix + field):
+                raise ValueError(f'Missing required field: {prefix}{field}')
+        parents.append({
+            'email': _email(row.get(prefix + 'email'), prefix + 'email'),
+            'first_name': row[prefix + 'first_name'],
+            'last_name': row[prefix + 'last_name'],
+            'phone': row.get(prefix + 'phone') or None,
+            'relationship': row.get(prefix + 'relationship') or 'guardian',
+            # The first parent is the primary contact unless the file says otherwise
+            'is_primary': (row[prefix + 'is_primary'].lower() in ('1', 'true', 'yes')
+                           if row.get(prefix + 'is_primary') else prefix == PARENT_PREFIXES[0]),
+        })
+
+    return {
+        'student_id': row['student_id'],
+        'email': _email(row['email'], 'email'),
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'phone': row.get('phone') or None,
+        'class_id': class_id,
+        'date_of_birth': _date(row.get('date_of_birth'), 'date_of_birth'),
+        'enrollment_date': _date(row.get('enrollment_date'), 'enrollment_date'),
+        'gender': row.get('gender') or None,
+        'address': row.get('address') or None,
+        'emergency_contact_name': row.get('emergency_contact_name') or None,
+        'emergency_contact_phone': row.get('emergency_contact_phone') or None,
+        'status': status,
+        'parents': parents,
+    }
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class RosterImport:
+    """State of one import: lookups that outlive a chunk, counts and errors"""
+
+    def __init__(self, session, school_id, dry_run=False):
+        self.session = session
+        self.school_id = school_id
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = {'users': 0, 'students': 0, 'relationships': 0}
+        self.existing = {'students': 0, 'users': 0}
+        self.errors = []
+        self.elapsed = 0.0
+        self.seen_students = set()
+        self.student_emails = set()  # Emails of the students created by this import
+        self.existing_users = set()
+        # Class name or id -> id; classes are few, so all of them are loaded once
+        self.classes = {}
+        for class_id, name in session.execute(
+                select(SchoolClass.id, SchoolClass.name).where(SchoolClass.school_id == school_id)):
+            self.classes[class_id] = class_id
+            self.classes.setdefault(name, class_id)
+
+    def error(self, line, row, message):
+        self.errors.append({'line': line, 'student_id': row.get('student_id') or None, 'error': message})
+
+    def run(self, rows, chunk_size=ROSTER_CHUNK_SIZE, progress=None):
+        for chunk in _chunks(rows, chunk_size):
+            started = time.perf_counter()
+            self._import_chunk(chunk)
+            self.elapsed += time.perf_counter() - started
+            if progress:
+                progress(self)
+        return self
+
+    def _users_by_email(self, emails):
+        """{lowercased email: (user id, role)}; emails must be lowercase"""
+        if not emails:
+            return {}
+        email = func.lower(SchoolUser.email)
+        return {email: (user_id, role) for user_id, email, role in self.session.execute(
+            select(SchoolUser.id, email, SchoolUser.role)
+            .where(SchoolUser.school_id == self.school_id, email.in_(emails))
+        )}
+
+    def _import_chunk(self, chunk):
+        self.rows += len(chunk)
+        parsed = []
+        for line, row in chunk:
+            try:
+                parsed.append((line, row, parse_row(row, self.classes)))
+            except ValueError as e:
+                self.error(line, row, str(e))
+
+        # Set-based lookups for the whole chunk
+        student_numbers = {entry['student_id'] for _, _, entry in parsed}
+        students = {number: (student_pk, school_id) for student_pk, number, school_id in self.session.execute(
+            select(Student.id, Student.student_id, Student.school_id).where(Student.student_id.in_(student_numbers))
+        )} if student_numbers else {}
+        emails = {entry['email'] for _, _, entry in parsed}
+        emails.update(parent['email'] for _, _, entry in parsed for parent in entry['parents'])
+        users = self._users_by_email(emails)
+        # Chunks can share parents, so each existing user is counted once
+        self.existing_users.update(user_id for user_id, _ in users.values())
+        self.existing['users'] = len(self.existing_users)
+        # Student users may only be reused by a row when no student has them yet
+        student_users = [user_id for user_id, role in users.values() if role == 'student']
+        enrolled = set(self.session.execute(
+            select(Student.user_id).where(Student.user_id.in_(student_users))
+        ).scalars()) if student_users else set()
+
+        now = datetime.utcnow()
+        new_users, new_students, links = [], [], set()
+
+        def user_for(person, role):
+            """Id of the user with person's email, created when missing"""
+            if person['email'] in users:
+                user_id, existing_role = users[person['email']]
+                if existing_role != role:
+                    raise ValueError(f'{person["email"]} belongs to a {existing_role}, not a {role}')
+                return user_id
+            user_id = str(uuid.uuid4())
+            users[person['email']] = (user_id, role)
+            new_users.append({
+                'id': user_id, 'school_id': self.school_id, 'role': role,
+                'first_name': person['first_name'], 'last_name': person['last_name'],
+                'email': person['email'], 'phone': person['phone'], 'is_active': True,
+                'created_at': now, 'updated_at': now,
+            })
+            return user_id
+
+        resolved, written = [], {}  # written: line -> row, for rows that queue inserts
+        for line, row, entry in parsed:
+            number = entry['student_id']
+            if number in self.seen_students:
+                self.error(line, row, f'Duplicate student_id {number} in file')
+                continue
+            self.seen_students.add(number)
+            created = (len(new_users), len(new_students))
+            try:
+                if number in students:
+                    student_pk, school_id = students[number]
+                    if school_id != self.school_id:
+                        raise ValueError(f'student_id {number} belongs to another school')
+                    self.existing['students'] += 1
+                else:
+                    email = entry['email']
+                    if email in self.student_emails:
+                        raise ValueError(f'{email} is the email of another student in file')
+                    if email in users and users[email][0] in enrolled:
+                        raise ValueError(f'{email} already belongs to another student')
+                    user_id = user_for(entry, 'student')
+                    student_pk = str(uuid.uuid4())
+                    student = {key: entry[key] for key in [
+                        'student_id', 'class_id', 'date_of_birth', 'gender', 'address', 'emergency_contact_name',
+                        'emergency_contact_phone', 'status']}
+                    new_students.append({
+                        **student,
+                        'id': student_pk, 'user_id': user_id, 'school_id': self.school_id,
+                        'enrollment_date': entry['enrollment_date'] or now.date(),
+                        'created_at': now, 'updated_at': now,
+                    })
+                parent_ids = [(user_for(parent, 'parent'), parent) for parent in entry['parents']]
+            except ValueError as e:
+                # Drop whatever this row had queued so it leaves no partial rows
+                for email in [user['email'] for user in new_users[created[0]:]]:
+                    del users[email]
+                del new_users[created[0]:]
+                del new_students[created[1]:]
+                self.error(line, row, str(e))
+                continue
+            if (len(new_users), len(new_students)) != created:
+                written[line] = row
+            if len(new_students) != created[1]:
+                self.student_emails.add(entry['email'])
+            for parent_id, parent in parent_ids:
+                if (parent_id, student_pk) not in links:
+                    links.add((parent_id, student_pk))
+                    resolved.append((parent_id, student_pk, parent, line, row))
+
+        # Links that already exist are left alone
+        existing_links = set()
+        if resolved:
+            existing_links = set(self.session.execute(
+                select(ParentStudentRelationship.parent_id, ParentStudentRelationship.student_id)
+                .where(ParentStudentRelationship.student_id.in_({link[1] for link in resolved}))
+            ).all())
+        new_links = []
+        for parent_id, student_pk, parent, line, row in resolved:
+            if (parent_id, student_pk) not in existing_links:
+                written[line] = row
+                new_links.append({
+                    'id': str(uuid.uuid4()), 'school_id': self.school_id, 'parent_id': parent_id,
+                    'student_id': student_pk, 'relationship': parent['relationship'],
+                    'is_primary': parent['is_primary'], 'created_at': now,
+                })
+
+        try:
+            for model, rows in [(SchoolUser, new_users), (Student, new_students),
+                                (ParentStudentRelationship, new_links)]:
+                if rows:
+                    self.session.execute(insert(model), rows)
+            if self.dry_run:
+                self.session.rollback()
+            else:
+                self.session.commit()
+        except IntegrityError as e:
+            # E.g. a concurrent import inserted the same student first; nothing of this chunk is kept
+            self.session.rollback()
+            for line, row in sorted(written.items()):
+                self.error(line, row, f'Not imported, the chunk was rejected: {e.orig}')
+            return
+        self.created['users'] += len(new_users)
+        self.created['students'] += len(new_students)
+        self.created['relationships'] += len(new_links)
+
+    def summary(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'existing': self.existing,
+            'errors': self.errors,
+            'dry_run': self.dry_run,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows / self.elapsed, 1) if self.elapsed else None,
+        }
+
+
+ERROR_REPORT_FIELDS = ['line', 'student_id', 'error']
+
+
+def write_error_report(errors, stream):
+    """Write errors as CSV with a header row"""
+    writer = csv.DictWriter(stream, fieldnames=ERROR_REPORT_FIELDS)
+    writer.writeheader()
+    writer.writerows(errors)
@@ -0,0 +1,255 @@
+"""People search over a school's users, students and teachers.
+
+On SQLite, people_search is an FTS5 index with one row per school user:
+their name, email and, for students and teachers, the student_id or
+employee_id. Triggers on school_users, students and teachers keep it in
+step with every insert, update and delete, including bulk inserts that
+bypass the ORM, so writers never maintain it themselves.
+
+Each school's rows occupy their own rowid range: the school's number from
+people_search_schools in the high 32 bits, a sequence below. A search
+constrains the FTS5 match to that range, which FTS5 seeks to in every
+doclist, so its cost follows the size of the school and not the number
+of schools sharing the index.
+
+Other databases fall back to prefix LIKE filters over the same columns.
+"""
+import re
+
+from sqlalchemy import and_, column, event, literal_column, or_, select, table, text
+
+from src.models.school import SchoolUser
+from src.models.student import Student, Teacher
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+
+# Shorter prefixes can match most of a school, which is too many rows to rank per keystroke
+RANKED_PREFIX_LENGTH = 2
+
+# Words as the unicode61 tokenizer splits them: letters and digits only
+_WORD = re.compile(r'[^\W_]+')
+
+# Rowids of a school's rows are its number shifted by this many bits
+SCHOOL_ROWID_BITS = 32
+
+people_search = table('people_search', column('rowid'), column('rank'))
+people_search_schools = table('people_search_schools', column('id'), column('school_id'))
+people_search_docs = table('people_search_docs', column('id'), column('user_id'), column('school_id'),
+                           column('student_id'), column('employee_id'))
+
+_DOC_VALUES = """
+    (SELECT student_id FROM students WHERE user_id = {user}.id),
+    (SELECT employee_id FROM teachers WHERE user_id = {user}.id)
+"""
+
+# Adds a user's row under the next rowid of their school's range
+_INSERT_DOC = f"""
+    INSERT OR IGNORE INTO people_search_schools (school_id) VALUES (new.school_id);
+    INSERT INTO people_search_docs (id, user_id, school_id, name, email, student_id, employee_id)
+    SELECT coalesce((SELECT max(id) FROM people_search_docs
+                     WHERE id > s.id << {SCHOOL_ROWID_BITS} AND id < (s.id + 1) << {SCHOOL_ROWID_BITS}),
+                    s.id << {SCHOOL_ROWID_BITS}) + 1,
+           new.id, new.school_id, new.first_name || ' ' || new.last_name, new.email,
+           {_DOC_VALUES.format(user='new')}
+    FROM people_search_schools s WHERE s.school_id = new.school_id;
+"""
+
+# people_search_docs holds what is indexed, one row per school user. Its
+# INTEGER PRIMARY KEY is the FTS rowid, which unlike an implicit rowid
+# survives VACUUM. people_search indexes it as an external content table.
+SEARCH_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS people_search_schools (
+        id INTEGER PRIMARY KEY,
+        school_id VARCHAR(36) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS people_search_docs (
+        id INTEGER PRIMARY KEY,
+        user_id VARCHAR(36) NOT NULL UNIQUE,
+        school_id VARCHAR(36) NOT NULL,
+        name TEXT,
+        email TEXT,
+        student_id TEXT,
+        employee_id TEXT
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS people_search USING fts5(
+        name, email, student_id, employee_id,
+        content = 'people_search_docs', content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS people_search_docs_insert AFTER INSERT ON people_search_docs BEGIN
+        INSERT INTO people_search (rowid, name, email, student_id, employee_id)
+        VALUES (new.id, new.name, new.email, new.student_id, new.employee_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS people_search_docs_delete AFTER DELETE ON people_search_docs BEGIN
+        INSERT INTO people_search (people_search, rowid, name, email, student_id, employee_id)
+        VALUES ('delete', old.id, old.name, old.email, old.student_id, old.employee_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS people_search_docs_update AFTER UPDATE ON people_search_docs BEGIN
+        INSERT INTO people_search (people_search, rowid, name, email, student_id, employee_id)
+        VALUES ('delete', old.id, old.name, old.email, old.student_id, old.employee_id);
+        INSERT INTO people_search (rowid, name, email, student_id, employee_id)
+        VALUES (new.id, new.name, new.email, new.student_id, new.employee_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS people_search_user_insert AFTER INSERT ON school_users BEGIN
+        {_INSERT_DOC}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS people_search_user_update
+    AFTER UPDATE OF first_name, last_name, email ON school_users WHEN new.school_id IS old.school_id BEGIN
+        UPDATE people_search_docs
+        SET name = new.first_name || ' ' || new.last_name, email = new.email
+        WHERE user_id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS people_search_user_move
+    AFTER UPDATE OF school_id ON school_users WHEN new.school_id IS NOT old.school_id BEGIN
+        DELETE FROM people_search_docs WHERE user_id = old.id;
+        {_INSERT_DOC}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS people_search_user_delete AFTER DELETE ON school_users BEGIN
+        DELETE FROM people_search_docs WHERE user_id = old.id;
+    END
+    """,
+]
+for _table, _number in [('students', 'student_id'), ('teachers', 'employee_id')]:
+    _set = """
+        UPDATE people_search_docs SET {number} = (SELECT {number} FROM {table} WHERE user_id = {row}.user_id)
+        WHERE user_id = {row}.user_id;
+    """
+    SEARCH_DDL += [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS people_search_{_table}_insert AFTER INSERT ON {_table} BEGIN
+            {_set.format(number=_number, table=_table, row='new')}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS people_search_{_table}_update
+        AFTER UPDATE OF user_id, {_number} ON {_table} BEGIN
+            {_set.format(number=_number, table=_table, row='old')}
+            {_set.format(number=_number, table=_table, row='new')}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS people_search_{_table}_delete AFTER DELETE ON {_table} BEGIN
+            {_set.format(number=_number, table=_table, row='old')}
+        END
+        """,
+    ]
+
+
+def _uses_fts(connection):
+    return connection.dialect.name == 'sqlite'
+
+
+def create_search_index(connection):
+    """Create people_search and its triggers unless they exist"""
+    if _uses_fts(connection):
+        for ddl in SEARCH_DDL:
+            connection.execute(text(ddl))
+
+
+def rebuild_search_index(connection):
+    """Refill people_search from school_users, students and teachers"""
+    if not _uses_fts(connection):
+        return
+    connection.execute(text('DELETE FROM people_search_docs'))
+    connection.execute(text(
+        'INSERT OR IGNORE INTO people_search_schools (school_id) SELECT DISTINCT school_id FROM school_users'
+    ))
+    connection.execute(text(f"""
+        INSERT INTO people_search_docs (id, user_id, school_id, name, email, student_id, employee_id)
+        SELECT (s.id << {SCHOOL_ROWID_BITS}) + row_number() OVER (PARTITION BY u.school_id ORDER BY u.id),
+               u.id, u.school_id, u.first_name || ' ' || u.last_name, u.email, {_DOC_VALUES.format(user='u')}
+        FROM school_users u JOIN people_search_schools s ON s.school_id = u.school_id
+    """))
+    connection.execute(text("INSERT INTO people_search (people_search) VALUES ('rebuild')"))
+
+
+def drop_search_index(connection):
+    """Drop people_search, its tables and its triggers"""
+    if not _uses_fts(connection):
+        return
+    triggers = connection.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'people\\_search\\_%' ESCAPE '\\'"
+    )).scalars().all()
+    for name in triggers:
+        connection.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+    for name in ['people_search', 'people_search_docs', 'people_search_schools']:
+        connection.execute(text(f'DROP TABLE IF EXISTS {name}'))
+
+
+def _create_after_tables(metadata, connection, **kw):
+    create_search_index(connection)
+
+
+def watch_search_index(metadata):
+    """Create the search index whenever metadata.create_all() runs; safe to call more than once"""
+    if not event.contains(metadata, 'after_create', _create_after_tables):
+        event.listen(metadata, 'after_create', _create_after_tables)
+
+
+def _quote(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def match_expression(words):
+    """An FTS5 query matching rows with every word as a prefix of some token"""
+    return ' '.join(_quote(word) + '*' for word in words)
+
+
+def search_people(session, school_id, q, roles=None, limit=SEARCH_LIMIT):
+    """Best matches for q as (SchoolUser, student_id, employee_id) rows"""
+    words = _WORD.findall(q.lower())
+    if not words:
+        return []
+
+    if _uses_fts(session.get_bind()):
+        number = session.execute(
+            select(people_search_schools.c.id).where(people_search_schools.c.school_id == school_id)
+        ).scalar()
+        if number is None:
+            return []
+        # The school's rowid range, which FTS5 applies inside the match
+        query = (
+            select(SchoolUser, people_search_docs.c.student_id, people_search_docs.c.employee_id)
+            .select_from(people_search)
+            .join(people_search_docs, people_search_docs.c.id == people_search.c.rowid)
+            .join(SchoolUser, SchoolUser.id == people_search_docs.c.user_id)
+            .where(literal_column('people_search').op('MATCH')(match_expression(words)),
+                   people_search.c.rowid > number << SCHOOL_ROWID_BITS,
+                   people_search.c.rowid < (number + 1) << SCHOOL_ROWID_BITS)
+        )
+        if max(len(word) for word in words) >= RANKED_PREFIX_LENGTH:
+            query = query.order_by(people_search.c.rank)
+    else:
+        searched = [SchoolUser.first_name, SchoolUser.last_name, SchoolUser.email,
+                    Student.student_id, Teacher.employee_id]
+        query = (
+            select(SchoolUser, Student.student_id, Teacher.employee_id)
+            .outerjoin(Student, Student.user_id == SchoolUser.id)
+            .outerjoin(Teacher, Teacher.user_id == SchoolUser.id)
+            .where(SchoolUser.school_id == school_id,
+                   and_(*[or_(*[c.ilike(f'{word}%') for c in searched]) for word in words]))
+            .order_by(SchoolUser.last_name, SchoolUser.first_name)
+        )
+    if roles:
+        query = query.where(SchoolUser.role.in_(roles))
+    return session.execute(query.limit(limit)).all()
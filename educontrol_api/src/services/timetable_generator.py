@@ -0,0 +1,625 @@
+"""Timetable generation.
+
+A school's week is a grid of slots: the teaching days times the periods of
+the daily bell schedule. Every ClassSubject assignment needs its
+periods_per_week lessons placed on that grid so that no class, teacher or
+room is booked twice in a slot and teachers are only booked when they are
+available. Lessons of one subject are spread over different days where
+possible.
+
+The search is heuristic. A greedy pass places the most constrained lessons
+first, then a min-conflicts local search with a short tabu list repairs the
+remaining clashes, and same-day repeats are reduced by swapping lessons
+within a class. Each run is bounded by a time budget. Independent restarts
+with different seeds can run in a process pool, and the best one wins.
+The API runs generations on a background thread (start_generation), as a
+search may take longer than a request is allowed to.
+"""
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.extensions import cache, db
+from src.models.academic import Timetable, TimetableGeneration
+from src.models.school import SchoolClass
+from src.models.student import ClassSubject
+
+logger = logging.getLogger('educontrol.timetables')
+
+# Cost of one hard clash; larger than any possible number of soft violations
+HARD = 1 << 20
+
+DEFAULT_DAYS = [1, 2, 3, 4, 5]
+DEFAULT_TIME_BUDGET = 5
+MAX_TIME_BUDGET = 60
+MAX_LESSONS = 20000
+
+# Probability of a random move, and the range of iterations a move stays tabu
+NOISE = 0.02
+TABU_TENURE = (5, 15)
+
+
+class GenerationError(ValueError):
+    """Raised when a generation request is invalid or cannot be satisfied"""
+
+
+def _parse_time(value, field):
+    try:
+        return datetime.strptime(value, '%H:%M').time()
+    except (TypeError, ValueError):
+        raise GenerationError(f'Invalid {field}. Use HH:MM')
+
+
+def _positive_int(value, field, maximum=None):
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise GenerationError(f'{field} must be a positive integer')
+    if maximum is not None and value > maximum:
+        raise GenerationError(f'{field} must be at most {maximum}')
+    return value
+
+
+def parse_periods_per_week(value):
+    """Validate a class subject's periods_per_week; None uses the generation default"""
+    if value is None:
+        return None
+    return _positive_int(value, 'periods_per_week')
+
+
+def parse_options(data):
+    """Validate a generation request body and return normalized options"""
+    if not isinstance(data, dict):
+        raise GenerationError('Request body must be an object')
+
+    periods = data.get('periods')
+    if not isinstance(periods, list) or not periods:
+        raise GenerationError('periods must be a non-empty list of {start_time, end_time}')
+    bell_schedule = []
+    for period in periods:
+        if not isinstance(period, dict):
+            raise GenerationError('periods must be a non-empty list of {start_time, end_time}')
+        start_time = _parse_time(period.get('start_time'), 'start_time')
+        end_time = _parse_time(period.get('end_time'), 'end_time')
+        if start_time >= end_time:
+            raise GenerationError('start_time must be before end_time')
+        bell_schedule.append((start_time, end_time))
+    bell_schedule.sort()
+    for (_, previous_end), (start_time, _) in zip(bell_schedule, bell_schedule[1:]):
+        if start_time < previous_end:
+            raise GenerationError('periods must not overlap')
+
+    days = data.get('days', DEFAULT_DAYS)
+    if (not isinstance(days, list) or not days or len(set(days)) != len(days)
+            or not all(isinstance(day, int) and 1 <= day <= 7 for day in days)):
+        raise GenerationError('days must be a list of distinct days between 1 (Monday) and 7 (Sunday)')
+
+    rooms = data.get('rooms')
+    if rooms is not None and (not isinstance(rooms, list) or not rooms or len(set(rooms)) != len(rooms)
+                              or not all(isinstance(room, str) and room for room in rooms)):
+        raise GenerationError('rooms must be a non-empty list of distinct room names')
+
+    availability = {}
+    for teacher_id, windows in (data.get('teacher_availability') or {}).items():
+        if not isinstance(windows, list):
+            raise GenerationError('teacher_availability must map teacher ids to lists of {day_of_week, periods}')
+        allowed = set()
+        for window in windows:
+            if not isinstance(window, dict) or window.get('day_of_week') not in days:
+                raise GenerationError('teacher_availability days must be among the generated days')
+            window_periods = window.get('periods', list(range(len(bell_schedule))))
+            if not isinstance(window_periods, list) or not all(
+                    isinstance(p, int) and 0 <= p < len(bell_schedule) for p in window_periods):
+                raise GenerationError('teacher_availability periods must be indexes into periods')
+            allowed.update((window['day_of_week'], p) for p in window_periods)
+        availability[teacher_id] = allowed
+
+    periods_per_week = data.get('periods_per_week') or {}
+    if not isinstance(periods_per_week, dict):
+        raise GenerationError('periods_per_week must map class-subject ids to counts')
+    for class_subject_id, count in periods_per_week.items():
+        _positive_int(count, f'periods_per_week[{class_subject_id}]')
+
+    class_ids = data.get('class_ids')
+    if class_ids is not None and (not isinstance(class_ids, list) or not class_ids):
+        raise GenerationError('class_ids must be a non-empty list')
+
+    seed = data.get('seed')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+        raise GenerationError('seed must be an integer')
+
+    return {
+        'periods': bell_schedule,
+        'days': sorted(days),
+        'rooms': rooms,
+        'teacher_availability': availability,
+        'periods_per_week': periods_per_week,
+        'default_periods_per_week': _positive_int(data.get('default_periods_per_week', 1),
+                                                  'default_periods_per_week'),
+        'class_ids': class_ids,
+        'time_budget': _positive_int(data.get('time_budget', DEFAULT_TIME_BUDGET), 'time_budget',
+                                     MAX_TIME_BUDGET),
+        'workers': _positive_int(data.get('workers', 1), 'workers', os.cpu_count() or 1),
+        'seed': seed,
+    }
+
+
+def load_assignments(session, school_id, class_ids=None):
+    """(id, class_id, subject_id, teacher_id, periods_per_week) for a school's class subjects"""
+    query = (
+        select(ClassSubject.id, ClassSubject.class_id, ClassSubject.subject_id,
+               ClassSubject.teacher_id, ClassSubject.periods_per_week)
+        .join(SchoolClass, SchoolClass.id == ClassSubject.class_id)
+        .where(SchoolClass.school_id == school_id)
+        .order_by(ClassSubject.class_id, ClassSubject.subject_id)
+    )
+    if class_ids is not None:
+        query = query.where(ClassSubject.class_id.in_(class_ids))
+    return session.execute(query).all()
+
+
+def _overlaps(start, end, period):
+    return start < period[1] and period[0] < end
+
+
+def build_problem(assignments, options, existing=()):
+    """Encode assignments as a solver problem of integer ids.
+
+    existing are (teacher_id, room, day_of_week, start_time, end_time) of
+    timetable rows that stay in place; their teachers and rooms are not
+    available in the slots they overlap.
+    """
+    days, periods = options['days'], options['periods']
+    slot_count = len(days) * len(periods)
+    day_index = {day: position for position, day in enumerate(days)}
+
+    classes, teachers = {}, {}
+    lessons, class_subjects = [], []
+    for assignment in assignments:
+        count = (options['periods_per_week'].get(assignment.id)
+                 or assignment.periods_per_week or options['default_periods_per_week'])
+        class_index = classes.setdefault(assignment.class_id, len(classes))
+        teacher_index = teachers.setdefault(assignment.teacher_id, len(teachers)) if assignment.teacher_id else -1
+        lessons.extend([(class_index, teacher_index, len(class_subjects))] * count)
+        class_subjects.append((assignment.class_id, assignment.subject_id, assignment.teacher_id))
+    if not lessons:
+        raise GenerationError('No class-subject assignments to schedule')
+    if len(lessons) > MAX_LESSONS:
+        raise GenerationError(f'At most {MAX_LESSONS} lessons per generation')
+
+    blocked = set()
+    for teacher_id, allowed in options['teacher_availability'].items():
+        if teacher_id in teachers:
+            base = teachers[teacher_id] * slot_count
+            blocked.update(base + day_index[day] * len(periods) + p
+                           for day in days for p in range(len(periods)) if (day, p) not in allowed)
+
+    rooms = options['rooms']
+    taken_rooms = {}
+    for teacher_id, room, day, start_time, end_time in existing:
+        if day not in day_index:
+            continue
+        for p, period in enumerate(periods):
+            if not _overlaps(start_time, end_time, period):
+                continue
+            slot = day_index[day] * len(periods) + p
+            if teacher_id in teachers:
+                blocked.add(teachers[teacher_id] * slot_count + slot)
+            if rooms and room in rooms:
+                taken_rooms.setdefault(slot, set()).add(room)
+
+    capacity = [len(rooms) - len(taken_rooms.get(slot, ())) for slot in range(slot_count)] if rooms else None
+
+    # Obvious impossibilities, reported before any search
+    for class_id, class_index in classes.items():
+        needed = sum(1 for lesson in lessons if lesson[0] == class_index)
+        if needed > slot_count:
+            raise GenerationError(f'Class {class_id} needs {needed} periods but the week has {slot_count}')
+    teacher_load = Counter(lesson[1] for lesson in lessons if lesson[1] >= 0)
+    for teacher_id, teacher_index in teachers.items():
+        free = sum(1 for slot in range(slot_count) if teacher_index * slot_count + slot not in blocked)
+        if teacher_load[teacher_index] > free:
+            raise GenerationError(
+                f'Teacher {teacher_id} needs {teacher_load[teacher_index]} periods but is available for {free}')
+    if capacity is not None and len(lessons) > sum(capacity):
+        raise GenerationError(f'{len(lessons)} lessons do not fit in {sum(capacity)} free room slots')
+
+    return {
+        'lessons': lessons,
+        'class_count': len(classes),
+        'teacher_count': len(teachers),
+        'class_subject_count': len(class_subjects),
+        'days': len(days),
+        'periods': len(periods),
+        'blocked': blocked,
+        'capacity': capacity,
+        'taken_rooms': taken_rooms,
+        'class_subjects': class_subjects,
+    }
+
+
+class _Search:
+    """Incremental state of one solver run"""
+
+    def __init__(self, problem, rng):
+        self.rng = rng
+        self.lessons = problem['lessons']
+        self.period_count = problem['periods']
+        self.slot_count = problem['days'] * problem['periods']
+        self.blocked = problem['blocked']
+        self.capacity = problem['capacity']
+        self.day_count = problem['days']
+        slots = self.slot_count
+
+        self.slot_of = [-1] * len(self.lessons)
+        self.class_count = [0] * (problem['class_count'] * slots)
+        self.teacher_count = [0] * (problem['teacher_count'] * slots)
+        self.load = [0] * slots
+        self.spread = [0] * (problem['class_subject_count'] * self.day_count)
+        # Lessons per (class, slot), per (teacher, slot) and per slot, for finding clashes
+        self.class_cells = {}
+        self.teacher_cells = {}
+        self.slot_lessons = [set() for _ in range(slots)]
+        self.class_lessons = {}
+        for lesson, (class_index, _, _) in enumerate(self.lessons):
+            self.class_lessons.setdefault(class_index, []).append(lesson)
+        self.cost = 0
+
+    def slot_cost(self, lesson, slot):
+        """Cost of adding an unplaced lesson at slot"""
+        class_index, teacher_index, class_subject = self.lessons[lesson]
+        hard = self.class_count[class_index * self.slot_count + slot] > 0
+        if teacher_index >= 0:
+            cell = teacher_index * self.slot_count + slot
+            hard += (self.teacher_count[cell] > 0) + (cell in self.blocked)
+        if self.capacity is not None:
+            hard += self.load[slot] >= self.capacity[slot]
+        return hard * HARD + (self.spread[class_subject * self.day_count + slot // self.period_count] > 0)
+
+    def costs(self, lesson):
+        return [self.slot_cost(lesson, slot) for slot in range(self.slot_count)]
+
+    def place(self, lesson, slot):
+        self.cost += self.slot_cost(lesson, slot)
+        class_index, teacher_index, class_subject = self.lessons[lesson]
+        self.slot_of[lesson] = slot
+        cell = class_index * self.slot_count + slot
+        self.class_count[cell] += 1
+        self.class_cells.setdefault(cell, set()).add(lesson)
+        if teacher_index >= 0:
+            cell = teacher_index * self.slot_count + slot
+            self.teacher_count[cell] += 1
+            self.teacher_cells.setdefault(cell, set()).add(lesson)
+        self.load[slot] += 1
+        self.slot_lessons[slot].add(lesson)
+        self.spread[class_subject * self.day_count + slot // self.period_count] += 1
+
+    def remove(self, lesson):
+        slot = self.slot_of[lesson]
+        class_index, teacher_index, class_subject = self.lessons[lesson]
+        cell = class_index * self.slot_count + slot
+        self.class_count[cell] -= 1
+        self.class_cells[cell].discard(lesson)
+        if teacher_index >= 0:
+            cell = teacher_index * self.slot_count + slot
+            self.teacher_count[cell] -= 1
+            self.teacher_cells[cell].discard(lesson)
+        self.load[slot] -= 1
+        self.slot_lessons[slot].discard(lesson)
+        self.spread[class_subject * self.day_count + slot // self.period_count] -= 1
+        self.slot_of[lesson] = -1
+        self.cost -= self.slot_cost(lesson, slot)
+        return slot
+
+    def clashing(self, lesson):
+        """Lessons sharing a hard clash with lesson, including itself"""
+        slot = self.slot_of[lesson]
+        class_index, teacher_index, _ = self.lessons[lesson]
+        found = set()
+        cell = class_index * self.slot_count + slot
+        if self.class_count[cell] > 1:
+            found |= self.class_cells[cell]
+        if teacher_index >= 0:
+            cell = teacher_index * self.slot_count + slot
+            if self.teacher_count[cell] > 1:
+                found |= self.teacher_cells[cell]
+            if cell in self.blocked:
+                found.add(lesson)
+        if self.capacity is not None and self.load[slot] > self.capacity[slot]:
+            found |= self.slot_lessons[slot]
+        return found
+
+    def pick(self, costs, allowed=None):
+        """Cheapest slot, ties broken at random"""
+        best, choices = None, []
+        for slot, cost in enumerate(costs):
+            if allowed is not None and not allowed(slot, cost):
+                continue
+            if best is None or cost < best:
+                best, choices = cost, [slot]
+            elif cost == best:
+                choices.append(slot)
+        return self.rng.choice(choices) if choices else None
+
+
+def _greedy(search):
+    """Place lessons of the busiest teachers and classes first"""
+    teacher_load = Counter(teacher for _, teacher, _ in search.lessons)
+    class_load = Counter(class_index for class_index, _, _ in search.lessons)
+    order = sorted(
+        range(len(search.lessons)),
+        key=lambda lesson: (
+            -(teacher_load[search.lessons[lesson][1]] if search.lessons[lesson][1] >= 0 else 0),
+            -class_load[search.lessons[lesson][0]],
+            search.rng.random(),
+        ),
+    )
+    for lesson in order:
+        search.place(lesson, search.pick(search.costs(lesson)))
+
+
+def _repair(search, deadline):
+    """Min-conflicts search over hard clashes until none are left or time runs out"""
+    rng = search.rng
+    suspects = [lesson for lesson in range(len(search.lessons)) if search.clashing(lesson)]
+    tabu = {}
+    best_cost, best = search.cost, list(search.slot_of)
+    iteration = 0
+    while search.cost >= HARD and suspects:
+        iteration += 1
+        if iteration % 256 == 0 and time.monotonic() > deadline:
+            break
+        position = rng.randrange(len(suspects))
+        suspects[position], suspects[-1] = suspects[-1], suspects[position]
+        lesson = suspects.pop()
+        if not search.clashing(lesson):
+            continue
+
+        current = search.remove(lesson)
+        costs = search.costs(lesson)
+        if rng.random() < NOISE:
+            slot = rng.randrange(search.slot_count)
+        else:
+            # Tabu moves are allowed only when they beat the best cost seen
+            floor = best_cost - search.cost
+            slot = search.pick(costs, lambda s, c: s != current and (
+                tabu.get(lesson * search.slot_count + s, 0) < iteration or c < floor))
+            if slot is None:
+                slot = current
+        tabu[lesson * search.slot_count + current] = iteration + rng.randint(*TABU_TENURE)
+        search.place(lesson, slot)
+
+        suspects.extend(search.clashing(lesson))
+        if search.cost < best_cost:
+            best_cost, best = search.cost, list(search.slot_of)
+        if not suspects and search.cost >= HARD:
+            suspects = [other for other in range(len(search.lessons)) if search.clashing(other)]
+
+    if search.cost > best_cost:
+        for lesson, slot in enumerate(best):
+            if search.slot_of[lesson] != slot:
+                search.remove(lesson)
+                search.place(lesson, slot)
+
+
+def _spread(search, deadline):
+    """Swap lessons within a class to avoid repeating a subject on one day"""
+    rng = search.rng
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        for lesson in rng.sample(range(len(search.lessons)), len(search.lessons)):
+            if time.monotonic() > deadline:
+                return
+            class_index, _, class_subject = search.lessons[lesson]
+            slot = search.slot_of[lesson]
+            if search.spread[class_subject * search.day_count + slot // search.period_count] < 2:
+                continue
+            # A free slot of the class is a swap with nobody
+            partners = [other for other in search.class_lessons[class_index] if other != lesson]
+            partners.extend([None] * (search.slot_count - len(search.class_lessons[class_index])))
+            for other in rng.sample(partners, len(partners)):
+                if _try_swap(search, lesson, other):
+                    improved = True
+                    break
+
+
+def _try_swap(search, lesson, other):
+    before = search.cost
+    slot = search.remove(lesson)
+    if other is None:
+        class_index = search.lessons[lesson][0]
+        free = [s for s in range(search.slot_count)
+                if search.class_count[class_index * search.slot_count + s] == 0 and s != slot]
+        if not free:
+            search.place(lesson, slot)
+            return False
+        target = search.rng.choice(free)
+        search.place(lesson, target)
+        if search.cost < before:
+            return True
+        search.remove(lesson)
+        search.place(lesson, slot)
+        return False
+
+    target = search.remove(other)
+    if target // search.period_count == slot // search.period_count:
+        search.place(other, target)
+        search.place(lesson, slot)
+        return False
+    search.place(lesson, target)
+    search.place(other, slot)
+    if search.cost < before:
+        return True
+    search.remove(lesson)
+    search.remove(other)
+    search.place(other, target)
+    search.place(lesson, slot)
+    return False
+
+
+def solve(problem, seed=None, time_budget=DEFAULT_TIME_BUDGET):
+    """Run one search and return (hard clashes, soft cost, slot per lesson)"""
+    deadline = time.monotonic() + time_budget
+    search = _Search(problem, random.Random(seed))
+    _greedy(search)
+    _repair(search, deadline)
+    if search.cost < HARD:
+        _spread(search, deadline)
+    return search.cost // HARD, search.cost % HARD, search.slot_of
+
+
+def _solve_job(args):
+    return solve(*args)
+
+
+def solve_parallel(problem, workers=1, seed=None, time_budget=DEFAULT_TIME_BUDGET):
+    """Best of workers independent searches, run in parallel when workers > 1"""
+    seed = seed if seed is not None else random.randrange(1 << 30)
+    jobs = [(problem, seed + restart, time_budget) for restart in range(workers)]
+    if workers == 1:
+        results = [_solve_job(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_solve_job, jobs))
+    return min(results, key=lambda result: (result[0], result[1]))
+
+
+def timetable_rows(problem, options, slot_of, school_id):
+    """Timetable rows for a solution, with rooms assigned slot by slot"""
+    periods, days = options['periods'], options['days']
+    rooms = options['rooms']
+    by_slot = {}
+    for lesson, slot in enumerate(slot_of):
+        by_slot.setdefault(slot, []).append(lesson)
+
+    now = datetime.utcnow()
+    rows = []
+    for slot, lessons in sorted(by_slot.items()):
+        free_rooms = [room for room in rooms if room not in problem['taken_rooms'].get(slot, ())] if rooms else []
+        day, period = divmod(slot, len(periods))
+        for position, lesson in enumerate(sorted(lessons, key=lambda lesson: problem['lessons'][lesson])):
+            class_id, subject_id, teacher_id = problem['class_subjects'][problem['lessons'][lesson][2]]
+            rows.append({
+                'id': str(uuid.uuid4()),
+                'school_id': school_id,
+                'class_id': class_id,
+                'subject_id': subject_id,
+                'teacher_id': teacher_id,
+                'day_of_week': days[day],
+                'start_time': periods[period][0],
+                'end_time': periods[period][1],
+                'room': free_rooms[position] if free_rooms else None,
+                'created_at': now,
+                'updated_at': now,
+            })
+    return rows
+
+
+def kept_bookings(session, school_id, class_ids):
+    """(teacher_id, room, day_of_week, start_time, end_time) of rows outside class_ids"""
+    return session.execute(
+        select(Timetable.teacher_id, Timetable.room, Timetable.day_of_week,
+               Timetable.start_time, Timetable.end_time)
+        .where(Timetable.school_id == school_id, Timetable.class_id.notin_(class_ids))
+    ).all()
+
+
+def prepare_generation(session, school_id, data):
+    """Validate a generation request; returns (options, class ids, problem)"""
+    options = parse_options(data)
+    assignments = load_assignments(session, school_id, options['class_ids'])
+    class_ids = sorted({assignment.class_id for assignment in assignments})
+    # Rows of the generated classes are replaced; everything else stays booked
+    existing = kept_bookings(session, school_id, class_ids)
+    return options, class_ids, build_problem(assignments, options, existing)
+
+
+def run_generation(session, generation):
+    """Solve a generation and save its timetables unless it is a dry run.
+
+    The generation is returned completed, or failed with its error when the
+    request no longer validates, no conflict-free timetable was found within
+    the time budget or the rows could not be saved.
+    """
+    try:
+        options, class_ids, problem = prepare_generation(session, generation.school_id, generation.options)
+    except GenerationError as e:
+        return _finish(session, generation, 'failed', error=str(e))
+
+    started = time.perf_counter()
+    clashes, spread, slot_of = solve_parallel(problem, options['workers'], options['seed'], options['time_budget'])
+    elapsed = round(time.perf_counter() - started, 3)
+    if clashes:
+        return _finish(session, generation, 'failed', {'clashes': clashes, 'elapsed': elapsed},
+                       'No conflict-free timetable found within the time budget')
+
+    rows = timetable_rows(problem, options, slot_of, generation.school_id)
+    result = {
+        'classes': len(class_ids),
+        'lessons': len(rows),
+        'same_day_repeats': spread,
+        'elapsed': elapsed
+    }
+    if generation.dry_run:
+        result['timetables'] = [{
+            **row,
+            'start_time': row['start_time'].strftime('%H:%M'),
+            'end_time': row['end_time'].strftime('%H:%M'),
+            'created_at': row['created_at'].isoformat(),
+            'updated_at': row['updated_at'].isoformat()
+        } for row in rows]
+        return _finish(session, generation, 'completed', result)
+
+    try:
+        session.execute(delete(Timetable).where(
+            Timetable.school_id == generation.school_id,
+            Timetable.class_id.in_(class_ids)
+        ))
+        session.execute(insert(Timetable), rows)
+        _finish(session, generation, 'completed', result)
+    except SQLAlchemyError:
+        session.rollback()
+        return _finish(session, generation, 'failed', error='Could not save timetables')
+    cache.invalidate(generation.school_id, 'timetables')
+    return generation
+
+
+def _finish(session, generation, status, result=None, error=None):
+    generation.status = status
+    generation.result = result
+    generation.error = error
+    generation.finished_at = datetime.utcnow()
+    session.commit()
+    return generation
+
+
+def start_generation(app, generation_id):
+    """Run a generation on a daemon thread, with its own app context and session.
+
+    The caller returns at once and clients poll the generation. One whose
+    process exits part way stays running; start another.
+    """
+    def work():
+        with app.app_context():
+            generation = db.session.get(TimetableGeneration, generation_id)
+            try:
+                generation = run_generation(db.session, generation)
+            except Exception:
+                logger.exception('Timetable generation %s stopped', generation_id)
+                db.session.rollback()
+                _finish(db.session, generation, 'failed', error='Timetable generation stopped unexpectedly')
+                return
+            if generation.status == 'failed':
+                logger.warning('Timetable generation %s failed: %s', generation_id, generation.error)
+
+    thread = threading.Thread(target=work, name=f'timetable-generation-{generation_id}', daemon=True)
+    thread.start()
+    return thread
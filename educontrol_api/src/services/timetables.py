@@ -0,0 +1,149 @@
+"""Timetable conflict detection.
+
+TimetableIndex keeps, for every (resource, day) pair, the booked intervals
+sorted by start time, alongside the running maximum of their end times.
+The resources are a teacher, a room and a class. Saved timetables may
+already hold overlapping bookings, so a new interval is checked against
+every booking that starts before it ends: a bisect finds the last one,
+and the walk back stops as soon as the running maximum end shows no
+earlier booking reaches the new start. It serves batch checks
+(validation, generation); single writes use saved_conflicts, an indexed
+overlap query.
+"""
+from bisect import bisect_left
+from datetime import datetime
+
+from src.models.academic import Timetable
+
+# Entry field -> name used in conflict reports
+RESOURCES = {'teacher_id': 'teacher', 'room': 'room', 'class_id': 'class'}
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def parse_entry(data):
+    """Validate a timetable entry from JSON and return it with parsed times.
+
+    Raises ValueError with a message suitable for an API error.
+    """
+    for field in ['class_id', 'subject_id', 'day_of_week', 'start_time', 'end_time']:
+        if field not in data:
+            raise ValueError(f'Missing required field: {field}')
+    try:
+        start_time = datetime.strptime(data['start_time'], '%H:%M').time()
+        end_time = datetime.strptime(data['end_time'], '%H:%M').time()
+    except (TypeError, ValueError):
+        raise ValueError('Invalid time format. Use HH:MM')
+    if not isinstance(data['day_of_week'], int) or not (1 <= data['day_of_week'] <= 7):
+        raise ValueError('day_of_week must be between 1 (Monday) and 7 (Sunday)')
+    if start_time >= end_time:
+        raise ValueError('start_time must be before end_time')
+    return {
+        'class_id': data['class_id'],
+        'subject_id': data['subject_id'],
+        'teacher_id': data.get('teacher_id'),
+        'day_of_week': data['day_of_week'],
+        'start_time': start_time,
+        'end_time': end_time,
+        'room': data.get('room'),
+    }
+
+
+class TimetableIndex:
+    """Bookings per (resource, day): (start, end, ref) sorted by start, and the running maximum end"""
+
+    def __init__(self):
+        self._slots = {}
+
+    def _keys(self, entry):
+        for field, resource in RESOURCES.items():
+            if entry.get(field):
+                yield resource, (field, entry[field], entry['day_of_week'])
+
+    def conflicts(self, entry):
+        """[(resource, ref)] of existing bookings that overlap entry"""
+        start, end = _minutes(entry['start_time']), _minutes(entry['end_time'])
+        found = []
+        for resource, key in self._keys(entry):
+            slots = self._slots.get(key)
+            if not slots:
+                continue
+            bookings, max_ends = slots
+            # Bookings before position start before entry ends; (end,) sorts before any (end, ...)
+            position = bisect_left(bookings, (end,)) - 1
+            while position >= 0 and max_ends[position] > start:
+                if bookings[position][1] > start:
+                    found.append((resource, bookings[position][2]))
+                position -= 1
+        return found
+
+    def add(self, entry, ref):
+        """Book entry's interval for each of its resources under ref"""
+        start, end = _minutes(entry['start_time']), _minutes(entry['end_time'])
+        for _, key in self._keys(entry):
+            bookings, max_ends = self._slots.setdefault(key, ([], []))
+            # Ahead of bookings with the same interval, so refs are never compared
+            position = bisect_left(bookings, (start, end))
+            bookings.insert(position, (start, end, ref))
+            max_ends.insert(position, max(end, max_ends[position - 1]) if position else end)
+            for later in range(position + 1, len(max_ends)):
+                if max_ends[later] >= end:
+                    break
+                max_ends[later] = end
+
+    def check_and_add(self, entry, ref):
+        """Book entry unless it conflicts; returns the conflicts found"""
+        found = self.conflicts(entry)
+        if not found:
+            self.add(entry, ref)
+        return found
+
+    @classmethod
+    def for_school(cls, session, school_id, day_of_week=None, exclude_id=None):
+        """Index a school's saved timetable, optionally for one day only"""
+        query = session.query(
+            Timetable.id, Timetable.class_id, Timetable.teacher_id, Timetable.room,
+            Timetable.day_of_week, Timetable.start_time, Timetable.end_time
+        ).filter(Timetable.school_id == school_id)
+        if day_of_week is not None:
+            query = query.filter(Timetable.day_of_week == day_of_week)
+        if exclude_id is not None:
+            query = query.filter(Timetable.id != exclude_id)
+
+        index = cls()
+        for row in query:
+            index.add(row._asdict(), row.id)
+        return index
+
+
+def saved_conflicts(session, school_id, entry, exclude_id=None):
+    """[(resource, timetable id)] of a school's saved bookings that overlap entry.
+
+    One range query per resource on its (resource, day_of_week, start_time,
+    end_time) index, for checking a single write without loading the day.
+    """
+    found = []
+    for field, resource in RESOURCES.items():
+        if not entry.get(field):
+            continue
+        query = session.query(Timetable.id).filter(
+            getattr(Timetable, field) == entry[field],
+            Timetable.day_of_week == entry['day_of_week'],
+            Timetable.start_time < entry['end_time'],
+            Timetable.end_time > entry['start_time'],
+            Timetable.school_id == school_id,
+        )
+        if exclude_id is not None:
+            query = query.filter(Timetable.id != exclude_id)
+        found.extend((resource, timetable_id) for timetable_id, in query.order_by(Timetable.start_time))
+    return found
+
+
+def describe_conflicts(found):
+    """API representation of conflicts, keyed by what each one refers to"""
+    return [
+        {'resource': resource, ('index' if isinstance(ref, int) else 'timetable_id'): ref}
+        for resource, ref in found
+    ]
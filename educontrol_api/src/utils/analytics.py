@@ -0,0 +1,36 @@
+from sqlalchemy import Date, cast, func
+
+ATTENDANCE_STATUSES = ['present', 'absent', 'late', 'excused']
+
+# Buckets for time series, each labelled by its first day
+PERIODS = ['day', 'week', 'month']
+
+
+def period_start(column, period, dialect):
+    """SQL expression for the first day of the period containing date column.
+
+    Weeks start on Monday. The expression is typed as Date so every
+    dialect returns datetime.date values.
+    """
+    if period == 'day':
+        return column
+    if dialect == 'sqlite':
+        if period == 'week':
+            return func.date(column, 'weekday 0', '-6 days', type_=Date)
+        return func.date(column, 'start of month', type_=Date)
+    if dialect == 'postgresql':
+        return cast(func.date_trunc(period, column), Date)
+    if dialect in ('mysql', 'mariadb'):
+        if period == 'week':
+            return func.subdate(column, func.weekday(column), type_=Date)
+        return func.date_format(column, '%Y-%m-01', type_=Date)
+    raise NotImplementedError(f'Period buckets are not supported on {dialect}')
+
+
+def attendance_rate(counts):
+    """Share of marked sessions attended, counting late arrivals as attended"""
+    total = sum(counts[status] for status in ATTENDANCE_STATUSES)
+    if not total:
+        return None
+    return round((counts['present'] + counts['late']) / total, 4)
+
@@ -0,0 +1,28 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def dialect_insert(session, model):
+    """Return an INSERT for model that supports ON CONFLICT on the session's dialect"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model.__table__)
+    if dialect == 'sqlite':
+        return sqlite.insert(model.__table__)
+    raise NotImplementedError(f'Upserts are not supported on {dialect}')
+
+
+def upsert(session, model, rows, index_elements, update_columns):
+    """Insert rows with one executemany, updating update_columns on conflict.
+
+    index_elements must name the columns of a unique constraint on the
+    model's table. Nothing is committed here, so the caller's transaction
+    decides what happens to the rows.
+    """
+    if not rows:
+        return
+    stmt = dialect_insert(session, model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: stmt.excluded[column] for column in update_columns},
+    )
+    session.execute(stmt, rows)
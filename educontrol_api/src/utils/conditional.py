@@ -0,0 +1,103 @@
+import hashlib
+
+from flask import Response, jsonify, request
+from sqlalchemy import func
+
+from src.serialization import compile_serializer, model_columns
+from src.utils.expand import ExpandError, expand_items, parse_expand
+
+
+def _etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def collection_validators(query, model):
+    """Return (etag, last_modified) for every row query would return.
+
+    Computed with a single COUNT(*) and MAX(updated_at) over the query's
+    filters. The request's query string is part of the tag because paging
+    and projection parameters change the body. Returns (None, None) for
+    models without updated_at, whose rows can change without a trace.
+    """
+    if not hasattr(model, 'updated_at'):
+        return None, None
+    count, last_modified = query.with_entities(func.count(), func.max(model.updated_at)).order_by(None).one()
+    return _etag(model.__tablename__, count, last_modified, request.full_path), last_modified
+
+
+def resource_validators(resource):
+    """Return (etag, last_modified) for a single model instance"""
+    return _etag(resource.__tablename__, resource.id, resource.updated_at), resource.updated_at
+
+
+def embedded_validators(etag, last_modified, embedded):
+    """Fold rows embedded by expand= into a response's (etag, last_modified).
+
+    embedded holds (model, count, max updated_at) per embedded model, as
+    returned by expand_items(). A change to an embedded row bumps its
+    updated_at, so the combined tag changes with it. Embedding a model
+    without updated_at leaves the response without validators.
+    """
+    if etag is None or any(not hasattr(model, 'updated_at') for model, _, _ in embedded):
+        return None, None
+    etag = _etag(etag, *[(model.__tablename__, count, modified) for model, count, modified in embedded])
+    modified = [value for value in [last_modified] + [modified for _, _, modified in embedded] if value]
+    return etag, max(modified) if modified else None
+
+
+def is_not_modified(etag, last_modified):
+    """Whether the client's cached copy is still current"""
+    if etag is None:
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def with_validators(response, etag, last_modified):
+    """Attach weak ETag and Last-Modified headers to response"""
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def not_modified(etag, last_modified):
+    return with_validators(Response(status=304), etag, last_modified)
+
+
+def collection_response(query, model):
+    """Serialize every row of query, or answer 304 when the client is current.
+
+    ``expand=`` embeds related rows, loaded with one query per relationship.
+    """
+    try:
+        expansions = parse_expand(model, request.args.get('expand'))
+    except ExpandError as e:
+        return jsonify({'error': str(e)}), 400
+
+    etag, last_modified = collection_validators(query, model)
+    if not expansions and is_not_modified(etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    keys = [fk for _, fk, _ in expansions]
+    rows = query.with_entities(*keys, *model_columns(model)).all()
+    serialize = compile_serializer(model_columns(model), skip=len(keys))
+    items = [serialize(row) for row in rows]
+    if expansions:
+        embedded = expand_items(query.session, items, [row[:len(keys)] for row in rows], expansions)
+        etag, last_modified = embedded_validators(etag, last_modified, embedded)
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+    return with_validators(jsonify(items), etag, last_modified)
+
+
+def resource_response(resource):
+    """Serialize one resource, or answer 304 when the client is current"""
+    etag, last_modified = resource_validators(resource)
+    if is_not_modified(etag, last_modified):
+        return not_modified(etag, last_modified)
+    return with_validators(jsonify(resource.to_dict()), etag, last_modified)
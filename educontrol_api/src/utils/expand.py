@@ -0,0 +1,67 @@
+from functools import lru_cache
+
+from sqlalchemy import inspect, literal, select
+from sqlalchemy.orm import MANYTOONE
+
+from src.serialization import compile_serializer, model_columns
+
+# Public expand names of relationships whose attribute name differs
+EXPAND_NAMES = {'school_class': 'class'}
+
+
+class ExpandError(ValueError):
+    """Raised when the expand parameter names an unknown relationship"""
+
+
+@lru_cache(maxsize=None)
+def expandable(model):
+    """{expand name: (foreign key column, target model)} of model's many-to-one relationships.
+
+    The school is left out: every listed row already belongs to the school
+    in the URL.
+    """
+    relationships = {}
+    for relationship in inspect(model).relationships:
+        pairs = relationship.local_remote_pairs
+        target = relationship.mapper.class_
+        if relationship.direction is not MANYTOONE or len(pairs) != 1 or target.__tablename__ == 'schools':
+            continue
+        relationships[EXPAND_NAMES.get(relationship.key, relationship.key)] = (pairs[0][0], target)
+    return relationships
+
+
+def parse_expand(model, value):
+    """Resolve a comma separated expand parameter to [(name, foreign key column, target model)]"""
+    if not value:
+        return []
+    available = expandable(model)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ExpandError(f'Cannot expand: {", ".join(unknown)}. Must be among: {sorted(available)}')
+    return [(name, *available[name]) for name in dict.fromkeys(names)]
+
+
+def expand_items(session, items, keys, expansions):
+    """Embed the related rows of expansions into items, with one query per expansion.
+
+    keys holds each item's foreign key values, in expansions' order. Items
+    whose foreign key is NULL get None. Returns (target model, count,
+    max updated_at) per expansion, for the response's validators.
+    """
+    embedded = []
+    for position, (name, _, target) in enumerate(expansions):
+        ids = {row_keys[position] for row_keys in keys} - {None}
+        updated_at = target.updated_at if hasattr(target, 'updated_at') else literal(None)
+        columns = model_columns(target)
+        serialize = compile_serializer(columns, skip=1)
+        related, last_modified = {}, None
+        if ids:
+            for row in session.execute(select(updated_at, *columns).where(target.id.in_(ids))):
+                related[row.id] = serialize(row)
+                if row[0] is not None and (last_modified is None or row[0] > last_modified):
+                    last_modified = row[0]
+        for item, row_keys in zip(items, keys):
+            item[name] = related.get(row_keys[position])
+        embedded.append((target, len(related), last_modified))
+    return embedded
@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+
+from flask import Response, stream_with_context
+
+from src.serialization import compile_serializer, model_columns
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Rows fetched from the server-side cursor per round trip
+EXPORT_BATCH_SIZE = 1000
+
+
+def _ndjson_lines(columns, rows):
+    serialize = compile_serializer(columns)
+    for row in rows:
+        yield json.dumps(serialize(row)) + '\n'
+
+
+def _csv_lines(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in columns])
+    serialize = compile_serializer(columns)
+    for row in rows:
+        writer.writerow(serialize(row).values())
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_export(query, model, fmt, filename):
+    """Stream every row of query as NDJSON or CSV without buffering the result set.
+
+    Only the model's columns are selected, and they are read from a
+    server-side cursor in batches of EXPORT_BATCH_SIZE. Each row is written
+    to the response as soon as it is fetched.
+    """
+    columns = model_columns(model)
+    rows = query.with_entities(*columns).yield_per(EXPORT_BATCH_SIZE)
+
+    lines = _csv_lines(columns, rows) if fmt == 'csv' else _ndjson_lines(columns, rows)
+    response = Response(stream_with_context(lines), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
@@ -0,0 +1,70 @@
+from bisect import bisect_right
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from src.models.academic import GradeBand
+
+# Used when a school has not configured its own bands
+DEFAULT_GRADE_BANDS = [
+    ('A', Decimal('90')),
+    ('B', Decimal('80')),
+    ('C', Decimal('70')),
+    ('D', Decimal('60')),
+    ('F', Decimal('0')),
+]
+
+HUNDREDTHS = Decimal('0.01')
+
+
+class GradeScale:
+    """Sorted percentage thresholds that map a percentage to a letter grade"""
+
+    def __init__(self, bands):
+        ordered = sorted(bands, key=lambda band: band[1])
+        self.thresholds = [minimum for _, minimum in ordered]
+        self.grades = [grade for grade, _ in ordered]
+
+    @classmethod
+    def for_school(cls, school_id):
+        """Load a school's configured bands, falling back to DEFAULT_GRADE_BANDS"""
+        rows = GradeBand.query.with_entities(GradeBand.grade, GradeBand.min_percentage).filter_by(
+            school_id=school_id
+        ).all()
+        return cls([(grade, Decimal(minimum)) for grade, minimum in rows] or DEFAULT_GRADE_BANDS)
+
+    def letter(self, percentage):
+        """Return the letter grade for a percentage, or None below the lowest band"""
+        if percentage is None:
+            return None
+        position = bisect_right(self.thresholds, percentage)
+        return self.grades[position - 1] if position else None
+
+
+def to_decimal(value):
+    """Convert a JSON or CSV score to Decimal, or None when blank"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError('Scores must be numbers')
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError('Scores must be numbers')
+    if not number.is_finite():
+        raise ValueError('Scores must be numbers')
+    return number
+
+
+def grade_batch(scores, max_scores, scale):
+    """Compute percentages and letter grades for whole score columns at once.
+
+    scores and max_scores are parallel sequences of Decimal (scores may hold
+    None). Returns parallel lists of percentages rounded to two places and
+    letter grades from scale.
+    """
+    percentages = [
+        (score * 100 / max_score).quantize(HUNDREDTHS, rounding=ROUND_HALF_UP)
+        if score is not None and max_score else None
+        for score, max_score in zip(scores, max_scores)
+    ]
+    letters = [scale.letter(percentage) for percentage in percentages]
+    return percentages, letters
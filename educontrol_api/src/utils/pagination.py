@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+
+from flask import jsonify, request
+from sqlalchemy import and_, or_
+
+from src.serialization import compile_serializer, model_columns
+from src.utils.conditional import (
+    collection_validators, embedded_validators, is_not_modified, not_modified, with_validators
+)
+from src.utils.expand import ExpandError, expand_items, parse_expand
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class PaginationError(ValueError):
+    """Raised when a pagination or projection parameter is invalid"""
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) keyset position as an opaque cursor"""
+    raw = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode an opaque cursor back into its (created_at, id) keyset position"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    """Parse the limit query parameter, capped at maximum"""
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be at least 1')
+    return min(limit, maximum)
+
+
+def parse_fields(model, value):
+    """Resolve a comma separated fields parameter to the model's columns"""
+    if not value:
+        return None
+    columns = model.__table__.columns
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise PaginationError(f'Unknown fields: {", ".join(unknown)}. Must be among: {list(columns.keys())}')
+    return [columns[name] for name in dict.fromkeys(names)]
+
+
+def _next_link(cursor):
+    args = request.args.to_dict(flat=False)
+    args['cursor'] = [cursor]
+    return f'<{request.base_url}?{urlencode(args, doseq=True)}>; rel="next"'
+
+
+def paginate(query, model, descending=False, serialize=None):
+    """Return one keyset page of query as a JSON list response.
+
+    Rows are ordered by (created_at, id). The cursor for the next page is
+    returned in the X-Next-Cursor and Link headers. Plain column rows are
+    selected, so no model instances are built, and ``fields=`` narrows the
+    selection to the requested columns. ``expand=`` embeds related rows,
+    loaded with one query per relationship for the whole page.
+    A weak ETag over the whole filtered scope lets unchanged polls end in
+    a 304 before any page is loaded; with expand= the embedded rows are
+    part of the tag, so that check waits until they are loaded.
+
+    serialize, for models whose to_dict derives or hides fields, builds
+    each item from a model instance instead, e.g. FeeRun.to_dict; fields=
+    is then not available.
+    """
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        columns = parse_fields(model, request.args.get('fields'))
+        expansions = parse_expand(model, request.args.get('expand'))
+        cursor = request.args.get('cursor')
+        position = decode_cursor(cursor) if cursor else None
+        if serialize and columns:
+            raise PaginationError('fields is not supported on this endpoint')
+    except (PaginationError, ExpandError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    etag, last_modified = collection_validators(query, model)
+    if not expansions and is_not_modified(etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    created_at_col, id_col = model.created_at, model.id
+
+    if position:
+        created_at, row_id = position
+        if descending:
+            query = query.filter(or_(created_at_col < created_at,
+                                     and_(created_at_col == created_at, id_col < row_id)))
+        else:
+            query = query.filter(or_(created_at_col > created_at,
+                                     and_(created_at_col == created_at, id_col > row_id)))
+
+    if descending:
+        query = query.order_by(None).order_by(created_at_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(None).order_by(created_at_col.asc(), id_col.asc())
+
+    keys = [fk for _, fk, _ in expansions]
+    if serialize:
+        rows = query.with_entities(created_at_col, id_col, *keys, model).limit(limit + 1).all()
+        items = [serialize(row[-1]) for row in rows[:limit]]
+    else:
+        columns = tuple(columns) if columns else model_columns(model)
+        serialize = compile_serializer(columns, skip=2 + len(keys))
+        rows = query.with_entities(created_at_col, id_col, *keys, *columns).limit(limit + 1).all()
+        items = [serialize(row) for row in rows[:limit]]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last = (rows[-1][0], rows[-1][1]) if rows else None
+
+    if expansions:
+        embedded = expand_items(query.session, items, [row[2:2 + len(keys)] for row in rows], expansions)
+        etag, last_modified = embedded_validators(etag, last_modified, embedded)
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+
+    response = jsonify(items)
+    if has_more and last:
+        next_cursor = encode_cursor(*last)
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = _next_link(next_cursor)
+    return with_validators(response, etag, last_modified)
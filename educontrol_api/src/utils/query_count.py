@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Statements executed on an engine while the counter is active"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    """Count the statements engine executes inside the block.
+
+        with count_queries(db.engine) as counter:
+            client.get('/api/schools/<id>/students?expand=user')
+        assert counter.count == 3
+    """
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._record)
+
+
+@contextmanager
+def assert_max_queries(engine, expected):
+    """Fail with the executed statements when the block runs more than expected queries"""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > expected:
+        listing = '\n'.join(f'{number}. {statement}' for number, statement in enumerate(counter.statements, 1))
+        raise AssertionError(f'{counter.count} queries executed, expected at most {expected}:\n{listing}')
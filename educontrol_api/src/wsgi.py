@@ -0,0 +1,17 @@
+import re
+
+from src.app import create_app
+
+# Production entry point, e.g. gunicorn -c gunicorn.conf.py
+app = create_app()
+
+# Paths served by the gevent event stream pool (gunicorn.events.conf.py)
+EVENTS_PATHS = re.compile(r'^/api/schools/[^/]+/events$|^/metrics$')
+
+
+def events_app(environ, start_response):
+    """app restricted to the event streams; anything else belongs to the API pool"""
+    if EVENTS_PATHS.match(environ.get('PATH_INFO', '')):
+        return app(environ, start_response)
+    start_response('404 Not Found', [('Content-Type', 'application/json')])
+    return [b'{"error": "Not served by the event stream pool"}']
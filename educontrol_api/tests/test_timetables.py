@@ -0,0 +1,103 @@
+import time as clock
+from datetime import date, time
+
+import pytest
+
+from src.app import create_app
+from src.config import Config
+from src.extensions import db
+from src.models.academic import Timetable
+from src.models.school import AcademicYear, School, SchoolClass, Subject
+from src.models.student import ClassSubject
+from src.services.timetables import TimetableIndex, saved_conflicts
+
+
+def entry(start, end, **resources):
+    return {'day_of_week': 1, 'start_time': time(*start), 'end_time': time(*end), **resources}
+
+
+def test_conflicts_finds_an_earlier_long_booking():
+    # Saved timetables may already overlap: 10:00-11:00 sits inside 08:00-12:00,
+    # although the booking starting just before it (09:00-09:30) has ended
+    index = TimetableIndex()
+    index.add(entry((8, 0), (12, 0), room='A1'), 'long')
+    index.add(entry((9, 0), (9, 30), room='A1'), 'short')
+
+    assert index.conflicts(entry((10, 0), (11, 0), room='A1')) == [('room', 'long')]
+    assert index.conflicts(entry((12, 0), (13, 0), room='A1')) == []
+
+
+def test_conflicts_reports_every_overlapping_booking():
+    index = TimetableIndex()
+    for ref, (start, end) in enumerate([((9, 0), (10, 0)), ((8, 0), (9, 15)), ((9, 30), (11, 0))]):
+        index.add(entry(start, end, teacher_id='t'), ref)
+
+    assert sorted(index.conflicts(entry((9, 10), (9, 40), teacher_id='t'))) == [
+        ('teacher', 0), ('teacher', 1), ('teacher', 2)]
+    assert index.check_and_add(entry((11, 0), (12, 0), teacher_id='t'), 3) == []
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        CACHE_BACKEND = 'none'
+        EVENTS_BACKEND = 'none'
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.engine.dispose()
+
+
+def make_class(name='Timetable School'):
+    school = School(name=name)
+    db.session.add(school)
+    db.session.flush()
+    year = AcademicYear(school_id=school.id, name='2025', start_date=date(2025, 9, 1), end_date=date(2026, 6, 30))
+    db.session.add(year)
+    db.session.flush()
+    school_class = SchoolClass(school_id=school.id, academic_year_id=year.id, name='1A')
+    subject = Subject(school_id=school.id, name='Maths')
+    db.session.add_all([school_class, subject])
+    db.session.flush()
+    return school, school_class, subject
+
+
+def test_saved_conflicts_uses_overlapping_saved_rows(app):
+    school, school_class, subject = make_class()
+    rows = {
+        name: Timetable(school_id=school.id, class_id=school_class.id, subject_id=subject.id, room='A1',
+                        day_of_week=1, start_time=time(*start), end_time=time(*end))
+        for name, (start, end) in {'long': ((8, 0), (12, 0)), 'short': ((9, 0), (9, 30))}.items()
+    }
+    db.session.add_all(rows.values())
+    db.session.commit()
+
+    found = saved_conflicts(db.session, school.id, entry((10, 0), (11, 0), room='A1'))
+    assert found == [('room', rows['long'].id)]
+    assert saved_conflicts(db.session, school.id, entry((10, 0), (11, 0), room='A1'), exclude_id=rows['long'].id) == []
+    assert saved_conflicts(db.session, school.id, entry((12, 0), (13, 0), class_id=school_class.id)) == []
+
+
+def test_generate_runs_in_the_background(app):
+    school, school_class, subject = make_class()
+    db.session.add(ClassSubject(class_id=school_class.id, subject_id=subject.id, periods_per_week=3))
+    db.session.commit()
+    client = app.test_client()
+    periods = [{'start_time': '08:00', 'end_time': '08:45'}, {'start_time': '09:00', 'end_time': '09:45'}]
+
+    response = client.post(f'/api/schools/{school.id}/timetables/generate', json={'periods': periods, 'seed': 1})
+    assert response.status_code == 202
+    assert response.json['status'] == 'running'
+    for _ in range(100):
+        generation = client.get(response.headers['Location']).json
+        if generation['status'] != 'running':
+            break
+        clock.sleep(0.05)
+
+    assert generation['status'] == 'completed'
+    assert generation['result']['lessons'] == 3
+    assert Timetable.query.filter_by(class_id=school_class.id).count() == 3
+    assert client.post(f'/api/schools/{school.id}/timetables/generate', json={'periods': []}).status_code == 400